@@ -1,25 +1,34 @@
-import time
 import pandas as pd
-from selenium import webdriver
+from driver_pool import DriverPool
+from page_wait import WAIT_STATS, wait_for_title_change
+from rate_limiter import IntervalLimiter
+from candidate_store import CandidateWriter, latest_urls
+from metrics import METRICS
+from url_utils import canonical_username
 
 # --- 設定 ---
 INPUT_FILE = "verified_list_cleaned.csv"
 OUTPUT_FILE = "final_delivery_list.csv"
-
-def setup_driver():
-    options = webdriver.ChromeOptions()
-    options.add_argument('--lang=ja-JP')
-    # 画像オフで高速化
-    prefs = {"profile.managed_default_content_settings.images": 2}
-    options.add_experimental_option("prefs", prefs)
-    driver = webdriver.Chrome(options=options)
-    return driver
+# ブラウザ設定（webdriver_managerを使わない）。軽量モード・画面表示なしで動かす
+# 画面を見ながら確認したいときは SHOW_BROWSER=1 を付けて実行する
+BROWSER_OPTIONS = {"use_driver_manager": False}
+DRIVER_MAX_USES = 100     # この件数を処理したらブラウザを作り直す
+ACCESS_INTERVAL = (1, 2)  # プロフィールを開く間隔（秒）。ブロック回避用
+PAGE_LOAD_TIMEOUT = 10    # タイトルが切り替わるまで待つ最大秒数
+DATASET_DIR = "pipeline_data"  # 全スクリプト共通のアカウント情報（Parquet）。None にすると保存しない
+INPUT_STATUSES = ["delivered"] # データセットから読むときの対象（目視チェックの合格分）。無ければ INPUT_FILE を読む
+METRICS_DIR = "metrics"        # 計測結果（段階別の処理時間・件数）の保存先。None にすると保存しない
+METRICS_PROMETHEUS = False     # True なら Prometheus のテキスト形式（account_name.prom）も書き出す
 
 def main():
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        urls = [line.strip() for line in f if line.strip()]
+    urls = latest_urls(DATASET_DIR, INPUT_STATUSES)
+    if urls is None:
+        with open(INPUT_FILE, "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip()]
 
-    driver = setup_driver()
+    pool = DriverPool(1, max_uses=DRIVER_MAX_USES, **BROWSER_OPTIONS)
+    dataset = CandidateWriter(DATASET_DIR, stage="account_name")
+    limiter = IntervalLimiter(*ACCESS_INTERVAL)
     results = []
 
     print(f"{len(urls)}件のアカウント名を取得します...")
@@ -27,12 +36,17 @@ def main():
     try:
         for i, url in enumerate(urls):
             print(f"[{i+1}/{len(urls)}] Accessing: {url}")
-            driver.get(url)
-            time.sleep(2) # 読み込み待ち
-            
-            # ページタイトルから名前を抜き出す
-            # タイトル形式: "名前 (@username) • Instagram photos and videos"
-            page_title = driver.title
+            with METRICS.timer("rate_limit"):
+                limiter.wait()
+            with pool.driver() as driver:
+                old_title = driver.title
+                with METRICS.timer("page_load"):
+                    driver.get(url)
+                wait_for_title_change(driver, old_title, timeout=PAGE_LOAD_TIMEOUT) # 読み込み待ち
+                
+                # ページタイトルから名前を抜き出す
+                # タイトル形式: "名前 (@username) • Instagram photos and videos"
+                page_title = driver.title
             if "• Instagram photos and videos" in page_title:
                 page_title = page_title.replace("• Instagram photos and videos", "")
             
@@ -42,17 +56,25 @@ def main():
             # ログイン画面などで取れなかった場合の処理
             if "Instagram" in display_name and len(display_name) < 15:
                 # URLからIDを代わりに入れる
-                display_name = url.rstrip('/').split('/')[-1]
+                display_name = canonical_username(url) or url.rstrip('/').split('/')[-1]
+                METRICS.count("name_fallbacks")
+            METRICS.count("profiles")
 
             results.append({"アカウント名": display_name, "URL": url})
+            dataset.write(url=url, account_name=display_name)
 
     finally:
-        driver.quit()
+        pool.close()
+        dataset.close()
+        WAIT_STATS.print_summary()
 
     # 保存
     df = pd.DataFrame(results)
-    df.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
+    with METRICS.timer("write", target=OUTPUT_FILE):
+        df.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
     print(f"\n保存完了: {OUTPUT_FILE}")
+    METRICS.print_summary()
+    METRICS.export("account_name", METRICS_DIR, prometheus=METRICS_PROMETHEUS)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,232 @@
+import re
+import threading
+
+from metrics import METRICS
+from task_queue import WorkQueue
+from url_utils import canonical_username
+
+# ---------------------------------------------------------
+# 複数アカウントのまとめ検索（詳細チェックの検索回数を減らす）
+# ---------------------------------------------------------
+# 1アカウントごとに「site:instagram.com/username」で検索する代わりに、
+#   site:instagram.com/a OR site:instagram.com/b OR site:instagram.com/c
+# のように何件かをまとめて1回で検索し、返ってきた結果をURLのユーザー名で振り分ける。
+# 結果が1件も返ってこなかったアカウントは、1件ずつの検索でやり直す（検索結果の件数に限りがあるため）。
+# まとめる件数は自動で増減する。全員分の結果が返ってきたら1件増やし、取りこぼしがあったら
+# 「今回結果が返ってきた件数」（≒1ページに載る件数）まで減らして、それを上限として覚えておく。
+# 上限の件数で probe_every 回続けて取りこぼしが無ければ、上限を1件上げて試す（多すぎると取りこぼしのやり直しが増える）。
+#   verifier = BatchVerifier(lambda query: backend.search(query))
+#   by_user, missed = verifier.search(["a", "b", "c"])
+#   queue = BatchWorkQueue(handler, workers=4, batch_size=verifier.batch_size)   # 1件ずつ submit したものを溜めて渡す
+
+DEFAULT_BATCH_SIZE = 4
+MIN_BATCH_SIZE = 2
+MAX_BATCH_SIZE = 8
+
+# 振り分け用: プロフィール以外のURL（instagram.com/username/p/xxx など）はパスの先頭をユーザー名とみなす
+_FIRST_SEGMENT = re.compile(r"instagram\.com/([a-z0-9._]{1,30})", re.IGNORECASE)
+
+
+def batch_query(usernames):
+    """まとめ検索のクエリ"""
+    return " OR ".join(f"site:instagram.com/{username}" for username in usernames)
+
+
+def split_results(results, usernames):
+    """検索結果を {ユーザー名: [結果, ...]} に振り分ける（usernames に無いアカウントの結果は捨てる）"""
+    wanted = {username.lower() for username in usernames}
+    by_user = {}
+    for r in results:
+        username = canonical_username(r["href"])
+        if username is None:
+            match = _FIRST_SEGMENT.search(r["href"])
+            username = match.group(1).lower() if match else None
+        if username in wanted:
+            by_user.setdefault(username, []).append(r)
+    return by_user
+
+
+class BatchVerifier:
+    """
+    まとめ検索と、まとめる件数の自動調整。複数スレッドから同時に使ってよい
+    search は クエリ -> 結果一覧 の関数（バックエンドの search やヘッジ検索を包んだもの）
+    """
+
+    def __init__(self, search, initial_size=DEFAULT_BATCH_SIZE, min_size=MIN_BATCH_SIZE, max_size=MAX_BATCH_SIZE,
+                 probe_every=10):
+        self._search = search
+        self.size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.probe_every = probe_every
+        self._ceiling = max_size      # 取りこぼしが出た件数から見積もった、1回で結果が返ってくる件数の上限
+        self._streak = 0              # 上限の件数で、続けて取りこぼしが無かった回数
+        self.searches = 0             # まとめ検索の回数
+        self.requested = 0            # まとめ検索に入れたアカウント数
+        self.hits = 0                 # そのうち結果が返ってきたアカウント数
+        self.singles = 0              # 1件ずつの検索の回数（取りこぼしのやり直し・端数）
+        self._lock = threading.Lock()
+
+    def batch_size(self):
+        with self._lock:
+            return self.size
+
+    def search(self, usernames):
+        """
+        usernames をまとめて検索し、({ユーザー名: [結果, ...]}, 結果が無かったユーザー名) を返す
+        検索に失敗した場合は例外をそのまま投げる（キュー側で再試行される）
+        """
+        usernames = list(usernames)
+        results = self._search(batch_query(usernames))
+        by_user = split_results(results, usernames)
+        missed = [username for username in usernames if username.lower() not in by_user]
+        METRICS.count("batch_searches")
+        METRICS.count("batch_accounts", len(usernames) - len(missed), result="hit")
+        METRICS.count("batch_accounts", len(missed), result="missed")
+        with self._lock:
+            self.searches += 1
+            self.requested += len(usernames)
+            self.hits += len(by_user)
+            if missed:
+                # 並行して返ってきた他のまとめ検索の結果で何度も減らさないように、「1件減らす」ではなく件数を合わせる
+                self._ceiling = self.size = max(self.min_size, len(by_user))
+                self._streak = 0
+            elif self.size < self._ceiling:
+                self.size += 1
+            elif len(usernames) >= self.size:
+                self._streak += 1
+                if self._streak >= self.probe_every and self.size < self.max_size:
+                    self._ceiling = self.size = self.size + 1
+                    self._streak = 0
+        return by_user, missed
+
+    def record_single(self):
+        """1件ずつの検索を1回した（検索1回あたりの判定数の計算用）"""
+        with self._lock:
+            self.singles += 1
+
+    def print_stats(self):
+        with self._lock:
+            loads = self.searches + self.singles
+            verified = self.hits + self.singles
+            hit_rate = self.hits / self.requested * 100 if self.requested else 0.0
+            per_load = verified / loads if loads else 0.0
+            print(f"📦 まとめ検索: {self.searches}回（{self.requested}件・結果あり {hit_rate:.0f}%）+ 1件ずつ {self.singles}回 | "
+                  f"検索1回あたり {per_load:.2f}件を判定（1件ずつなら 1.00件） | まとめる件数 {self.size}件")
+
+
+class BatchWorkQueue:
+    """
+    1件ずつ submit した項目を batch_size() 件ずつまとめて handler(worker_id, items) に渡す WorkQueue
+    handler は ({項目: 結果}, 結果の無かった項目) を返す。結果の無かった項目は1件ずつのまとまりで投げ直す
+    （1件だけのまとまりは従来どおり1件ずつ検索し、結果が無くても判定して返すこと）
+    results() は WorkQueue と同じく (項目, 結果, 例外 or None) を1件ずつ返す
+    priority（項目 -> 数値）を指定すると、まとまりの中で一番大きい値の順に処理する
+    """
+
+    def __init__(self, handler, workers, batch_size, max_attempts=3, name="Batch", maxsize=0, dedupe_key=None,
+                 priority=None):
+        self.batch_size = batch_size
+        self.dedupe_key = dedupe_key
+        self.duplicates = 0
+        self.requeued = 0
+        self._queue = WorkQueue(handler, workers, max_attempts=max_attempts, name=name, maxsize=maxsize,
+                                priority=(lambda batch: max(priority(item) for item in batch)) if priority else None)
+        self._buffer = []
+        self._seen = set()
+        self._outstanding = 0     # 投げたまとまりのうち、結果を受け取っていない数
+        self._closed = False
+        self._cancelled = False
+        self._queue_closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        return self._queue.stats
+
+    @property
+    def cancelled(self):
+        return self._queue.cancelled
+
+    def start(self):
+        self._queue.start()
+        return self
+
+    def _dispatch(self, batch):
+        with self._lock:
+            self._outstanding += 1
+        if not self._queue.submit(tuple(batch)):
+            # cancel() 後
+            with self._lock:
+                self._outstanding -= 1
+
+    def submit(self, item):
+        """項目を追加する。追加したら True、重複で無視した・cancel() 後なら False"""
+        with self._lock:
+            if self._cancelled:
+                return False
+            if self._closed:
+                raise RuntimeError("close() 後は submit できません")
+            if self.dedupe_key:
+                key = self.dedupe_key(item)
+                if key in self._seen:
+                    self.duplicates += 1
+                    return False
+                self._seen.add(key)
+            self._buffer.append(item)
+            if len(self._buffer) < self.batch_size():
+                return True
+            batch, self._buffer = self._buffer, []
+        self._dispatch(batch)
+        return True
+
+    def close(self):
+        """これ以上 submit しないことを伝える。端数のまとまりを投げ、全部終わったらワーカーが止まる"""
+        with self._lock:
+            self._closed = True
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._dispatch(batch)
+        self._close_if_done()
+
+    def cancel(self):
+        """まだ投げていない・未着手のまとまりを取り消して止める（処理中のまとまりの結果は results() に返す）"""
+        with self._lock:
+            self._cancelled = self._closed = self._queue_closed = True
+            self._buffer = []
+        self._queue.cancel()
+
+    def _close_if_done(self):
+        with self._lock:
+            done = self._closed and self._outstanding == 0 and not self._queue_closed
+            self._queue_closed = self._queue_closed or done
+        if done:
+            self._queue.close()
+
+    def results(self):
+        """(項目, 結果, 例外 or None) を終わった順に返す。全件終わると止まる"""
+        for batch, outcome, error in self._queue.results():
+            if error is not None:
+                for item in batch:
+                    yield item, None, error
+            else:
+                decided, missed = outcome
+                for item in missed:
+                    # 取りこぼした分は1件ずつ検索し直す（cancel() 後は取り消し）
+                    if self._cancelled:
+                        break
+                    with self._lock:
+                        self.requeued += 1
+                    self._dispatch([item])
+                for item, result in decided.items():
+                    yield item, result, None
+            with self._lock:
+                self._outstanding -= 1
+            self._close_if_done()
+
+    def join(self):
+        self._queue.join()
+
+    def print_stats(self):
+        self._queue.print_stats()
+        print(f"   ↪ 個別に検索し直した項目 {self.requeued}件")
@@ -0,0 +1,889 @@
+import argparse
+import os
+import random
+import re
+import time
+
+from keyword_matcher import KeywordMatcher
+from metrics import METRICS
+from stub_server import start_stub_server
+from task_queue import WorkQueue
+
+# ---------------------------------------------------------
+# マイクロベンチマーク
+# 使い方: python benchmark.py [ベンチ名 ...]  （省略時は全部実行）
+#         python benchmark.py pipeline --sizes 1k,100k,1M --save before.json / --compare before.json
+# ---------------------------------------------------------
+
+# 実運用のNGリストと同程度（約40語）の語彙
+BENCH_NG_WORDS = [
+    "FX", "fx", "ＦＸ", "バイナリー", "暗号資産", "仮想通貨", "ビットコイン", "BTC",
+    "自動売買", "EA", "ツール", "サイン", "先出し", "爆益", "日利", "月利",
+    "ギャンブル", "バカラ", "競艇", "競馬", "パチンコ", "オンラインカジノ",
+    "借金返済", "即日", "現金", "プレゼント", "副業紹介", "コンサル生募集", "料理", "飯",
+    "シグナル", "不労所得", "スロット", "投資案件", "高配当保証", "元本保証",
+    "LINE登録", "無料配布", "稼げる", "情報商材",
+]
+
+SNIPPET_PARTS = [
+    "新NISAで資産形成", "30代ママの家計管理", "1.2万 フォロワー", "10K Followers",
+    "Instagram photos and videos", "貯金術と節約レシピ", "インデックス投資の始め方",
+    "毎日投稿中", "お金の勉強アカウント", "共働き夫婦の家計簿",
+]
+
+
+def make_snippets(n, ng_ratio=0.1, seed=0):
+    """NGワード入りを一定割合混ぜた合成スニペットを作る"""
+    rng = random.Random(seed)
+    snippets = []
+    for _ in range(n):
+        parts = rng.sample(SNIPPET_PARTS, 4)
+        if rng.random() < ng_ratio:
+            parts.insert(rng.randrange(len(parts)), rng.choice(BENCH_NG_WORDS))
+        snippets.append(" ".join(parts))
+    return snippets
+
+
+def _legacy_loop(words, text):
+    # 従来の実装（1語ずつ `in` で走査）
+    for ng in words:
+        if ng in text:
+            return True
+    return False
+
+
+def _timed(func, items):
+    start = time.perf_counter()
+    hits = sum(1 for item in items if func(item))
+    return time.perf_counter() - start, hits
+
+
+def bench_matcher(n=20000):
+    snippets = make_snippets(n)
+    matcher = KeywordMatcher(BENCH_NG_WORDS)
+
+    legacy_sec, legacy_hits = _timed(lambda t: _legacy_loop(BENCH_NG_WORDS, t), snippets)
+    search_sec, search_hits = _timed(matcher.search, snippets)
+    find_sec, _ = _timed(matcher.find_all, snippets)
+
+    print(f"[matcher] スニペット {n:,} 件 / NGワード {len(BENCH_NG_WORDS)} 語")
+    print(f"  従来ループ        : {legacy_sec * 1000:8.1f} ms  (NG {legacy_hits:,} 件)")
+    print(f"  KeywordMatcher    : {search_sec * 1000:8.1f} ms  (NG {search_hits:,} 件)")
+    print(f"  find_all (語一覧) : {find_sec * 1000:8.1f} ms")
+    print(f"  速度比            : x{legacy_sec / search_sec:.2f}")
+
+
+def _selenium_verify(base_url, usernames):
+    # instagram_autofinder.process_verification と同じ手順（ページ読み込み + 固定待ち + body.text）
+    import urllib.parse
+    from selenium.webdriver.common.by import By
+    from driver_pool import setup_driver
+
+    driver = setup_driver()
+    try:
+        for username in usernames:
+            query = urllib.parse.quote(f"site:instagram.com/{username}")
+            driver.get(f"{base_url}/html/?q={query}")
+            time.sleep(random.uniform(2, 3))
+            driver.find_element(By.TAG_NAME, "body").text
+    finally:
+        driver.quit()
+
+
+def bench_verify(n=40, latency=0.3, concurrency=4):
+    """ローカルのスタブ検索サーバーに対して Phase 2 の処理速度（件/分）を比べる"""
+    from http_search import search_many
+    from rate_limiter import AdaptiveTokenBucket
+
+    server, base_url = start_stub_server(latency=latency)
+    usernames = [f"bench_user_{i}" for i in range(n)]
+    endpoints = {"duckduckgo": f"{base_url}/html/", "bing": f"{base_url}/search"}
+    print(f"[verify] スタブサーバー {base_url} / {n} アカウント / 応答遅延 {latency}秒")
+
+    try:
+        start = time.perf_counter()
+        found, errors = search_many({u: f"site:instagram.com/{u}" for u in usernames},
+                                    concurrency=concurrency, endpoints=endpoints,
+                                    limiters={"duckduckgo": AdaptiveTokenBucket("bench", rate=1000, burst=1000, jitter=0)})
+        http_sec = time.perf_counter() - start
+        print(f"  http (同時{concurrency})  : {n / http_sec * 60:8.1f} 件/分  (成功 {len(found)} / 失敗 {len(errors)})")
+
+        sample = usernames[:5]
+        try:
+            start = time.perf_counter()
+            _selenium_verify(base_url, sample)
+            sel_sec = time.perf_counter() - start
+            print(f"  selenium (1ブラウザ)  : {len(sample) / sel_sec * 60:8.1f} 件/分  ({len(sample)}件で計測)")
+        except Exception as e:
+            print(f"  selenium: 計測できませんでした ({type(e).__name__}: {e})")
+    finally:
+        server.shutdown()
+
+
+def _chrome_rss_mb(driver):
+    """chromedriver から起動された Chrome の全プロセス（レンダラー・GPU などを含む）の RSS 合計（MB）"""
+    import psutil
+
+    processes = psutil.Process(driver.service.process.pid).children(recursive=True)
+    rss = 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return rss / 1024 / 1024
+
+
+def bench_browser(n=10, asset_latency=0.05):
+    """通常モードと軽量モード（driver_pool の lean）のブラウザで、プロフィールページの読み込み時間と Chrome のメモリを比べる"""
+    from driver_pool import setup_driver
+
+    server, base_url = start_stub_server(asset_latency=asset_latency)
+    urls = [f"{base_url}/profile/?q=bench_user_{i}" for i in range(n)]
+    print(f"[browser] スタブサーバー {base_url} / {n} ページ / 画像・CSS などの応答遅延 {asset_latency}秒")
+
+    try:
+        for label, lean in (("通常", False), ("軽量", True)):
+            try:
+                driver = setup_driver(use_driver_manager=False, lean=lean)
+            except Exception as e:
+                print(f"  {label}: 計測できませんでした ({type(e).__name__}: {e})")
+                continue
+            try:
+                driver.get(urls[0])   # 1回目はプロセスの立ち上がりを含むので計測しない
+                start = time.perf_counter()
+                for url in urls:
+                    driver.get(url)
+                load_sec = (time.perf_counter() - start) / n
+                try:
+                    memory = f"{_chrome_rss_mb(driver):7.1f} MB"
+                except ImportError:
+                    memory = "（psutil が無いため計測なし）"
+                print(f"  {label}: ページ読み込み 平均 {load_sec * 1000:7.1f} ms | Chrome の RSS（ブラウザ1台） {memory}")
+            finally:
+                driver.quit()
+    finally:
+        server.shutdown()
+
+
+def bench_batch(n=120, latency=0.1, concurrency=4, max_accounts=5):
+    """1件ずつの詳細チェックと、まとめ検索（batch_verify）の検索回数・所要時間を比べる"""
+    from batch_verify import BatchVerifier, BatchWorkQueue
+    from rate_limiter import AdaptiveTokenBucket
+    from search_backend import HttpBackend
+
+    server, base_url = start_stub_server(latency=latency, max_accounts=max_accounts)
+    backend = HttpBackend(concurrency=concurrency,
+                          endpoints={"duckduckgo": f"{base_url}/html/", "bing": f"{base_url}/search"},
+                          limiters={"duckduckgo": AdaptiveTokenBucket("bench", rate=1000, burst=1000, jitter=0)})
+    usernames = [f"bench_user_{i}" for i in range(n)]
+    print(f"[batch] スタブサーバー / {n} アカウント / 応答遅延 {latency}秒 / まとめ検索1回で返る上限 {max_accounts}件")
+
+    try:
+        start = time.perf_counter()
+        queue = WorkQueue(lambda worker_id, username: backend.search(f"site:instagram.com/{username}"),
+                          workers=concurrency).start()
+        for username in usernames:
+            queue.submit(username)
+        queue.close()
+        found = sum(1 for _, results, error in queue.results() if error is None and results)
+        single_sec = time.perf_counter() - start
+        print(f"  1件ずつ   : 検索 {n:4d}回 | {single_sec:6.2f}秒 | 判定 {found}件 | 検索1回あたり 1.00件")
+
+        for initial in (2, 4, 8):
+            verifier = BatchVerifier(backend.search, initial_size=initial, max_size=max(initial, 8))
+
+            def handler(worker_id, batch):
+                if len(batch) == 1:
+                    verifier.record_single()
+                    return {batch[0]: backend.search(f"site:instagram.com/{batch[0]}")}, []
+                by_user, missed = verifier.search(batch)
+                return by_user, missed
+
+            start = time.perf_counter()
+            # 実行時と同じく処理待ちの上限を付ける（結果を見ながら、まとめる件数が変わっていく）
+            queue = BatchWorkQueue(handler, workers=concurrency, batch_size=verifier.batch_size,
+                                   maxsize=concurrency).start()
+            for username in usernames:
+                queue.submit(username)
+            queue.close()
+            found = sum(1 for _, results, error in queue.results() if error is None and results)
+            sec = time.perf_counter() - start
+            loads = verifier.searches + verifier.singles
+            print(f"  まとめ {initial}件～: 検索 {loads:4d}回 | {sec:6.2f}秒 | 判定 {found}件 | "
+                  f"検索1回あたり {found / loads:.2f}件 | 取りこぼし {queue.requeued}件 | 最終 {verifier.size}件")
+    finally:
+        backend.close()
+        server.shutdown()
+
+
+def bench_queue(n=60, workers=4, seed=1):
+    """固定チャンク分割と WorkQueue の全体所要時間を比べる（一部だけ極端に遅い処理を混ぜる）"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    rng = random.Random(seed)
+    # 大半は 20ms、5%だけ CAPTCHA 等で 300ms かかる想定
+    durations = [0.3 if rng.random() < 0.05 else 0.02 for _ in range(n)]
+
+    def run_chunk(chunk):
+        for d in chunk:
+            time.sleep(d)
+
+    start = time.perf_counter()
+    chunk_size = (n // workers) + 1
+    chunks = [durations[i:i + chunk_size] for i in range(0, n, chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(run_chunk, chunks))
+    static_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wq = WorkQueue(lambda worker_id, d: time.sleep(d), workers=workers, name="Bench").start()
+    for d in durations:
+        wq.submit(d)
+    wq.close()
+    for _ in wq.results():
+        pass
+    queue_sec = time.perf_counter() - start
+
+    print(f"[queue] {n} 件 / {workers} ワーカー（遅い処理 {sum(d > 0.1 for d in durations)} 件）")
+    print(f"  固定チャンク : {static_sec:6.2f} 秒")
+    print(f"  WorkQueue    : {queue_sec:6.2f} 秒")
+    wq.print_stats()
+
+
+def _search_all(backend, queries, concurrency):
+    # WorkQueue で並列に検索し、({クエリ: 結果}, 所要秒数) を返す
+    wq = WorkQueue(lambda worker_id, q: backend.search(q), workers=concurrency, name=backend.name).start()
+    start = time.perf_counter()
+    for q in queries:
+        wq.submit(q)
+    wq.close()
+    outcomes = {q: results for q, results, error in wq.results() if error is None}
+    return outcomes, time.perf_counter() - start
+
+
+def bench_replay(n=40, latency=0.3, concurrency=4):
+    """スタブサーバーの結果を --record と同じ形式で保存し、replay で再生した場合の速度と一致を確認する"""
+    import tempfile
+    from search_backend import create_backend
+    from rate_limiter import configure_limiter
+
+    server, base_url = start_stub_server(latency=latency)
+    endpoints = {"duckduckgo": f"{base_url}/html/", "bing": f"{base_url}/search"}
+    queries = [f"site:instagram.com/replay_user_{i}" for i in range(n)]
+    configure_limiter("duckduckgo", rate=1000, burst=1000, jitter=0)
+    print(f"[replay] {n} クエリ / 応答遅延 {latency}秒")
+
+    try:
+        with tempfile.TemporaryDirectory() as record_dir:
+            with create_backend("http", record_dir=record_dir, concurrency=concurrency, endpoints=endpoints) as backend:
+                recorded, sec = _search_all(backend, queries, concurrency)
+            print(f"  http + 記録 : {n / sec * 60:12,.1f} 件/分  (成功 {len(recorded)}/{n})")
+
+            with create_backend("replay", replay_dir=record_dir) as backend:
+                replayed, sec = _search_all(backend, queries, concurrency)
+            print(f"  replay      : {n / sec * 60:12,.1f} 件/分  (成功 {len(replayed)}/{n})")
+            same = sum(1 for q in queries if q in recorded and replayed.get(q) == recorded[q])
+            print(f"  記録と一致  : {same}/{n}")
+    finally:
+        server.shutdown()
+
+
+class _SlowEngineBackend:
+    """エンジンごとに応答時間と「キーワードが見つかる確率」が違う疑似バックエンド"""
+
+    name = "bench"
+
+    def __init__(self, profiles, seed=3):
+        self.profiles = profiles   # {エンジン: (中央値秒, 見つかる確率)}
+        self._rng = random.Random(seed)
+
+    def search(self, query, engine="duckduckgo"):
+        median, hit_rate = self.profiles[engine]
+        time.sleep(median * self._rng.lognormvariate(0, 0.5))
+        return [{"href": "", "title": query, "body": "資産形成" if self._rng.random() < hit_rate else ""}]
+
+    def submit(self, executor, query, engine="duckduckgo"):
+        return executor.submit(self.search, query, engine)
+
+
+def bench_hedge(n=60, workers=4):
+    """bio_check の判定: 順番待ち（DDG→Bing）とヘッジ付き同時検索の、1件あたりの所要時間を比べる"""
+    from hedged_search import HedgedSearcher
+
+    # DDGは速いがキーワードが取れないことが多く、Bingは遅いが取れやすい想定
+    profiles = {"duckduckgo": (0.05, 0.3), "bing": (0.08, 0.7)}
+    print(f"[hedge] {n} アカウント / {workers} ワーカー / "
+          + " / ".join(f"{e}: 中央値 {m * 1000:.0f}ms・ヒット {h:.0%}" for e, (m, h) in profiles.items()))
+
+    for label, delay, learn in [("従来 (DDG→Bing)", None, False), ("順番待ち+学習", None, True),
+                                ("ヘッジ 30ms", 0.03, True), ("同時 (レース)", 0, True)]:
+        searcher = HedgedSearcher(_SlowEngineBackend(profiles), list(profiles), hedge_delay=delay, learn=learn)
+        wq = WorkQueue(lambda worker_id, u: searcher.search(u, lambda r: "資産" in r[0]["body"]),
+                       workers=workers, name=label).start()
+        start = time.perf_counter()
+        for i in range(n):
+            wq.submit(f"bench_user_{i}")
+        wq.close()
+        passed = sum(1 for _, outcome, error in wq.results() if error is None and outcome[0])
+        wall = time.perf_counter() - start
+        latencies = [lat for s in wq.stats.values() for lat in s.latencies]
+        merged = sorted(latencies)
+        p50 = merged[len(merged) // 2]
+        p95 = merged[min(len(merged) - 1, int(len(merged) * 0.95))]
+        print(f"  {label:<16}: 全体 {wall:5.2f}秒 | p50 {p50 * 1000:6.0f}ms | p95 {p95 * 1000:6.0f}ms | 合格 {passed}件")
+        searcher.print_stats()
+        searcher.close()
+
+
+FOLLOWER_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "follower_snippets.tsv")
+
+
+def load_follower_corpus(path=FOLLOWER_CORPUS):
+    """正解データを [(期待人数, 単位, スニペット)] で読む"""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            count, unit, text = line.rstrip("\n").split("\t", 2)
+            rows.append((int(count), unit, text))
+    return rows
+
+
+def _legacy_autofinder_followers(text):
+    # 従来の instagram_autofinder.extract_followers_from_text
+    if not text: return 0
+    patterns = [
+        r'フォロワー[:\s]*([\d,\.]+[万KkMm]?)人?',
+        r'([\d,\.]+[KkMm万]?)\s*Followers',
+        r'Followers:?\s*([\d,\.]+[KkMm万]?)'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            raw_num = match.group(1).replace(",", "")
+            multiplier = 1
+            if "万" in raw_num:
+                multiplier = 10000
+                raw_num = raw_num.replace("万", "")
+            elif "K" in raw_num.upper():
+                multiplier = 1000
+                raw_num = raw_num.upper().replace("K", "")
+            elif "M" in raw_num.upper():
+                multiplier = 1000000
+                raw_num = raw_num.upper().replace("M", "")
+            try:
+                return int(float(raw_num) * multiplier)
+            except:
+                continue
+    return 0
+
+
+def _legacy_pickup_followers(text):
+    # 従来の instagram_pickup.extract_follower_count（人数のみ）
+    if not text:
+        return 0
+    match_jp = re.search(r'(\d+(?:\.\d+)?)万\s*人?\s*フォロワー', text)
+    if match_jp:
+        return int(float(match_jp.group(1)) * 10000)
+    match_k = re.search(r'(\d+(?:\.\d+)?)K\s*Followers', text, re.IGNORECASE)
+    if match_k:
+        return int(float(match_k.group(1)) * 1000)
+    match_num = re.search(r'([\d,]+)\s*Followers', text, re.IGNORECASE)
+    if match_num:
+        return int(match_num.group(1).replace(',', ''))
+    return 0
+
+
+def bench_followers(n=100000, seed=2):
+    """フォロワー数抽出: 正解データでの正答数と、件数あたりの処理速度を比べる"""
+    import pandas as pd
+    from follower_parser import parse, parse_count, parse_many
+
+    corpus = load_follower_corpus()
+    print(f"[followers] 正解データ {len(corpus)} 件")
+    for name, func in [("従来 (autofinder)", _legacy_autofinder_followers),
+                       ("従来 (pickup)", _legacy_pickup_followers),
+                       ("parse_count", parse_count)]:
+        wrong = [text for count, _, text in corpus if func(text) != count]
+        print(f"  {name:<18}: 正解 {len(corpus) - len(wrong)}/{len(corpus)}")
+        for text in wrong[:3]:
+            print(f"      × {text[:40]}")
+    found = [parse(text) for _, _, text in corpus]
+    unit_ok = sum(1 for (count, unit, _), got in zip(corpus, found)
+                  if (got and (got.count, got.unit) == (count, unit)) or (not got and count == 0))
+    print(f"  {'parse':<18}: 正解 {unit_ok}/{len(corpus)}（単位も一致）")
+    batch = parse_many([text for _, _, text in corpus])
+    batch_ok = sum(1 for (count, unit, _), got, got_unit in zip(corpus, batch["count"], batch["unit"].fillna(""))
+                   if got == count and got_unit == unit)
+    print(f"  {'parse_many':<18}: 正解 {batch_ok}/{len(corpus)}（単位も一致）")
+
+    # 実際の結果一式に近い分布（記載なしのスニペットを多めに混ぜる）
+    rng = random.Random(seed)
+    texts = [rng.choice(corpus)[2] if rng.random() < 0.6 else " ".join(rng.sample(SNIPPET_PARTS[4:], 3))
+             for _ in range(n)]
+    print(f"  速度（{n:,} 件）")
+    for name, func in [("従来 (autofinder)", _legacy_autofinder_followers),
+                       ("従来 (pickup)", _legacy_pickup_followers),
+                       ("parse_count", parse_count),
+                       ("parse", parse)]:
+        sec, _ = _timed(func, texts)
+        print(f"  {name:<18}: {sec * 1000:8.1f} ms  ({n / sec:,.0f} 件/秒)")
+
+    # 結果一式を DataFrame にする場合: parse() を1件ずつ呼んで組み立てるのと、parse_many() でまとめて作るのを比べる
+    def parse_frame():
+        found = [parse(text) for text in texts]
+        return pd.DataFrame({"count": [f.count if f else 0 for f in found],
+                             "unit": [f.unit if f else None for f in found],
+                             "start": pd.array([f.start if f else None for f in found], dtype="Int64"),
+                             "end": pd.array([f.end if f else None for f in found], dtype="Int64"),
+                             "text": [f.text if f else None for f in found]})
+
+    for name, func in [("parse + DataFrame", parse_frame), ("parse_many", lambda: parse_many(texts))]:
+        start = time.perf_counter()
+        func()
+        sec = time.perf_counter() - start
+        print(f"  {name:<18}: {sec * 1000:8.1f} ms  ({n / sec:,.0f} 件/秒)")
+
+
+def bench_dataset(n=100000, seed=4):
+    """ステージ間の受け渡し: CSV を読み直して絞り込む場合と、Parquet を列・条件を絞って読む場合を比べる"""
+    import tempfile
+    import pandas as pd
+    import candidate_store
+
+    if not candidate_store.is_available():
+        print("[dataset] pyarrow が無いためスキップします")
+        return
+    import pyarrow.dataset as ds
+
+    rng = random.Random(seed)
+    df = pd.DataFrame({
+        "url": [f"https://www.instagram.com/bench_user_{i}/" for i in range(n)],
+        "title": [rng.choice(SNIPPET_PARTS) for _ in range(n)],
+        "snippet": [" ".join(rng.sample(SNIPPET_PARTS, 4)) for _ in range(n)],
+        "keyword": [rng.choice(["新NISA", "家計管理", "節約"]) for _ in range(n)],
+        "followers": pd.array([rng.choice([None, rng.randint(100, 100000)]) for _ in range(n)], dtype="Int64"),
+    })
+    print(f"[dataset] {n:,} 件（followers >= 5000 の行だけを url / followers で読む）")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "candidates.csv")
+        start = time.perf_counter()
+        df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+        write_csv = time.perf_counter() - start
+        start = time.perf_counter()
+        with candidate_store.CandidateWriter(tmp, stage="bench") as writer:
+            writer.write_frame(df)
+        write_parquet = time.perf_counter() - start
+        parquet_size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp) if f.endswith(".parquet"))
+
+        start = time.perf_counter()
+        loaded = pd.read_csv(csv_path, encoding="utf-8-sig")
+        from_csv = loaded.loc[loaded["followers"] >= 5000, ["url", "followers"]]
+        read_csv = time.perf_counter() - start
+        start = time.perf_counter()
+        from_parquet = candidate_store.read_candidates(tmp, columns=["url", "followers"],
+                                                       filter=ds.field("followers") >= 5000)
+        read_parquet = time.perf_counter() - start
+
+        print(f"  CSV     : 書き込み {write_csv * 1000:8.1f} ms | 読み込み+絞り込み {read_csv * 1000:8.1f} ms | "
+              f"{os.path.getsize(csv_path) / 1e6:6.1f} MB")
+        print(f"  Parquet : 書き込み {write_parquet * 1000:8.1f} ms | 読み込み+絞り込み {read_parquet * 1000:8.1f} ms | "
+              f"{parquet_size / 1e6:6.1f} MB")
+        print(f"  件数一致: {len(from_csv) == len(from_parquet)} ({len(from_parquet):,} 件)")
+
+
+def bench_writer(n=5000, resume_rows=100000):
+    """合格URLの保存: 1件ごとの DataFrame.to_csv(mode='a') と ResultWriter、再開時の読み込みを比べる"""
+    import tempfile
+    import pandas as pd
+    from result_writer import ResultWriter
+
+    urls = [f"https://www.instagram.com/bench_user_{i}/" for i in range(n)]
+    print(f"[writer] {n:,} 件を追記 / 再開時 {resume_rows:,} 件の出力からスキップ判定")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.csv")
+        pd.DataFrame(columns=["URL"]).to_csv(legacy_path, index=False, encoding="utf-8-sig")
+        start = time.perf_counter()
+        for url in urls:
+            pd.DataFrame({"URL": [url]}).to_csv(legacy_path, mode="a", header=False, index=False, encoding="utf-8-sig")
+        legacy = time.perf_counter() - start
+
+        path = os.path.join(tmp, "buffered.csv")
+        start = time.perf_counter()
+        with ResultWriter(path, header=["URL"], encoding="utf-8-sig") as out:
+            for url in urls:
+                out.write(url)
+        buffered = time.perf_counter() - start
+        same = pd.read_csv(path, encoding="utf-8-sig")["URL"].tolist() == pd.read_csv(legacy_path, encoding="utf-8-sig")["URL"].tolist()
+        print(f"  1件ごとに to_csv : {legacy * 1000:8.1f} ms  ({n / legacy:,.0f} 件/秒)")
+        print(f"  ResultWriter     : {buffered * 1000:8.1f} ms  ({n / buffered:,.0f} 件/秒)  出力一致: {same}")
+
+        big_path = os.path.join(tmp, "resume.csv")
+        with ResultWriter(big_path, header=["URL"], encoding="utf-8-sig", flush_every=10000) as out:
+            for i in range(resume_rows):
+                out.write(f"https://www.instagram.com/resume_user_{i}/")
+        probe = [f"https://www.instagram.com/resume_user_{i}/" for i in range(0, 2 * resume_rows, 2)]
+        start = time.perf_counter()
+        done = set(pd.read_csv(big_path, encoding="utf-8-sig")["URL"].tolist())
+        hits_legacy = sum(1 for url in probe if url in done)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        with ResultWriter(big_path, header=["URL"], encoding="utf-8-sig") as out:
+            hits = sum(1 for url in probe if url in out)
+        indexed = time.perf_counter() - start
+        print(f"  再開: read_csv   : {legacy * 1000:8.1f} ms  (スキップ {hits_legacy:,} 件)")
+        print(f"  再開: 索引       : {indexed * 1000:8.1f} ms  (スキップ {hits:,} 件)")
+
+
+def _simulate_queries(seed, n_main=6, n_sub=14):
+    """単語ごとに成果の違う、疑似的な検索結果（クエリ -> ユーザー名の一覧）と合格するアカウントを作る"""
+    from query_scheduler import build_queries
+
+    rng = random.Random(seed)
+    mains = [f"main{i}" for i in range(n_main)]
+    subs = [f"sub{i}" for i in range(n_sub)]
+    power = {term: rng.choice([0.05, 0.2, 0.5, 1.0, 2.0]) for term in mains + subs}
+    quality = {term: rng.choice([0.1, 0.3, 0.6]) for term in mains}
+    results, qualified = {}, set()
+    for query, terms in build_queries(mains, subs).items():
+        mean = 8 * power[terms[0]] * (power[terms[1]] if len(terms) > 1 else 1.0)
+        pool = 30 * (1 + len(query) % 3)
+        names = {f"{terms[0]}_{rng.randrange(pool)}" for _ in range(int(rng.expovariate(1 / mean)) if mean else 0)}
+        results[query] = sorted(names)
+        qualified.update(name for name in names if rng.random() < quality[terms[0]])
+    return build_queries(mains, subs), results, qualified
+
+
+def bench_scheduler(seeds=20, budget=0.4):
+    """検索する組み合わせの順番: シャッフル順と QueryScheduler で、同じ検索回数で見つかる合格アカウント数を比べる"""
+    from query_scheduler import QueryScheduler
+
+    totals = {"シャッフル": 0, "QueryScheduler": 0, "全件": 0}
+    stopped_at = []
+    for seed in range(seeds):
+        terms_by_query, results, qualified = _simulate_queries(seed)
+        limit = int(len(terms_by_query) * budget)
+        totals["全件"] += len({name for names in results.values() for name in names} & qualified)
+
+        order = list(terms_by_query)
+        random.Random(seed).shuffle(order)
+        found = {name for query in order[:limit] for name in results[query]}
+        totals["シャッフル"] += len(found & qualified)
+
+        scheduler = QueryScheduler({q: terms_by_query[q] for q in order}, min_yield=0)
+        found = set()
+        for _ in range(limit):
+            query = scheduler.next()
+            if query is None:
+                break
+            names = results[query]
+            scheduler.record_search(query, names)
+            for name in names:
+                if name not in found:
+                    scheduler.record_verdict(name, name in qualified)
+            found.update(names)
+        totals["QueryScheduler"] += len(found & qualified)
+
+        scheduler = QueryScheduler({q: terms_by_query[q] for q in order})
+        used = 0
+        query = scheduler.next()
+        while query is not None:
+            scheduler.record_search(query, results[query])
+            used += 1
+            query = scheduler.next()
+        stopped_at.append(used / len(terms_by_query))
+
+    print(f"[scheduler] {seeds} 通りの疑似データ / 全組み合わせの {budget:.0%} だけ検索した場合の合格アカウント数")
+    for name, total in totals.items():
+        print(f"  {name:<15}: {total:6,} 件")
+    print(f"  打ち切りあり（既定値）: 平均で全組み合わせの {sum(stopped_at) / len(stopped_at):.0%} を検索して終了")
+
+
+# ---------------------------------------------------------
+# パイプライン全体のベンチ（件数別の処理速度・ピークメモリ / 前回との比較）
+# ---------------------------------------------------------
+# python benchmark.py pipeline autofinder --sizes 1k,100k,1M --save bench.json
+# python benchmark.py pipeline --compare bench.json   # 前回の保存結果より遅く・重くなった処理に印を付ける
+
+SEARCH_RESULTS_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search_results.tsv")
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000, "1M": 1000000}
+DEFAULT_SIZES = ("1k", "100k")
+
+RESULTS = []            # 今回の計測結果（--save / --compare 用）
+MEASURE_MEMORY = True   # --no-memory で False（ピークメモリの計測は処理をもう1回実行するので時間がかかる）
+
+
+def load_search_results(path=SEARCH_RESULTS_CORPUS):
+    """記録データを [(プロフィールか, ユーザー名, アカウント名, URL, タイトル, スニペット)] で読む"""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            is_profile, username, name, href, title, body = line.rstrip("\n").split("\t", 5)
+            rows.append((is_profile == "1", username or None, name, href, title, body))
+    return rows
+
+
+def make_search_results(n, seed=5):
+    """記録データを元に、ユーザー名を変えた合成の検索結果を (URL, タイトル, スニペット) の列で作る"""
+    rng = random.Random(seed)
+    rows = load_search_results()
+    followers = [text for _, _, text in load_follower_corpus()]
+    hrefs, titles, bodies = [], [], []
+    for i in range(n):
+        _, username, _, href, title, body = rng.choice(rows)
+        if username:
+            # 記録データのユーザー名は小文字なので、URL・タイトル側は大文字小文字を区別せずに置き換える
+            pattern = re.compile(re.escape(username), re.IGNORECASE)
+            href = pattern.sub(f"{username}{i}", href)
+            title = pattern.sub(f"{username}{i}", title)
+        if rng.random() < 0.5:
+            body = f"{rng.choice(followers)} {body}"
+        hrefs.append(href)
+        titles.append(title)
+        bodies.append(body)
+    return hrefs, titles, bodies
+
+
+def measure(bench, size, n, func):
+    """func() の処理時間と（MEASURE_MEMORY なら）ピークメモリを計測して RESULTS に残す"""
+    import gc
+    import tracemalloc
+
+    # 短い処理は1回だと揺れが大きいので、合計 0.2秒になるまで（最大5回）繰り返して一番速い回を使う
+    times = []
+    while len(times) < 5 and sum(times) < 0.2:
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    sec = min(times)
+    peak = None
+    if MEASURE_MEMORY:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    RESULTS.append({"bench": bench, "size": size, "n": n, "seconds": round(sec, 6),
+                    "per_sec": round(n / sec, 1), "peak_mb": round(peak / 1e6, 3) if peak is not None else None})
+    memory = f" | ピーク {peak / 1e6:8.1f} MB" if peak is not None else ""
+    print(f"  {bench:<26} {size:>5}: {sec * 1000:10.1f} ms | {n / sec:12,.0f} 件/秒{memory}")
+
+
+def bench_pipeline(sizes=DEFAULT_SIZES):
+    """URLの判定・正規化 / NGワード / フォロワー数 / アカウント名 / DataFrame の重複除外・並べ替え・保存"""
+    import tempfile
+    import pandas as pd
+    from dedupe_store import normalize_username
+    from follower_parser import parse_count, parse_many
+    from instagram_autofinder import clean_instagram_url, get_username
+    from instagram_pickup import extract_display_name, is_profile_url, is_safe_content
+    from url_utils import canonical_username, canonical_usernames
+
+    def cold(func):
+        # 1件ずつの変換はキャッシュを空にしてから測る（合成データはほぼ全件が別URLなので実行時と同じ条件）
+        def run():
+            canonical_username.cache_clear()
+            return func()
+        return run
+
+    rows = load_search_results()
+    checks = [("is_profile_url", lambda r: is_profile_url(r[3]) == r[0]),
+              ("get_username", lambda r: get_username(r[3]) == r[1]),
+              ("extract_display_name", lambda r: extract_display_name(r[4]) == r[2])]
+    print(f"[pipeline] 記録データ {len(rows)} 件との一致: " +
+          " / ".join(f"{name} {sum(1 for r in rows if check(r))}/{len(rows)}" for name, check in checks))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            n = SIZES[size]
+            hrefs, titles, bodies = make_search_results(n)
+
+            def save_frame():
+                df = pd.DataFrame({"URL": hrefs, "Title": titles,
+                                   "Followers": parse_many(bodies)["count"].to_numpy()})
+                df["username"] = canonical_usernames(df["URL"])
+                df = df.drop_duplicates("username").sort_values("Followers", ascending=False)
+                df.to_csv(os.path.join(tmp, "frame.csv"), index=False, encoding="utf-8-sig")
+
+            measure("url.is_profile_url", size, n, cold(lambda: [is_profile_url(h) for h in hrefs]))
+            measure("url.get_username", size, n, cold(lambda: [get_username(h) for h in hrefs]))
+            measure("url.clean_instagram_url", size, n, cold(lambda: [clean_instagram_url(h) for h in hrefs]))
+            measure("url.normalize_username", size, n, cold(lambda: [normalize_username(h) for h in hrefs]))
+            measure("url.canonical_usernames", size, n, lambda: canonical_usernames(hrefs))
+            measure("ng_filter", size, n, lambda: [is_safe_content(b) for b in bodies])
+            measure("followers.parse_count", size, n, lambda: [parse_count(b) for b in bodies])
+            measure("followers.parse_many", size, n, lambda: parse_many(bodies))
+            measure("extract_display_name", size, n, lambda: [extract_display_name(t) for t in titles])
+            measure("frame.dedupe_sort_save", size, n, save_frame)
+
+
+def bench_autofinder(n_main=3, n_sub=8, latency=0.05, target=5):
+    """
+    スタブ検索サーバーに対して instagram_autofinder.run() を Phase 1 から保存まで通しで動かす
+    --target N（合格が N 件に達したら打ち切る）の場合の所要時間・検索回数も比べる
+    """
+    import argparse as _argparse
+    import contextlib
+    import io
+    import tempfile
+    import http_search
+    import instagram_autofinder as finder
+    from rate_limiter import configure_limiter
+
+    class _NoBrowser:
+        def warm_up(self, count=None):
+            pass
+
+        def close(self):
+            pass
+
+    server, base_url = start_stub_server(latency=latency)
+    saved_endpoints = dict(http_search.ENDPOINTS)
+    saved = {name: getattr(finder, name) for name in (
+        "MAIN_KEYWORDS", "SUB_KEYWORDS", "SEARCH_BACKEND", "VERIFY_BACKEND", "CACHE_FILE", "OUTPUT_FILE",
+        "JOURNAL_FILE", "QUERY_HISTORY_FILE", "DATASET_DIR", "TERM_REPORT_FILE", "SCHEDULER_MIN_YIELD")}
+    n_queries = n_main * n_sub + n_main
+    print(f"[autofinder] スタブサーバー / {n_queries} クエリ / 応答遅延 {latency}秒")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            http_search.ENDPOINTS.update({"duckduckgo": f"{base_url}/html/", "bing": f"{base_url}/search"})
+            configure_limiter("duckduckgo", rate=1000, burst=1000, jitter=0)
+            finder.MAIN_KEYWORDS = [f"資産形成{i}" for i in range(n_main)]
+            finder.SUB_KEYWORDS = [f"初心者{i}" for i in range(n_sub)]
+            finder.SEARCH_BACKEND = finder.VERIFY_BACKEND = "http"
+            finder.SCHEDULER_MIN_YIELD = 0
+            finder.DATASET_DIR = finder.TERM_REPORT_FILE = None
+            runs = []
+
+            def run_once(target=None):
+                # 毎回まっさらな状態から（キャッシュ・履歴が残ると2回目が速くなるので）
+                run_dir = tempfile.mkdtemp(dir=tmp)
+                for name, file in (("CACHE_FILE", "cache.sqlite3"), ("OUTPUT_FILE", "out.csv"),
+                                   ("JOURNAL_FILE", "journal.jsonl"), ("QUERY_HISTORY_FILE", "history.json")):
+                    setattr(finder, name, os.path.join(run_dir, file))
+                args = _argparse.Namespace(resume=False, incremental=False, record=None, replay=None, target=target)
+                requests = METRICS.counter_value("search_requests", backend="http", engine="duckduckgo")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    finder.run(_NoBrowser(), args)
+                requests = METRICS.counter_value("search_requests", backend="http", engine="duckduckgo") - requests
+                runs.append((sum(1 for _ in open(finder.OUTPUT_FILE, encoding="utf-8-sig")) - 1, requests))
+
+            measure("autofinder.run", f"{n_queries}q", n_queries, run_once)
+            print(f"  全件      : 合格アカウント数 {runs[0][0]} 件 / 検索 {runs[0][1]} 回")
+            runs.clear()
+            measure("autofinder.run_target", f"{n_queries}q", n_queries, lambda: run_once(target))
+            print(f"  --target {target}: 合格アカウント数 {runs[0][0]} 件 / 検索 {runs[0][1]} 回")
+    finally:
+        http_search.ENDPOINTS.clear()
+        http_search.ENDPOINTS.update(saved_endpoints)
+        for name, value in saved.items():
+            setattr(finder, name, value)
+        server.shutdown()
+
+
+def save_results(path):
+    import json
+    import platform
+    import subprocess
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"commit": commit, "python": platform.python_version(), "saved_at": time.time(),
+                   "results": RESULTS}, f, ensure_ascii=False, indent=1)
+    print(f"\n💾 計測結果を {path} に保存しました（commit {commit or '不明'}）")
+
+
+def compare_results(path, threshold=0.15):
+    """保存しておいた結果と比べ、処理速度が threshold 以上落ちた・ピークメモリが増えた処理を数えて返す"""
+    import json
+
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {(r["bench"], r["size"]): r for r in baseline["results"]}
+    print(f"\n📊 比較: {path}（commit {baseline.get('commit') or '不明'}）→ 今回 / 基準 ±{threshold:.0%}")
+    regressions = 0
+    for r in RESULTS:
+        old = before.get((r["bench"], r["size"]))
+        if old is None:
+            continue
+        speed = r["per_sec"] / old["per_sec"] - 1
+        marks = []
+        if speed < -threshold:
+            marks.append("遅くなった")
+        memory = ""
+        if r["peak_mb"] is not None and old.get("peak_mb"):
+            growth = r["peak_mb"] / old["peak_mb"] - 1
+            memory = f" | メモリ {growth:+7.1%}"
+            # 1MB 未満の差は誤差として扱う
+            if growth > threshold and r["peak_mb"] - old["peak_mb"] > 1:
+                marks.append("メモリ増")
+        regressions += 1 if marks else 0
+        flag = f"  ⚠️ {' / '.join(marks)}" if marks else ""
+        print(f"  {r['bench']:<26} {r['size']:>5}: 速度 {speed:+7.1%}{memory}{flag}")
+    print(f"  → 悪化 {regressions} 件")
+    return regressions
+
+
+BENCHMARKS = {
+    "matcher": bench_matcher,
+    "verify": bench_verify,
+    "browser": bench_browser,
+    "queue": bench_queue,
+    "followers": bench_followers,
+    "replay": bench_replay,
+    "hedge": bench_hedge,
+    "dataset": bench_dataset,
+    "writer": bench_writer,
+    "scheduler": bench_scheduler,
+    "batch": bench_batch,
+    "pipeline": bench_pipeline,
+    "autofinder": bench_autofinder,
+}
+
+
+def main():
+    global MEASURE_MEMORY
+
+    parser = argparse.ArgumentParser(description="Instagram検索ツール群のベンチマーク")
+    parser.add_argument("names", nargs="*", help=f"実行するベンチ名 ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                        help=f"pipeline の件数（{', '.join(SIZES)} をカンマ区切りで）")
+    parser.add_argument("--no-memory", action="store_true", help="ピークメモリを計測しない（速くなる）")
+    parser.add_argument("--save", metavar="PATH", help="計測結果を JSON に保存する")
+    parser.add_argument("--compare", metavar="PATH", help="保存しておいた計測結果と比べる")
+    parser.add_argument("--threshold", type=float, default=0.15, help="悪化とみなす変化の割合（既定 0.15）")
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"不明な件数: {', '.join(unknown)}（{', '.join(SIZES)}）")
+    MEASURE_MEMORY = not args.no_memory
+
+    for name in args.names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            print(f"不明なベンチ名: {name}")
+            continue
+        if name == "pipeline":
+            bench_pipeline(sizes)
+        else:
+            BENCHMARKS[name]()
+
+    if args.save:
+        save_results(args.save)
+    if args.compare and compare_results(args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
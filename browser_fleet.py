@@ -0,0 +1,200 @@
+import math
+import threading
+
+from metrics import METRICS
+
+try:
+    import psutil
+except ImportError:  # psutil が無ければブラウザ数は自動調整せず、最初の台数のまま動く
+    psutil = None
+
+# ---------------------------------------------------------
+# ブラウザ数の自動調整（PC のメモリ・CPU の空き具合に合わせる）
+# ---------------------------------------------------------
+# 共用のPCで動かすことが多いので、同時に起動するブラウザ数を固定値で決めるのではなく、
+# 実行中に Chrome 1台あたりのメモリ（RSS）と CPU を測り、予算に収まる範囲で DriverPool の上限を増減する。
+#   増やす: ブラウザの空きを待っているワーカーがいて、もう1台起動してもメモリ・CPU の予算に収まるとき（1回に1台ずつ）
+#   減らす: メモリ使用率・CPU 使用率が上限を超えた / 空きメモリが reserve を下回った / ブラウザの失敗が増えたとき
+# 減らすときは処理中のページを打ち切らず、返ってきたブラウザから終了する（DriverPool.resize）。
+# 減らした後は cooldown 回分は増やさない（増減を繰り返さないように）。
+#   governor = FleetGovernor(pool, min_size=1, max_size=4).start()
+#   ...
+#   governor.stop()
+#   governor.print_stats()
+
+DEFAULT_INTERVAL = 5.0          # 測る間隔（秒）
+DEFAULT_CPU_BUDGET = 80.0       # PC全体の CPU 使用率（%）の上限
+DEFAULT_MEMORY_RESERVE_MB = 1024  # 他のプロセス用に残しておく空きメモリ（MB）
+MEMORY_PRESSURE_PERCENT = 90.0  # PC全体のメモリ使用率（%）がこれを超えたら減らす
+MAX_ERROR_RATE = 0.3            # 1回の測定間隔で、返ってきたブラウザのうち失敗（起動失敗・落ちていた）の割合の上限
+MIN_USES_FOR_ERROR_RATE = 3     # 失敗の割合は、この回数以上使われた間隔でだけ見る
+DEFAULT_CHROME_MB = 400.0       # まだ測れていないときの Chrome 1台あたりのメモリの見積もり（MB）
+
+
+def is_available():
+    return psutil is not None
+
+
+class FleetGovernor:
+    """DriverPool の上限（同時に起動するブラウザ数）を、測ったメモリ・CPU から定期的に決め直す"""
+
+    def __init__(self, pool, min_size=1, max_size=4, memory_budget_mb=None, cpu_budget=DEFAULT_CPU_BUDGET,
+                 memory_reserve_mb=DEFAULT_MEMORY_RESERVE_MB, interval=DEFAULT_INTERVAL, cooldown=3):
+        self.pool = pool
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.memory_budget_mb = memory_budget_mb   # Chrome 全体で使ってよいメモリ（None なら空きメモリから決める）
+        self.cpu_budget = cpu_budget
+        self.memory_reserve_mb = memory_reserve_mb
+        self.interval = interval
+        self.cooldown = cooldown
+        self.enabled = psutil is not None
+        self.chrome_mb = DEFAULT_CHROME_MB   # 直近に測った Chrome 1台あたりのメモリ（MB）
+        self.chrome_cpu = 0.0                # 直近に測った Chrome 1台あたりの CPU（PC全体に対する %）
+        self.peak_size = pool.size
+        self.scaled_up = 0
+        self.scaled_down = 0
+        self._hold = 0                       # 減らした後、増やさずに待つ残り回数
+        self._last_uses = pool.uses
+        self._last_failures = pool.failures
+        self._processes = {}                 # pid -> psutil.Process（cpu_percent は同じオブジェクトで前回からの差を測る）
+        self._stop = threading.Event()
+        self._thread = None
+        self._mb_samples = []
+
+    def start(self):
+        if not self.enabled:
+            print(f"⚠️  psutil が無いため、ブラウザ数は自動調整しません（{self.pool.size}台で固定。pip install psutil）")
+            return self
+        psutil.cpu_percent(interval=None)   # 1回目は基準を取るだけ
+        self._thread = threading.Thread(target=self._run, name="FleetGovernor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                # 測定に失敗しても処理は止めない（台数はそのまま）
+                METRICS.count("errors", queue="FleetGovernor", type=type(e).__name__)
+
+    # --- 測定 ---
+    def _chrome_processes(self):
+        """起動中のブラウザの Chrome プロセス（レンダラー・GPU などを含む）"""
+        processes = []
+        seen = set()
+        for pid in self.pool.service_pids():
+            try:
+                children = psutil.Process(pid).children(recursive=True)
+            except psutil.Error:
+                continue
+            for child in children:
+                seen.add(child.pid)
+                processes.append(self._processes.setdefault(child.pid, child))
+        for pid in set(self._processes) - seen:
+            del self._processes[pid]
+        return processes
+
+    def sample(self):
+        """今の状態を測る"""
+        size, browsers, waiting = self.pool.status()
+        chrome_bytes = 0
+        chrome_cpu = 0.0
+        for process in self._chrome_processes():
+            try:
+                chrome_bytes += process.memory_info().rss
+                chrome_cpu += process.cpu_percent(interval=None)
+            except psutil.Error:
+                pass
+        memory = psutil.virtual_memory()
+        uses, failures = self.pool.uses, self.pool.failures
+        sample = {
+            "size": size,
+            "browsers": browsers,
+            "waiting": waiting,
+            "chrome_mb": chrome_bytes / 1024 / 1024,
+            "chrome_cpu": chrome_cpu / (psutil.cpu_count() or 1),   # 1コア基準の % を PC全体に対する % にする
+            "host_cpu": psutil.cpu_percent(interval=None),
+            "available_mb": memory.available / 1024 / 1024,
+            "memory_percent": memory.percent,
+            "uses": uses - self._last_uses,
+            "failures": failures - self._last_failures,
+        }
+        self._last_uses, self._last_failures = uses, failures
+        return sample
+
+    # --- 判定 ---
+    def decide(self, sample):
+        """測った値から新しい上限を決める。(台数, 理由 or None)"""
+        size = sample["size"]
+        if sample["browsers"] and sample["chrome_mb"]:
+            self.chrome_mb = sample["chrome_mb"] / sample["browsers"]
+            self.chrome_cpu = sample["chrome_cpu"] / sample["browsers"]
+            self._mb_samples.append(self.chrome_mb)
+
+        # PC が苦しい・エラーが増えた: 1台減らす
+        if sample["memory_percent"] >= MEMORY_PRESSURE_PERCENT or sample["available_mb"] < self.memory_reserve_mb:
+            return self._down(size - 1, "メモリ不足")
+        if sample["host_cpu"] > self.cpu_budget:
+            return self._down(size - 1, "CPU高負荷")
+        if sample["uses"] >= MIN_USES_FOR_ERROR_RATE and sample["failures"] / sample["uses"] > MAX_ERROR_RATE:
+            return self._down(size - 1, "ブラウザの失敗が増加")
+
+        # メモリの予算に収まる台数
+        if self.memory_budget_mb:
+            budget_mb = self.memory_budget_mb
+        else:
+            budget_mb = sample["chrome_mb"] + sample["available_mb"] - self.memory_reserve_mb
+        fits = max(0, math.floor(budget_mb / self.chrome_mb))
+        if size > fits:
+            return self._down(fits, "メモリの予算超過")
+
+        if self._hold:
+            self._hold -= 1
+            return self._clamp(size), None
+        # 空きを待っているワーカーがいて、もう1台起動しても予算に収まるなら1台増やす
+        if (sample["waiting"] and size < self.max_size and size + 1 <= fits
+                and sample["host_cpu"] + self.chrome_cpu <= self.cpu_budget):
+            return self._clamp(size + 1), "空きあり"
+        return self._clamp(size), None
+
+    def _clamp(self, size):
+        return min(self.max_size, max(self.min_size, size))
+
+    def _down(self, size, reason):
+        self._hold = self.cooldown
+        return self._clamp(size), reason
+
+    def step(self):
+        """1回測って、必要なら上限を変える"""
+        sample = self.sample()
+        new_size, reason = self.decide(sample)
+        old_size = sample["size"]
+        if new_size == old_size:
+            return new_size
+        self.pool.resize(new_size)
+        direction = "up" if new_size > old_size else "down"
+        METRICS.count("fleet_resizes", direction=direction)
+        if direction == "up":
+            self.scaled_up += 1
+        else:
+            self.scaled_down += 1
+        self.peak_size = max(self.peak_size, new_size)
+        print(f"🖥️  ブラウザ数 {old_size} → {new_size}台（{reason}） | Chrome 1台あたり {self.chrome_mb:.0f}MB / "
+              f"CPU {self.chrome_cpu:.0f}% | 空きメモリ {sample['available_mb'] / 1024:.1f}GB / "
+              f"CPU使用率 {sample['host_cpu']:.0f}%")
+        return new_size
+
+    def print_stats(self):
+        if not self.enabled:
+            return
+        measured = (f"平均 {sum(self._mb_samples) / len(self._mb_samples):.0f}MB"
+                    if self._mb_samples else "測定なし")
+        print(f"🖥️  ブラウザ数の自動調整: {self.min_size}〜{self.max_size}台のうち最大 {self.peak_size}台 | "
+              f"増 {self.scaled_up}回 / 減 {self.scaled_down}回 | Chrome 1台あたりのメモリ {measured}")
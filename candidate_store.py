@@ -0,0 +1,209 @@
+import glob
+import os
+import threading
+import time
+import uuid
+
+from metrics import METRICS
+from url_utils import canonical_username, canonical_usernames
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow が無くても各スクリプトは CSV だけで動く
+    pa = ds = pq = None
+
+# ---------------------------------------------------------
+# ステージ間で受け渡すアカウント情報（Parquet）
+# ---------------------------------------------------------
+# 各スクリプトが調べた内容を、共通の列（SCHEMA）で1つのディレクトリに書き足していく。
+# 1回の実行が1ファイル（<stage>-<日時>-<ランダム>.parquet）で、row_group_size 件ごとに行グループとして追記する。
+# 書き込み中は .tmp に書き、close() で名前を変えるので、途中で止まった実行のファイルは読み込まれない。
+#   writer = CandidateWriter("pipeline_data", stage="pickup")
+#   writer.write(url=..., snippet=..., followers=...)
+#   writer.close()
+#   df = latest_candidates("pipeline_data")   # ユーザー名ごとに、各ステージの最新の値をまとめた表
+#   urls = latest_urls("pipeline_data", ["bio_ok"])   # 次のステージの入力（最新の status で選ぶ）
+# 次のステージは入力 CSV の代わりに latest_urls() で前のステージの結果を読む。
+# pyarrow が無い・データセットがまだ無いときは None を返すので、各スクリプトは従来どおり CSV を読む。
+# 列の追加は末尾に nullable で行い、既存の列の型は変えない（古いファイルもそのまま読めるように）。
+
+DEFAULT_ROW_GROUP_SIZE = 5000
+
+if pa is not None:
+    SCHEMA = pa.schema([
+        ("username", pa.string()),          # 小文字のユーザー名（結合キー）
+        ("url", pa.string()),
+        ("account_name", pa.string()),
+        ("title", pa.string()),
+        ("snippet", pa.string()),
+        ("keyword", pa.string()),           # 見つけた検索キーワード
+        ("followers", pa.int64()),
+        ("follower_text", pa.string()),     # フォロワー数の根拠になった文字列
+        ("ng_words", pa.list_(pa.string())),
+        ("bio_keywords", pa.list_(pa.string())),
+        ("engine", pa.string()),
+        ("stage", pa.string()),             # 書き込んだスクリプト（pickup / autofinder / bio_check / ...）
+        ("status", pa.string()),            # candidate / verified / rejected / bio_ok / bio_ng / delivered など
+        ("updated_at", pa.timestamp("ms")),
+    ])
+    COLUMNS = SCHEMA.names
+else:
+    SCHEMA = None
+    COLUMNS = []
+
+
+def is_available():
+    return pa is not None
+
+
+class CandidateWriter:
+    """1回の実行分のアカウント情報を Parquet に書き足していく。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, dataset_dir, stage, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        self.stage = stage
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self.enabled = bool(dataset_dir) and pa is not None
+        if dataset_dir and pa is None:
+            print("⚠️  pyarrow が無いため、Parquet への保存はスキップします（pip install pyarrow）")
+        self.path = None
+        if self.enabled:
+            os.makedirs(dataset_dir, exist_ok=True)
+            name = f"{stage}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+            self.path = os.path.join(dataset_dir, name)
+        self._buffer = []
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def write(self, **fields):
+        """1アカウント分を書く（SCHEMA の列名で渡す。username は url から自動で埋める）"""
+        if not self.enabled:
+            return
+        row = self._complete(fields)
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush_locked()
+
+    def write_frame(self, df):
+        """DataFrame をまとめて書く（列名は SCHEMA に合わせておく。無い列は空になる）"""
+        if not self.enabled or df.empty:
+            return
+        frame = df.copy()
+        if "username" not in frame.columns:
+            frame["username"] = canonical_usernames(frame["url"])
+        frame["stage"] = frame["stage"] if "stage" in frame.columns else self.stage
+        frame["updated_at"] = frame["updated_at"] if "updated_at" in frame.columns else _now()
+        for column in COLUMNS:
+            if column not in frame.columns:
+                frame[column] = None
+        table = pa.Table.from_pandas(frame[COLUMNS], schema=SCHEMA, preserve_index=False)
+        with self._lock:
+            self._flush_locked()
+            for batch in table.to_batches(max_chunksize=self.row_group_size):
+                self._write_table(pa.Table.from_batches([batch], schema=SCHEMA))
+
+    def _complete(self, fields):
+        unknown = set(fields) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"SCHEMA に無い列です: {sorted(unknown)}")
+        row = dict.fromkeys(COLUMNS)
+        row.update(fields)
+        if row["username"] is None:
+            row["username"] = canonical_username(row["url"])
+        row["stage"] = row["stage"] or self.stage
+        row["updated_at"] = row["updated_at"] or _now()
+        return row
+
+    def _write_table(self, table):
+        with METRICS.timer("write", target="parquet"):
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path + ".tmp", SCHEMA, compression="zstd")
+            self._writer.write_table(table)
+        self.rows_written += table.num_rows
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._write_table(pa.Table.from_pylist(self._buffer, schema=SCHEMA))
+            self._buffer = []
+
+    def flush(self):
+        """溜まっている分を行グループとして書き出す"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._flush_locked()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+                os.replace(self.path + ".tmp", self.path)
+            self.enabled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _now():
+    # SCHEMA の timestamp("ms") に合わせる
+    return int(time.time() * 1000)
+
+
+def _dataset(dataset_dir):
+    files = sorted(glob.glob(os.path.join(dataset_dir, "*.parquet")))
+    if not files:
+        return None
+    return ds.dataset(files, schema=SCHEMA, format="parquet")
+
+
+def read_candidates(dataset_dir, columns=None, filter=None):
+    """
+    書き足された全行を DataFrame で返す（同じアカウントが複数行あり得る）
+    columns で読む列を絞り、filter に pyarrow.dataset の条件式を渡すと読み込み時に絞り込める
+        read_candidates(DIR, filter=pyarrow.dataset.field("followers") >= 5000)
+    """
+    if pa is None:
+        raise ImportError("Parquet の読み込みには pyarrow が必要です")
+    import pandas as pd
+
+    dataset = _dataset(dataset_dir) if os.path.isdir(dataset_dir) else None
+    if dataset is None:
+        return SCHEMA.empty_table().select(columns or COLUMNS).to_pandas()
+    # 欠損のある整数列（followers）が float にならないように nullable 整数で読む
+    return dataset.to_table(columns=columns, filter=filter).to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def latest_candidates(dataset_dir, columns=None, filter=None):
+    """
+    ユーザー名ごとに1行にまとめた DataFrame を返す
+    各列は、更新日時の新しい行から順に「空でない値」を採用する（後のステージで空の列は前のステージの値を引き継ぐ）
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(["username", "updated_at", *columns]))
+    df = read_candidates(dataset_dir, columns=columns, filter=filter)
+    if df.empty:
+        return df
+    df = df.sort_values("updated_at", kind="stable")
+    return df.groupby("username", sort=False).last().reset_index()
+
+
+def latest_urls(dataset_dir, statuses):
+    """
+    最新の status が statuses のどれかであるアカウントの URL を返す
+    pyarrow が無い・データセットのファイルが無いときは None（呼び出し側は入力 CSV を読む）
+    """
+    if pa is None or not dataset_dir or not os.path.isdir(dataset_dir) or _dataset(dataset_dir) is None:
+        return None
+    df = latest_candidates(dataset_dir, columns=["url", "status"])
+    df = df[df["status"].isin(statuses) & df["url"].notna()]
+    return df["url"].tolist()
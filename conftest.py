@@ -0,0 +1 @@
+# リポジトリ直下のモジュール（keyword_matcher など）を tests/ から import できるようにするための空の conftest
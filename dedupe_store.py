@@ -0,0 +1,115 @@
+import bisect
+import os
+import threading
+import zlib
+
+from url_utils import canonical_username
+
+# ---------------------------------------------------------
+# アカウントの重複除外（スレッド安全）
+# ---------------------------------------------------------
+# URLそのものではなくユーザー名（小文字）で重複を判定するので、
+# instagram.com/foo と https://www.instagram.com/Foo/?hl=ja は同じアカウントとして扱う。
+# 内部はユーザー名のハッシュで分けた複数の set（シャード）で、シャードごとにロックを持つ。
+# path を指定すると、前回までに出力したアカウントをソート済みのテキストファイル
+# （1行1ユーザー名）から読み込み、今回の実行でも最初から「既出」として扱う。
+
+DEFAULT_SHARDS = 16
+
+
+def normalize_username(url_or_name):
+    """InstagramのURLまたはユーザー名から、比較用のユーザー名（小文字）を取り出す"""
+    if not url_or_name:
+        return None
+    text = url_or_name.strip()
+    if "instagram.com" in text:
+        # 投稿・リールなどプロフィール以外のURLは None
+        return canonical_username(text)
+    text = text.lstrip("@").strip("/")
+    return text.lower() or None
+
+
+class DedupeStore:
+    """ユーザー名の「既出」集合。add() が True を返したスレッドだけがそのアカウントを処理する"""
+
+    def __init__(self, path=None, shards=DEFAULT_SHARDS):
+        self.path = path
+        self.known_skipped = 0   # 前回までの実行で出力済みだったため除外した件数
+        self.duplicates = 0      # 今回の実行内で重複していた件数
+        self._shards = [set() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._counter_lock = threading.Lock()
+        self._known = self._load(path) if path else []
+
+    @staticmethod
+    def _load(path):
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            names = [line.strip() for line in f if line.strip()]
+        # 手で編集された場合に備えて、ソート済みでなければ並べ直す
+        if any(a > b for a, b in zip(names, names[1:])):
+            names.sort()
+        return names
+
+    def _shard(self, key):
+        return zlib.crc32(key.encode("utf-8")) % len(self._shards)
+
+    def is_known(self, key):
+        """前回までの実行で出力済みか（ソート済みリストを二分探索）"""
+        i = bisect.bisect_left(self._known, key)
+        return i < len(self._known) and self._known[i] == key
+
+    def add(self, key):
+        """未出なら登録して True、既出なら False"""
+        if self.is_known(key):
+            with self._counter_lock:
+                self.known_skipped += 1
+            return False
+        i = self._shard(key)
+        with self._locks[i]:
+            if key in self._shards[i]:
+                added = False
+            else:
+                self._shards[i].add(key)
+                added = True
+        if not added:
+            with self._counter_lock:
+                self.duplicates += 1
+        return added
+
+    def discard(self, key):
+        """登録を取り消す（NG等で出力しなかったアカウントを、別の検索結果で判定し直せるようにする）"""
+        i = self._shard(key)
+        with self._locks[i]:
+            self._shards[i].discard(key)
+
+    def __contains__(self, key):
+        if self.is_known(key):
+            return True
+        i = self._shard(key)
+        with self._locks[i]:
+            return key in self._shards[i]
+
+    def __len__(self):
+        return len(self._known) + sum(len(s) for s in self._shards)
+
+    def new_keys(self):
+        """今回の実行で登録されたユーザー名"""
+        keys = []
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                keys.extend(shard)
+        return keys
+
+    def save(self):
+        """前回までの分と今回の分をまとめ、ソートしてファイルに書き出す"""
+        if not self.path:
+            return
+        merged = sorted(set(self._known).union(self.new_keys()))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(merged))
+            if merged:
+                f.write("\n")
+        os.replace(tmp_path, self.path)
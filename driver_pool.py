@@ -0,0 +1,283 @@
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from metrics import METRICS
+
+# ---------------------------------------------------------
+# ブラウザ（WebDriver）の共通設定と使い回しプール
+# ---------------------------------------------------------
+# Chromeの起動と chromedriver の場所の解決は1回あたり数秒かかるので、
+# 起動済みのブラウザをプールしておき、ワーカー間・フェーズ間で使い回す。
+# 一定回数使ったブラウザや、落ちたブラウザは自動で作り直す。
+# 同時に起動する台数の上限（size）は実行中に resize() で変えられる（browser_fleet.py が PC の空き具合から調整する）。
+# 読み込むのは検索結果・プロフィールのHTMLとスクリプトだけでよいので、既定では「軽量モード」で起動する。
+#   - CSS・フォント・画像・動画・計測/広告スクリプトを CDP の Network.setBlockedURLs で読み込まない
+#   - pageLoadStrategy=eager（HTMLの解析が終わった時点で driver.get から戻る。画像などの読み込みは待たない）
+#   - 拡張機能・GPU・バックグラウンド通信を無効にし、画面を表示しない（ヘッドレス）
+# 画面を見ながら確認したいときは、環境変数 SHOW_BROWSER=1 を付けて実行する（または setup_driver(headless=False)）。
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+DEFAULT_MAX_USES = 50   # この回数貸し出したブラウザは作り直す（メモリ肥大対策）
+
+# 軽量モードで読み込まないURL（Network.setBlockedURLs のワイルドカード形式）
+BLOCKED_URL_PATTERNS = [
+    # スタイル・フォント
+    "*.css", "*.css?*", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # 画像・動画・音声（画像は prefs でも止めているが、CSS の背景画像などもまとめて止める）
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.mp4", "*.webm", "*.m4s", "*.m3u8", "*.mp3", "*.ogg",
+    # 計測・広告
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*adservice.google.*", "*connect.facebook.net*", "*bat.bing.com*", "*clarity.ms*",
+    "*scorecardresearch.com*", "*improving.duckduckgo.com*",
+]
+
+# 軽量モードで Chrome に渡す起動オプション
+LEAN_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--disable-dev-shm-usage",
+    "--no-first-run",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false",
+]
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def get_driver_path():
+    """chromedriver のパスを解決する（webdriver_manager の確認はプロセス内で1回だけ）"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def show_browser_requested():
+    """環境変数 SHOW_BROWSER=1 で、画面を表示して動かすよう指定されているか（動作確認用）"""
+    return os.environ.get("SHOW_BROWSER", "").lower() in ("1", "true", "yes")
+
+
+def setup_driver(headless=True, window_size=None, use_driver_manager=True, implicit_wait=5, lean=True):
+    """ブラウザの設定（lean=False なら従来どおり画像だけ止めて、ページの読み込み完了まで待つ）"""
+    options = Options()
+    options.add_argument('--lang=ja-JP')
+    options.add_argument(f"user-agent={USER_AGENT}")
+    if window_size:
+        options.add_argument(f"--window-size={window_size[0]},{window_size[1]}")
+
+    # 画像読み込み無効化（高速化）
+    prefs = {"profile.managed_default_content_settings.images": 2}
+    options.add_experimental_option("prefs", prefs)
+
+    if lean:
+        for argument in LEAN_ARGUMENTS:
+            options.add_argument(argument)
+        options.page_load_strategy = "eager"
+
+    # ヘッドレスモード（画面を表示しない）
+    if headless and not show_browser_requested():
+        options.add_argument('--headless=new')
+
+    # use_driver_manager=False の場合は Selenium 標準のドライバー解決に任せる
+    service = Service(get_driver_path()) if use_driver_manager else Service()
+    driver = webdriver.Chrome(service=service, options=options)
+    driver.implicitly_wait(implicit_wait)
+    if lean:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+def is_alive(driver):
+    """ブラウザがまだ応答するか確認する"""
+    try:
+        driver.window_handles
+        return True
+    except Exception:
+        return False
+
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+class DriverPool:
+    """起動済みブラウザを最大 size 台まで保持し、ワーカーに貸し出すプール"""
+
+    def __init__(self, size, max_uses=DEFAULT_MAX_USES, **driver_options):
+        self.size = size
+        self.max_uses = max_uses
+        self.driver_options = driver_options
+        self.created = 0     # 起動したブラウザの累計
+        self.recycled = 0    # 作り直したブラウザの累計
+        self.uses = 0        # 貸し出して返ってきた回数の累計
+        self.failures = 0    # 起動に失敗した・落ちていたブラウザの累計
+        self._idle = []      # [(driver, 使用回数)]
+        self._live = set()   # 起動中のブラウザ（貸出中を含む）
+        self._total = 0      # 現在存在するブラウザ数（起動中のものを含む）
+        self._waiting = 0    # ブラウザの空きを待っているワーカー数
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _create(self):
+        try:
+            with METRICS.timer("driver_start"):
+                driver = setup_driver(**self.driver_options)
+        except Exception:
+            with self._cond:
+                self.failures += 1
+            raise
+        with self._cond:
+            self.created += 1
+            self._live.add(driver)
+        return driver
+
+    def _discard(self, driver):
+        with self._cond:
+            self._live.discard(driver)
+        _quit(driver)
+
+    def resize(self, size):
+        """
+        同時に起動するブラウザの上限を変える
+        減らす場合、待機中のブラウザはすぐ終了し、貸出中のものは返却された時点で終了する（処理中のページは打ち切らない）
+        """
+        with self._cond:
+            self.size = size
+            excess = []
+            while self._total > size and self._idle:
+                excess.append(self._idle.pop(0)[0])
+                self._total -= 1
+            self._cond.notify_all()
+        for driver in excess:
+            self._discard(driver)
+
+    def status(self):
+        """(上限, 存在するブラウザ数, 空きを待っているワーカー数)"""
+        with self._cond:
+            return self.size, self._total, self._waiting
+
+    def service_pids(self):
+        """起動中の各ブラウザの chromedriver のプロセスID（Chrome 本体はその子プロセス）"""
+        with self._cond:
+            drivers = list(self._live)
+        pids = []
+        for driver in drivers:
+            process = getattr(getattr(driver, "service", None), "process", None)
+            if process is not None:
+                pids.append(process.pid)
+        return pids
+
+    def warm_up(self, count=None):
+        """ブラウザを先にまとめて起動しておく（並列で起動するので待ち時間が短い）"""
+        with self._cond:
+            count = min(count or self.size, self.size - self._total)
+            self._total += max(count, 0)
+        if count <= 0:
+            return
+
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(self._create) for _ in range(count)]
+        with self._cond:
+            for future in futures:
+                if future.exception() is None:
+                    self._idle.append((future.result(), 0))
+                else:
+                    self._total -= 1
+            self._cond.notify_all()
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("DriverPool は既に終了しています")
+                if self._idle:
+                    return self._idle.pop()
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                self._waiting += 1
+                try:
+                    self._cond.wait()
+                finally:
+                    self._waiting -= 1
+
+        # 上限に空きがあれば新しく起動する（ロックの外で起動する）
+        try:
+            return self._create(), 0
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, driver, uses, healthy):
+        retire = not healthy or uses >= self.max_uses
+        with self._cond:
+            self.uses += 1
+            if not healthy:
+                self.failures += 1
+            # resize() で上限を下げた分は、返ってきたブラウザから終了していく
+            shrink = self._total > self.size
+            if retire or shrink or self._closed:
+                self._total -= 1
+                if retire:
+                    self.recycled += 1
+            else:
+                self._idle.append((driver, uses))
+            self._cond.notify()
+        if retire or shrink or self._closed:
+            self._discard(driver)
+
+    @contextmanager
+    def driver(self):
+        """
+        ブラウザを1台借りる
+            with pool.driver() as driver:
+                driver.get(...)
+        ブロック内で例外が起きた場合はブラウザの生存を確認し、落ちていれば作り直す
+        """
+        driver, uses = self._acquire()
+        healthy = True
+        try:
+            yield driver
+        except BaseException:
+            healthy = is_alive(driver)
+            raise
+        finally:
+            self._release(driver, uses + 1, healthy)
+
+    def close(self):
+        """待機中のブラウザを全て終了する（貸出中のものは返却時に終了する）"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for driver, _ in idle:
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
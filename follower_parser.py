@@ -0,0 +1,117 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+# ---------------------------------------------------------
+# 検索スニペットからのフォロワー数の抽出
+# ---------------------------------------------------------
+# 対応している書き方（全角数字・全角コロンは NFKC で半角にしてから調べる）
+#   フォロワー1.2万人 / フォロワー: 1.2万 / フォロワー数 3,456 / 1.5万人フォロワー / 8,200人のフォロワー
+#   10K Followers / 1.2M followers / 5,000 Followers / Followers: 5000
+# 「フォロー中」「Following」はフォロワー数ではないので拾わない。
+# 1件ずつ調べる parse() / parse_count() と、結果一式をまとめて調べて DataFrame で返す parse_many() がある。
+# どの書き方にもラベル（「フォロワー」か「follower」）が入るので、ラベルの無いテキストは正規表現にかけずに飛ばす
+# （正規表現は一致しないテキストで時間がかかるため）。
+# 一致位置（start / end）は NFKC で正規化した後のテキスト上の位置。
+
+UNIT_MULTIPLIERS = {"": 1, "千": 1000, "万": 10000, "K": 1000, "M": 1000000}
+
+_NUM = r"\d[\d,]*(?:\.\d+)?"
+_UNIT = r"万|千|[KkMm](?![a-z])"
+
+# ラベルが先（フォロワー 1.2万人）と、数字が先（1.2万人フォロワー / 10K Followers）の2通り
+FOLLOWER_PATTERN = (
+    rf"(?:フォロワー(?:数)?|Followers?)\s*:?\s*(?P<num_a>{_NUM})\s*(?P<unit_a>{_UNIT})?(?:人)?"
+    rf"|(?P<num_b>{_NUM})\s*(?P<unit_b>{_UNIT})?\s*(?:人)?\s*(?:の)?\s*(?:フォロワー|Followers?\b)"
+)
+_FOLLOWER_RE = re.compile(FOLLOWER_PATTERN, re.IGNORECASE)
+
+FollowerCount = namedtuple("FollowerCount", ["count", "unit", "start", "end", "text"])
+
+
+def _normalize(text):
+    # ASCIIだけのテキストは NFKC で変わらないので省く
+    return text if text.isascii() else unicodedata.normalize("NFKC", text)
+
+
+def _to_count(num, unit):
+    return int(float(num.replace(",", "")) * UNIT_MULTIPLIERS[unit])
+
+
+def _match(text):
+    if "フォロワー" not in text and "follower" not in text.lower():
+        return None
+    match = _FOLLOWER_RE.search(text)
+    if not match:
+        return None
+    if match.group("num_a"):
+        num, unit = match.group("num_a"), match.group("unit_a")
+    else:
+        num, unit = match.group("num_b"), match.group("unit_b")
+    unit = unit.upper() if unit else ""
+    return _to_count(num, unit), unit, match.start(), match.end(), match.group(0)
+
+
+def parse(text):
+    """フォロワー数の記載を探して FollowerCount を返す。見つからなければ None"""
+    if not text:
+        return None
+    found = _match(_normalize(text))
+    return FollowerCount(*found) if found else None
+
+
+def parse_count(text):
+    """フォロワー数（見つからなければ 0）"""
+    if not text:
+        return 0
+    found = _match(_normalize(text))
+    return found[0] if found else 0
+
+
+
+def parse_many(texts):
+    """
+    複数のテキストをまとめて調べ、DataFrame（count / unit / start / end / text）を返す
+    texts が Series なら index を引き継ぐ。見つからなかった行は count が 0、それ以外の列が欠損になる
+    """
+    import numpy as np
+    import pandas as pd
+
+    index = texts.index if isinstance(texts, pd.Series) else None
+    # parse() を1件ずつ呼ぶのと同じ処理を、関数呼び出しを省いて1つのループで行い、見つかった行だけを溜める
+    rows, found = [], []
+    search = _FOLLOWER_RE.search
+    size = 0
+    for i, text in enumerate(texts):
+        size = i + 1
+        if not isinstance(text, str) or not text:
+            continue
+        if not text.isascii():
+            text = unicodedata.normalize("NFKC", text)
+        if "フォロワー" not in text and "follower" not in text.lower():
+            continue
+        match = search(text)
+        if not match:
+            continue
+        if match.group("num_a"):
+            num, unit = match.group("num_a"), match.group("unit_a")
+        else:
+            num, unit = match.group("num_b"), match.group("unit_b")
+        unit = unit.upper() if unit else ""
+        rows.append(i)
+        found.append((_to_count(num, unit), unit, match.start(), match.end(), match.group(0)))
+
+    # 列は見つかった行だけを配列に書き込んで作る（欠損の多い列を1件ずつ変換しない）
+    counts, starts, ends = (np.zeros(size, dtype="int64") for _ in range(3))
+    units, matched = np.full(size, None, dtype=object), np.full(size, None, dtype=object)
+    missing = np.ones(size, dtype=bool)
+    if rows:
+        counts[rows], units[rows], starts[rows], ends[rows], matched[rows] = map(list, zip(*found))
+        missing[rows] = False
+    return pd.DataFrame({
+        "count": counts,
+        "unit": pd.array(units, dtype="str"),
+        "start": pd.arrays.IntegerArray(starts, missing),
+        "end": pd.arrays.IntegerArray(ends, missing.copy()),
+        "text": pd.array(matched, dtype="str"),
+    }, index=index)
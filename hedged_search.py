@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ---------------------------------------------------------
+# 複数の検索エンジンへの同時検索（ヘッジ）
+# ---------------------------------------------------------
+# 1つ目のエンジンに投げて hedge_delay 秒たっても答えが出なければ、次のエンジンにも同時に投げる。
+# どれかのエンジンの結果で合否が確定したら（decide が真を返したら）、残りの検索は打ち切る。
+# 全エンジンが答えても確定しなければ、最後に返ってきた判定を使う（＝不合格）。
+# 最初に投げるエンジンは、これまでに「そのエンジンで合否が確定した割合」が高い順に選ぶ。
+#   hedge_delay=0    : 全エンジンに最初から同時に投げる（レース）
+#   hedge_delay=None : 前のエンジンの答えを待ってから次に投げる（従来どおりの順番待ち）
+
+
+class EngineStats:
+    """エンジン1つ分の 検索回数 / 確定回数 / 失敗 / 打ち切り / 応答時間"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.requests = 0
+        self.decided = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.latency = 0.0
+
+    def hit_rate(self):
+        # 回数が少ないうちは 50% 寄りに見積もる（1回目の結果だけで順番が固定されないように）
+        return (self.decided + 1) / (self.requests + 2)
+
+
+class HedgedSearcher:
+    """検索バックエンドを包み、複数エンジンへのヘッジ付き検索を行う。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, backend, engines, hedge_delay=0.5, max_workers=16, stats=None, learn=True):
+        self.backend = backend
+        self.engines = list(engines)
+        self.hedge_delay = hedge_delay
+        self.learn = learn   # False なら常に engines の順に投げる
+        # 別の HedgedSearcher と学習結果を共有する場合は stats を渡す
+        self.stats = stats if stats is not None else {}
+        for engine in self.engines:
+            self.stats.setdefault(engine, EngineStats(engine))
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def order(self):
+        """確定率の高い順のエンジン一覧"""
+        if not self.learn:
+            return list(self.engines)
+        with self._lock:
+            return sorted(self.engines, key=lambda e: self.stats[e].hit_rate(), reverse=True)
+
+    def _record(self, engine, **counts):
+        with self._lock:
+            stats = self.stats[engine]
+            for name, value in counts.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+    def search(self, query, decide):
+        """
+        decide(結果一覧) で判定し、(判定, エンジン名) を返す
+        判定が真なら確定として残りを打ち切る。全エンジンで失敗した場合は最初の例外を投げる
+        """
+        engines = self.order()
+        started = []      # 投げたエンジン（投げた順）
+        pending = {}      # Future -> (エンジン名, 開始時刻)
+        last = None
+        errors = []
+
+        def launch():
+            engine = engines[len(started)]
+            started.append(engine)
+            pending[self.backend.submit(self._executor, query, engine)] = (engine, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                more = len(started) < len(engines)
+                timeout = self.hedge_delay if more and self.hedge_delay is not None else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # 答えが遅いので次のエンジンにも投げる
+                    launch()
+                    continue
+                for future in done:
+                    engine, start = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        self._record(engine, requests=1, errors=1)
+                        errors.append(e)
+                        continue
+                    verdict = decide(results)
+                    self._record(engine, requests=1, decided=1 if verdict else 0,
+                                 latency=time.monotonic() - start)
+                    if verdict:
+                        return verdict, engine
+                    last = (verdict, engine)
+                if not pending and len(started) < len(engines):
+                    launch()
+        finally:
+            # 確定したら、まだ返ってきていない検索は打ち切る
+            for future, (engine, _) in pending.items():
+                future.cancel()
+                self._record(engine, cancelled=1)
+
+        # どれかのエンジンが（キーワード無しという）答えを返していれば、他のエンジンの失敗は無視する
+        if last is None:
+            raise errors[0]
+        return last
+
+    def print_stats(self):
+        print("🏁 検索エンジン別の成績（確定率の高い順に先に検索）")
+        for engine in self.order():
+            s = self.stats[engine]
+            answered = s.requests - s.errors
+            avg = s.latency / answered if answered else 0.0
+            print(f"   {engine}: 検索 {s.requests}回 | 確定 {s.decided}回 ({s.hit_rate() * 100:.0f}%) | "
+                  f"失敗 {s.errors}回 | 打ち切り {s.cancelled}回 | 平均 {avg:.2f}秒")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
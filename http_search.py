@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import urllib.parse
+from html.parser import HTMLParser
+
+import httpx
+
+from metrics import METRICS
+from rate_limiter import get_limiter, looks_blocked
+
+# ---------------------------------------------------------
+# HTTP版 検索エンジン（Seleniumを使わずに検索結果ページを取得）
+# ---------------------------------------------------------
+# DuckDuckGo / Bing のHTML版結果ページを keep-alive の接続プールで取得し、
+# 軽量なHTMLパーサーでタイトル・URL・スニペットだけを抜き出す。
+# 同時に N 件まで並列で投げるが、アクセス間隔は検索エンジンごとの共有リミッター
+# （rate_limiter.get_limiter）に従い、ブロックされたら自動で減速する。
+
+ENDPOINTS = {
+    "duckduckgo": "https://html.duckduckgo.com/html/",
+    "bing": "https://www.bing.com/search",
+}
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 15
+
+
+class SearchBlockedError(Exception):
+    """検索エンジンに弾かれた（202 / 429 など）"""
+
+
+class _ResultPageParser(HTMLParser):
+    """検索結果ページから (href, title, body) を抜き出す"""
+
+    def __init__(self, engine):
+        super().__init__(convert_charrefs=True)
+        self.engine = engine
+        self.results = []
+        self._field = None   # 今テキストを集めている項目 ("title" / "body")
+        self._depth = 0      # 項目を開いたタグからのネスト深さ
+        self._in_bing_item = False
+        self._in_bing_h2 = False
+
+    def _start_field(self, field):
+        self._field = field
+        self._depth = 1
+        if field == "title" or not self.results:
+            self.results.append({"href": "", "title": "", "body": ""})
+
+    def handle_starttag(self, tag, attrs):
+        if self._field:
+            self._depth += 1
+            return
+
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+
+        if self.engine == "duckduckgo":
+            if tag == "a" and "result__a" in classes:
+                self._start_field("title")
+                self.results[-1]["href"] = _unwrap_ddg_href(attrs.get("href", ""))
+            elif "result__snippet" in classes and self.results:
+                self._start_field("body")
+        else:
+            if tag == "li" and "b_algo" in classes:
+                self._in_bing_item = True
+            elif self._in_bing_item and tag == "h2":
+                self._in_bing_h2 = True
+            elif self._in_bing_h2 and tag == "a" and attrs.get("href", "").startswith("http"):
+                self._start_field("title")
+                self.results[-1]["href"] = attrs["href"]
+            elif self._in_bing_item and tag == "p" and self.results:
+                self._start_field("body")
+
+    def handle_endtag(self, tag):
+        if not self._field:
+            if tag == "li":
+                self._in_bing_item = False
+            elif tag == "h2":
+                self._in_bing_h2 = False
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            self._field = None
+
+    def handle_data(self, data):
+        if self._field:
+            self.results[-1][self._field] += data
+
+
+def _unwrap_ddg_href(href):
+    # DuckDuckGoのHTML版は "//duckduckgo.com/l/?uddg=<本来のURL>&rut=..." 形式で返す
+    if "uddg=" not in href:
+        return href
+    query = urllib.parse.urlparse(href).query
+    return urllib.parse.parse_qs(query).get("uddg", [href])[0]
+
+
+def parse_results(html, engine="duckduckgo"):
+    """結果ページのHTMLを [{"href", "title", "body"}, ...] にする"""
+    parser = _ResultPageParser(engine)
+    parser.feed(html)
+    parser.close()
+    results = []
+    for r in parser.results:
+        r = {k: " ".join(v.split()) for k, v in r.items()}
+        if r["href"]:
+            results.append(r)
+    return results
+
+
+def results_to_text(results):
+    """結果一覧を Selenium の body.text 相当の1つのテキストにまとめる"""
+    return "\n".join(f"{r['title']}\n{r['href']}\n{r['body']}" for r in results)
+
+
+class AsyncSearchClient:
+    """接続を使い回しながら検索結果ページを並列取得するクライアント"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 endpoints=None, limiters=None):
+        self.concurrency = concurrency
+        self.endpoints = dict(ENDPOINTS, **(endpoints or {}))
+        # 検索エンジン名 -> リミッター（省略時は全スクリプト共有のもの）
+        self.limiters = limiters or {}
+        self._timeout = timeout
+        self._client = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "ja-JP,ja;q=0.9"},
+            timeout=self._timeout,
+            limits=limits,
+            follow_redirects=True,
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+
+    def limiter(self, engine):
+        return self.limiters.get(engine) or get_limiter(engine)
+
+    async def fetch_html(self, query, engine="duckduckgo"):
+        url = self.endpoints[engine]
+        params = {"q": query, "kl": "jp-jp"} if engine == "duckduckgo" else {"q": query, "setlang": "ja"}
+        async with self._semaphore:
+            with METRICS.timer("rate_limit", engine=engine):
+                await self.limiter(engine).acquire_async()
+            with METRICS.timer("page_load", engine=engine):
+                response = await self._client.get(url, params=params)
+        METRICS.count("search_requests", backend="http", engine=engine)
+        if response.status_code in (202, 429):
+            self.limiter(engine).report_blocked()
+            METRICS.count("blocked", engine=engine)
+            raise SearchBlockedError(f"{engine}: HTTP {response.status_code}")
+        response.raise_for_status()
+        return response.text
+
+    async def search(self, query, engine="duckduckgo"):
+        """1クエリ分の結果一覧を返す"""
+        html = await self.fetch_html(query, engine)
+        with METRICS.timer("parse", engine=engine):
+            results = parse_results(html, engine)
+        # 結果が0件でCAPTCHA画面っぽければブロック扱い
+        if not results and looks_blocked(html):
+            self.limiter(engine).report_blocked()
+            METRICS.count("blocked", engine=engine)
+            raise SearchBlockedError(f"{engine}: CAPTCHA")
+        self.limiter(engine).report_success()
+        return results
+
+
+class BackgroundSearchClient:
+    """
+    別スレッドのイベントループで AsyncSearchClient を動かし、普通の（スレッドの）コードから使えるようにする
+    複数スレッドから同時に search() を呼ぶと、1つの接続プールを共有したまま並列に取得される
+    """
+
+    def __init__(self, **client_kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._client = AsyncSearchClient(**client_kwargs)
+        self._call(self._client.__aenter__())
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def search(self, query, engine="duckduckgo"):
+        """1クエリ分の結果一覧を返す（取得できるまでこのスレッドは待つ）"""
+        return self._call(self._client.search(query, engine))
+
+    def submit(self, query, engine="duckduckgo"):
+        """
+        検索を開始して concurrent.futures.Future を返す（このスレッドは待たない）
+        Future.cancel() すると取得中のリクエストも打ち切られる
+        """
+        return asyncio.run_coroutine_threadsafe(self._client.search(query, engine), self._loop)
+
+    def close(self):
+        self._call(self._client.__aexit__(None, None, None))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+async def _search_all(queries, engine, on_result, **client_kwargs):
+    async with AsyncSearchClient(**client_kwargs) as client:
+        async def run(key, query):
+            try:
+                results = await client.search(query, engine)
+                error = None
+            except Exception as e:
+                results, error = None, e
+            if on_result:
+                on_result(key, results, error)
+            return key, results, error
+
+        return await asyncio.gather(*(run(key, q) for key, q in queries.items()))
+
+
+def search_many(queries, engine="duckduckgo", on_result=None, **client_kwargs):
+    """
+    複数クエリを並列で検索する（同期関数から呼ぶ用）
+    queries: {キー: 検索クエリ}
+    on_result: 1件終わるごとに on_result(キー, 結果一覧 or None, 例外 or None) を呼ぶ
+    戻り値: {キー: 結果一覧}（失敗したキーは含まない）と {キー: 例外}
+    """
+    outcomes = asyncio.run(_search_all(queries, engine, on_result, **client_kwargs))
+    found = {key: results for key, results, error in outcomes if error is None}
+    errors = {key: error for key, results, error in outcomes if error is not None}
+    return found, errors
@@ -1,16 +1,26 @@
+import argparse
 import time
 import random
 import pandas as pd
-import urllib.parse
-import re
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+import threading
+from browser_fleet import FleetGovernor
+from driver_pool import DriverPool
+from page_wait import WAIT_STATS
+from rate_limiter import configure_limiter, print_limiter_summary
+from task_queue import WorkQueue
+from keyword_matcher import KeywordMatcher
+from follower_parser import parse_count as parse_follower_count
+from verify_cache import VerificationCache
+from http_search import results_to_text
+from run_journal import RunJournal
+from search_backend import create_backend, add_backend_arguments
+from candidate_store import CandidateWriter
+from query_history import QueryHistory
+from query_scheduler import QueryScheduler, build_queries
+from batch_verify import BatchVerifier, BatchWorkQueue
+from url_utils import canonical_url, canonical_username
+from metrics import METRICS
 
 # ==========================================
 # 設定エリア（ここを変更するだけで調整可能）
@@ -37,8 +47,9 @@ SUB_KEYWORDS = [
 
 # 3. NGワード設定（絶対除外）
 # これらがプロフィールや検索結果に含まれていたら即除外
+# ※全角/半角・大文字/小文字は自動で同一視されるので "fx" "ＦＸ" などの重複登録は不要
 NG_WORDS = [
-    "FX", "fx", "ＦＸ", "バイナリー", "暗号資産", "仮想通貨", "ビットコイン", "BTC",
+    "FX", "バイナリー", "暗号資産", "仮想通貨", "ビットコイン", "BTC",
     "自動売買", "EA", "ツール", "サイン", "先出し", "爆益", "日利", "月利",
     "ギャンブル", "バカラ", "競艇", "競馬", "パチンコ", "オンラインカジノ",
     "借金返済", "即日", "現金", "プレゼント", "副業紹介", "コンサル生募集", "料理", "飯"
@@ -50,220 +61,245 @@ MIN_FOLLOWERS = 5000     # 最低フォロワー数
 MAX_FOLLOWERS = 500000   # 最大フォロワー数（有名人すぎる人を除外したい場合）
 
 # 5. システム設定
-MAX_WORKERS = 1          # ブラウザを同時に立ち上げる数（PCが重ければ減らす）
+MAX_WORKERS = 4          # ブラウザを同時に立ち上げる数の上限（アクセス速度は下の DDG_RATE で別に制御）
+MIN_WORKERS = 1          # ブラウザを同時に立ち上げる数の下限（自動調整の開始時の台数）
 SEARCH_LIMIT_PER_KEYWORD = 50 # 1つのキーワード検索で深掘りする件数
+DRIVER_MAX_USES = 50     # 1つのブラウザで処理する件数（超えたら作り直してメモリ肥大を防ぐ）
+MAX_ATTEMPTS = 3         # 失敗したキーワード・アカウントを別のワーカーで再試行する上限回数
+# ブラウザ数の自動調整（browser_fleet.py）。実行中に Chrome 1台あたりのメモリ・CPU を測り、下の予算に収まる範囲で
+# MIN_WORKERS〜MAX_WORKERS 台の間で増やし、PCが重くなったりブラウザの失敗が増えたら減らす
+# False にすると MAX_WORKERS 台で固定（psutil が無い場合は MIN_WORKERS 台で固定）
+AUTO_SCALE_BROWSERS = True
+BROWSER_MEMORY_BUDGET_MB = None   # Chrome 全体で使ってよいメモリ（MB）。None なら空きメモリから下の分を残した範囲
+BROWSER_MEMORY_RESERVE_MB = 1024  # 他のプロセス用に残しておく空きメモリ（MB）
+BROWSER_CPU_BUDGET = 80           # PC全体の CPU 使用率（%）の上限
+
+# DuckDuckGoへのアクセス速度（1秒あたりの検索回数）。全ワーカー・Phase 1/2 で共有する
+# ブロック（CAPTCHA / 202 / 429）を検知したら自動で減速・一時停止し、順調なら max_rate まで加速する
+# ※ページの読み込み待ちとは別。読み込みは結果が表示された時点で次へ進む
+DDG_RATE = {"rate": 0.5, "min_rate": 0.05, "max_rate": 2.0}
+PAGE_LOAD_TIMEOUT = 10     # 結果が表示されるまで待つ最大秒数
+
+# 6. 判定結果キャッシュ（前回までにチェックしたアカウントは検索せず再利用）
+CACHE_FILE = "verify_cache.sqlite3"
+CACHE_TTL_DAYS = 14        # この日数より古い結果は取り直す
+CACHE_MAX_ENTRIES = 200000 # 保存する最大アカウント数（超えたら古い順に削除）
+
+# 7. 検索バックエンド（検索結果の取り方。search_backend.py）
+# "selenium" : ブラウザで検索（従来どおり）
+# "http"     : ブラウザを使わずHTML版の検索結果を並列取得（高速）
+# "ddgs"     : ddgs ライブラリで検索
+# Phase 2 を "selenium" 以外にした場合、取得に失敗したアカウントはブラウザで再チェックする
+# ※ --record DIR で結果を保存、--replay DIR で保存した結果だけを使って（ネットワークなしで）動かせる
+SEARCH_BACKEND = "selenium"  # Phase 1（キーワード検索）
+VERIFY_BACKEND = "http"      # Phase 2（詳細チェック）
+SEARCH_MAX_SCROLLS = 3       # Phase 1 で結果を増やすためにスクロールする最大回数（selenium のみ）
+HTTP_CONCURRENCY = 4         # "http" の同時リクエスト数（アクセス速度は DDG_RATE に従う）
+
+# 8. Phase 1 → Phase 2 の受け渡し
+# 見つかったアカウントは検索の完了を待たずに、すぐ詳細チェックへ回す
+VERIFY_QUEUE_SIZE = 200    # 詳細チェック待ちの上限。超えたら検索側が追いつくまで待つ（背圧）
+# Phase 1 の検索結果のタイトル・スニペットに「1.2万 フォロワー」やNGワードが出ていれば、その場で判定して
+# 詳細チェック（アカウントごとの検索）を省く。フォロワー数が書かれていなかったアカウントだけを Phase 2 に回す
+SNIPPET_JUDGE = True
+# 詳細チェックは何件かのアカウントをまとめて1回で検索する（site:instagram.com/a OR site:instagram.com/b ...）
+# 結果が返ってこなかったアカウントだけ1件ずつ検索し直す。まとめる件数は結果の返り方を見て自動で増減する（batch_verify.py）
+# 0 にすると従来どおり1件ずつ検索する
+VERIFY_BATCH_SIZE = 4
+
+# 9. 途中再開用のジャーナル（終わった検索・見つけた候補・判定結果を1件ずつ追記）
+# 中断したら `python instagram_autofinder.py --resume` で残りの処理だけを続けられる
+JOURNAL_FILE = "autofinder_journal.jsonl"
+
+# 10. 全スクリプト共通のアカウント情報（Parquet）。合否にかかわらず、調べたフォロワー数・NGワードを残す
+# None にすると保存しない
+DATASET_DIR = "pipeline_data"
+
+# 11. 定期実行用の差分モード（--incremental）
+# キーワードごとの前回結果を残しておき、前回と結果が変わらなかったキーワードは何回か飛ばす。
+# 前回までに見つけたことのあるアカウントは詳細チェックせず、新しいアカウントだけを INCREMENTAL_OUTPUT_FILE に出力する
+QUERY_HISTORY_FILE = "autofinder_query_history.json"
+INCREMENTAL_OUTPUT_FILE = "instagram_asset_list2_new.csv"
+
+# 12. 検索する組み合わせの優先順位付け（query_scheduler.py）
+# 単語ごとの「1検索あたりの新しいアカウント数 × 合格率」が高い組み合わせから検索する
+SCHEDULER_MIN_YIELD = 0.5    # 直近 SCHEDULER_WINDOW 件の検索で新しいアカウントが1検索あたりこれを下回ったら検索を打ち切る（0で最後まで）
+SCHEDULER_WINDOW = 10
+SCHEDULER_PRUNE_AFTER = 3    # この回数検索しても新しいアカウントが1件も出ない単語は、残りの組み合わせを飛ばす（0で飛ばさない）
+TERM_REPORT_FILE = "autofinder_term_yield.csv"   # 単語別の成果の保存先（None で保存しない）
+
+# 13. 計測結果（段階別の処理時間・件数）の保存先。実行ごとに JSON を1つ書く（None で保存しない）
+# METRICS_PROMETHEUS = True なら Prometheus のテキスト形式（autofinder.prom）も書き出す
+METRICS_DIR = "metrics"
+METRICS_PROMETHEUS = False
 
 # ==========================================
 # 内部ロジック
 # ==========================================
 
-def setup_driver():
-    """ブラウザの設定"""
-    options = Options()
-    options.add_argument('--lang=ja-JP')
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    # 画像読み込み無効化（高速化）
-    prefs = {"profile.managed_default_content_settings.images": 2}
-    options.add_experimental_option("prefs", prefs)
-    
-    # ヘッドレスモード（画面を表示しない）
-    options.add_argument('--headless')
-
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.implicitly_wait(5)
-    return driver
-
 def clean_instagram_url(url):
-    """URLを綺麗な形（instagram.com/username/）にする"""
-    try:
-        if "?" in url:
-            url = url.split("?")[0]
-        if not url.endswith("/"):
-            url += "/"
-        return url
-    except:
-        return url
+    """URLを綺麗な形（https://www.instagram.com/username/）にする。プロフィール以外はそのまま"""
+    return canonical_url(url) or url
 
 def get_username(url):
-    """URLからユーザー名を取得"""
-    try:
-        parsed = urllib.parse.urlparse(url)
-        path_parts = parsed.path.strip("/").split("/")
-        # /p/xxxxx などの投稿URLを除外
-        if any(x in path_parts for x in ["p", "reel", "stories", "explore", "tags", "tv"]):
-            return None
-        return path_parts[0]
-    except:
-        return None
+    """URLからユーザー名（小文字）を取得。/p/xxxxx などの投稿URLは None"""
+    return canonical_username(url)
 
-def extract_followers_from_text(text):
-    """テキスト（検索スニペット）からフォロワー数を抽出"""
-    if not text: return 0
-    
-    # パターン: "フォロワー 1.2万人", "10K Followers"
-    patterns = [
-        r'フォロワー[:\s]*([\d,\.]+[万KkMm]?)人?',
-        r'([\d,\.]+[KkMm万]?)\s*Followers',
-        r'Followers:?\s*([\d,\.]+[KkMm万]?)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            raw_num = match.group(1)
-            multiplier = 1
-            raw_num = raw_num.replace(",", "")
-            
-            if "万" in raw_num: 
-                multiplier = 10000
-                raw_num = raw_num.replace("万", "")
-            elif "K" in raw_num.upper(): 
-                multiplier = 1000
-                raw_num = raw_num.upper().replace("K", "")
-            elif "M" in raw_num.upper(): 
-                multiplier = 1000000
-                raw_num = raw_num.upper().replace("M", "")
-                
-            try:
-                return int(float(raw_num) * multiplier)
-            except:
-                continue
-    return 0
+NG_MATCHER = KeywordMatcher(NG_WORDS)
 
 def check_ng_words(text):
     """NGワードが含まれているかチェック"""
     if not text: return False # テキストがない場合はセーフ扱い（後で目視）
-    for ng in NG_WORDS:
-        if ng in text:
-            return True # NGワード発見
-    return False
-
-def process_search_query(worker_id, queries):
-    """検索を実行して候補URLを集める（フェーズ1）"""
-    driver = setup_driver()
-    found_urls = set()
-    
-    start_time = time.time()
-    print(f"[Worker-{worker_id}] 検索開始: 担当キーワード {len(queries)} 個🔍")
-    
-    try:
-        for idx, keyword in enumerate(queries):
-            progress_pct = int((idx / len(queries)) * 100)
-            elapsed = int(time.time() - start_time)
-            print(f"  [Worker-{worker_id}] 進捗 [{idx+1}/{len(queries)}] ({progress_pct}%) | {elapsed}秒経過 | キーワード: '{keyword}'")
-            
-            # 検索クエリ作成：インスタ指定 + キーワード + NGワード除外
-            # 例: site:instagram.com 新NISA -FX -バイナリー
-            exclude_str = " ".join([f"-{w}" for w in NG_WORDS[:5]]) # 長すぎるとエラーになるので主要なものだけ
-            full_query = f"site:instagram.com {keyword} {exclude_str}"
-            
-            driver.get("https://duckduckgo.com/")
-            try:
-                # 検索ボックスに入力
-                search_box = driver.find_element(By.NAME, "q")
-                search_box.clear()
-                search_box.send_keys(full_query)
-                search_box.send_keys(Keys.RETURN)
-                time.sleep(3) # 読み込み待ち
-
-                # スクロールして件数を稼ぐ
-                for _ in range(3):
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(1.5)
-
-                # URL取得
-                elements = driver.find_elements(By.XPATH, "//a[contains(@href, 'instagram.com')]")
-                found_count = 0
-                for elem in elements:
-                    url = elem.get_attribute("href")
-                    username = get_username(url)
-                    if username:
-                        clean_url = f"https://www.instagram.com/{username}/"
-                        found_urls.add(clean_url)
-                        found_count += 1
-                
-                print(f"    → {keyword}: {found_count}個 取得 (合計: {len(found_urls)}個)")
-            
-            except Exception as e:
-                print(f"[Worker-{worker_id}] キーワード '{keyword}' でエラー: {e}")
-                continue
-                
-            time.sleep(random.uniform(2, 4)) # レート制限回避
-            
-    finally:
-        driver.quit()
-        total_time = int(time.time() - start_time)
-        print(f"[Worker-{worker_id}] ✅ 検索完了: {len(found_urls)}個 | 所要時間: {total_time}秒")
-        
-    return found_urls
+    return NG_MATCHER.search(text)
+
+def find_ng_words(text):
+    """含まれていたNGワードを一覧で返す"""
+    return NG_MATCHER.find_all(text)
 
-def process_verification(worker_id, urls):
-    """URLごとの詳細チェック（フェーズ2：フォロワー数＆NG判定）"""
-    driver = setup_driver()
+DDG_LIMITER = configure_limiter("duckduckgo", **DDG_RATE)
+
+def search_query(worker_id, keyword, backend):
+    """
+    1つのキーワードで検索して候補URLを集める（フェーズ1）。失敗時は例外を投げて別ワーカーに回す
+    戻り値: {URL: そのアカウントの検索結果のタイトル + スニペット}
+    """
+    # 検索クエリ作成：インスタ指定 + キーワード + NGワード除外
+    # 例: site:instagram.com 新NISA -FX -バイナリー
+    exclude_str = " ".join([f"-{w}" for w in NG_WORDS[:5]]) # 長すぎるとエラーになるので主要なものだけ
+    full_query = f"site:instagram.com {keyword} {exclude_str}"
+
+    # アクセス間隔・ブロック検知はバックエンド側で行う
+    with METRICS.timer("search"):
+        results = backend.search(full_query)
+    METRICS.count("queries")
+
+    found = {}
+    for r in results:
+        url = canonical_url(r["href"])
+        if url:
+            # 同じアカウントが複数件出た場合はテキストをつなげて判定に使う
+            text = f"{r.get('title', '')}\n{r.get('body', '')}"
+            found[url] = f"{found[url]}\n{text}" if url in found else text
+    return found
+
+def judge_account(worker_id, username, url, followers, ng_hits):
+    """NGワードとフォロワー数から合否を判定し、合格なら結果行を返す"""
+    if ng_hits:
+        # print(f"[Worker-{worker_id}] ❌ NGワード検出 {ng_hits} -> {username}")
+        METRICS.count("ng_rejects")
+        return None
+    if followers >= MIN_FOLLOWERS:
+        METRICS.count("qualified")
+        print(f"[Worker-{worker_id}] ✅ 合格! {followers:,}人 -> @{username}")
+        return {
+            "Title": username, # 仮
+            "URL": url,
+            "Followers": followers,
+            "Note": "自動判定OK"
+        }
+    # フォロワー数が取れなかった、または足りない
+    METRICS.count("follower_rejects", reason="missing" if not followers else "low")
+    return None
+
+def split_cached(worker_id, urls, cache):
+    """キャッシュ済みのアカウントは検索せずに判定し、(合格リスト, 未チェックの(username, url)) を返す"""
     valid_accounts = []
-    
-    start_time = time.time()
-    print(f"[Worker-{worker_id}] 詳細チェック開始: {len(urls)}件 ✓")
-    
-    try:
-        for i, url in enumerate(urls):
-            username = get_username(url)
-            if not username: continue
-            
-            # 進捗表示（5件ごと）
-            if (i+1) % 5 == 0:
-                progress_pct = int(((i+1) / len(urls)) * 100)
-                elapsed = int(time.time() - start_time)
-                print(f"  [Worker-{worker_id}] 検査中 [{i+1}/{len(urls)}] ({progress_pct}%) | {elapsed}秒経過")
-            
-            # DuckDuckGoで「username followers」と検索してスニペットを見る
-            # これによりインスタにログインせずに情報を抜く
-            search_query = f'site:instagram.com/{username}'
-            
-            try:
-                driver.get(f"https://duckduckgo.com/?q={urllib.parse.quote(search_query)}")
-                time.sleep(random.uniform(2, 3))
-                
-                # ページテキスト取得
-                body_element = driver.find_element(By.TAG_NAME, "body")
-                page_text = body_element.text
-                
-                # 1. NGワードチェック
-                if check_ng_words(page_text):
-                    # print(f"[Worker-{worker_id}] ❌ NGワード検出 -> {username}")
-                    continue
-                
-                # 2. フォロワー数チェック
-                followers = extract_followers_from_text(page_text)
-                
-                if followers >= MIN_FOLLOWERS:
-                    print(f"[Worker-{worker_id}] ✅ 合格! {followers:,}人 -> @{username}")
-                    valid_accounts.append({
-                        "Title": username, # 仮
-                        "URL": url,
-                        "Followers": followers,
-                        "Note": "自動判定OK"
-                    })
-                else:
-                    # フォロワー数が取れなかった、または足りない
-                    pass
-
-            except Exception as e:
-                continue
+    pending = []
+    for url in urls:
+        username = get_username(url)
+        if not username: continue
+        cached = cache.get(username) if cache else None
+        # NGワードが記録済みならフォロワー数が無くても不合格と決まる
+        if cached and (cached["ng_words"] or (cached["followers"] is not None and cached["ng_words"] is not None)):
+            account = judge_account(worker_id, username, url, cached["followers"], cached["ng_words"])
+            if account:
+                valid_accounts.append(account)
+        else:
+            pending.append((username, url))
 
-    finally:
-        driver.quit()
-        total_time = int(time.time() - start_time)
-        print(f"[Worker-{worker_id}] ✅ チェック完了: {len(valid_accounts)}個合格 | 所要時間: {total_time}秒")
-    
-    return valid_accounts
+    if len(pending) < len(urls):
+        print(f"[Worker-{worker_id}] キャッシュ利用: {len(urls) - len(pending)}件 (検索対象: {len(pending)}件)")
+    return valid_accounts, pending
+
+def check_page_text(worker_id, username, url, page_text, cache, engine, dataset=None):
+    """検索結果のテキストからNGワードとフォロワー数を調べ、キャッシュに残して判定する"""
+    with METRICS.timer("parse"):
+        ng_hits = find_ng_words(page_text)
+        followers = parse_follower_count(page_text)
+    return record_judgement(worker_id, username, url, page_text, followers, ng_hits, cache, engine, dataset)
+
+def check_snippet(worker_id, username, url, snippet, cache, dataset=None):
+    """
+    Phase 1 の検索結果（タイトル + スニペット）だけで判定する
+    戻り値: (判定できたか, 合格なら結果行)。NGワードもフォロワー数も出ていなければ (False, None) で Phase 2 に回す
+    """
+    with METRICS.timer("parse"):
+        ng_hits = find_ng_words(snippet)
+        followers = parse_follower_count(snippet)
+    if not ng_hits and not followers:
+        METRICS.count("snippet_judgements", result="undecided")
+        return False, None
+    # NGワードで決まった場合、フォロワー数は「書かれていなかった」ので 0 ではなく None で残す
+    account = record_judgement(worker_id, username, url, snippet, followers or None, ng_hits, cache, "snippet",
+                               dataset)
+    METRICS.count("snippet_judgements", result="qualified" if account else "rejected")
+    return True, account
+
+def record_judgement(worker_id, username, url, text, followers, ng_hits, cache, engine, dataset=None):
+    """調べたNGワードとフォロワー数をキャッシュ・データセットに残して判定する。合格なら結果行を返す"""
+    if cache:
+        # フォロワー数が見つからなかった（0）場合は None で残し、次回の実行で調べ直す
+        # （結果ページが一時的に空だった・ブロックされていたアカウントを、期限まで不合格のままにしない）
+        cache.put(username, followers=followers or None, ng_words=ng_hits, engine=engine)
+    with METRICS.timer("filter"):
+        account = judge_account(worker_id, username, url, followers, ng_hits)
+    if dataset:
+        dataset.write(username=username, url=url, followers=followers or None, ng_words=ng_hits, engine=engine,
+                      snippet=text, status="verified" if account else "rejected")
+    return account
+
+def verify_account(worker_id, username, url, backend, cache=None, dataset=None):
+    """1アカウントの詳細チェック（フェーズ2：フォロワー数＆NG判定）。合格なら結果行を返す"""
+    # DuckDuckGoで「site:instagram.com/username」と検索してスニペットを見る
+    # これによりインスタにログインせずに情報を抜く
+    # ブロック画面だった場合は例外になるので、キャッシュに残さず別ワーカーで再試行される
+    with METRICS.timer("verify"):
+        results = backend.search(f"site:instagram.com/{username}")
+
+    # 1. NGワードチェック / 2. フォロワー数チェック
+    return check_page_text(worker_id, username, url, results_to_text(results), cache, "duckduckgo", dataset)
+
+def verify_batch(worker_id, tasks, verifier, backend, cache=None, dataset=None):
+    """
+    何件かのアカウントをまとめて1回で検索して詳細チェックする
+    戻り値: ({(username, url): 合格なら結果行}, 結果が返ってこなかった (username, url) の一覧)
+    """
+    if len(tasks) == 1:
+        # 取りこぼしのやり直し・端数は従来どおり1件ずつ（結果が無くてもここで判定する）
+        username, url = tasks[0]
+        verifier.record_single()
+        return {tasks[0]: verify_account(worker_id, username, url, backend, cache, dataset)}, []
+    with METRICS.timer("verify"):
+        by_user, _ = verifier.search([username for username, _ in tasks])
+    decided = {}
+    for username, url in tasks:
+        if username in by_user:
+            decided[(username, url)] = check_page_text(worker_id, username, url, results_to_text(by_user[username]),
+                                                       cache, "duckduckgo", dataset)
+    return decided, [task for task in tasks if task[0] not in by_user]
+
+def open_backend(kind, pool, args, max_scrolls=0):
+    """設定とコマンドライン引数から検索バックエンドを作る"""
+    options = {
+        "http": {"concurrency": HTTP_CONCURRENCY},
+        "selenium": {"page_load_timeout": PAGE_LOAD_TIMEOUT, "max_scrolls": max_scrolls},
+    }.get(kind, {})
+    return create_backend(kind, pool, record_dir=args.record, replay_dir=args.replay, **options)
 
 # ==========================================
 # メイン実行部
 # ==========================================
-def main():
+def run(pool, args):
     print("=" * 60)
     print("=== Instagram 自動リストアップツール（統合版） ===")
     print("=" * 60)
@@ -271,67 +307,285 @@ def main():
     # ---------------------------
     # Phase 1: キーワード生成と検索
     # ---------------------------
-    all_queries = []
-    for m in MAIN_KEYWORDS:
-        for s in SUB_KEYWORDS:
-            all_queries.append(f"{m} {s}")
-    # 単体キーワードも追加
-    all_queries.extend(MAIN_KEYWORDS)
+    # メイン × サブの全組み合わせ + 単体キーワード
+    terms_by_query = build_queries(MAIN_KEYWORDS, SUB_KEYWORDS)
+    all_queries = list(terms_by_query)
     
-    # ランダムにシャッフル
+    # ランダムにシャッフル（成果の見込みが同じ組み合わせの順番）
     random.shuffle(all_queries)
+
+    # 前回の続きから再開する場合は、終わった検索と判定結果を読み戻す
+    journal = RunJournal(JOURNAL_FILE, resume=args.resume)
+    done_queries = journal.done("query")
+    done_verified = journal.done("verified")
+    outstanding = [(username, entry["url"]) for username, entry in journal.done("candidate").items()
+                   if username not in done_verified]
+    if args.resume:
+        all_queries = [q for q in all_queries if q not in done_queries]
+        print(f"\n♻️  前回の続きから再開: 検索済み {len(done_queries)} 通り / 判定済み {len(done_verified)} 件 / "
+              f"判定待ち {len(outstanding)} 件")
+
+    # 差分モードでは、前回と結果が変わらなかったキーワードを飛ばし、新しいアカウントが多いキーワードから調べる
+    history = QueryHistory(QUERY_HISTORY_FILE)
+    for username in journal.done("candidate"):
+        history.add_account(username)
+    skipped_queries = []
+    if args.incremental:
+        all_queries, skipped_queries = history.plan(all_queries)
+        print(f"\n📆 差分モード: 前回と結果が同じだった {len(skipped_queries)} 通りを今回は飛ばします")
+
+    # 成果の出ている単語の組み合わせから検索する（再開時は終わった検索の成果も数えておく）
+    scheduler = QueryScheduler({q: terms_by_query[q] for q in all_queries}, min_yield=SCHEDULER_MIN_YIELD,
+                               window=SCHEDULER_WINDOW, prune_after=SCHEDULER_PRUNE_AFTER)
+    for query, entry in done_queries.items():
+        scheduler.record_search(query, [get_username(url) for url in entry["urls"]],
+                                terms=terms_by_query.get(query))
     
     print(f"\n📋 検索パターン数: {len(all_queries)} 通り")
-    print(f"⚙️  並列ワーカー数: {MAX_WORKERS}")
+    if AUTO_SCALE_BROWSERS:
+        print(f"⚙️  並列ワーカー数: {MAX_WORKERS}（ブラウザは {MIN_WORKERS}〜{MAX_WORKERS}台で自動調整）")
+    else:
+        print(f"⚙️  並列ワーカー数: {MAX_WORKERS}")
     print("\n" + "=" * 60)
     print("🔍 Phase 1: アカウント候補を収集中...")
     print("=" * 60)
 
     phase1_start = time.time()
-    candidate_urls = set()
-    
-    # 並列処理で検索
-    chunk_size = (len(all_queries) // MAX_WORKERS) + 1
-    chunks = [all_queries[i:i + chunk_size] for i in range(0, len(all_queries), chunk_size)]
-    
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_search_query, i+1, chunk) for i, chunk in enumerate(chunks)]
-        for future in as_completed(futures):
-            candidate_urls.update(future.result())
-            
-    phase1_time = int(time.time() - phase1_start)
-    print(f"\n✅ Phase 1 完了")
-    print(f"   📊 ユニークURL候補数: {len(candidate_urls)} 件")
-    print(f"   ⏱️  所要時間: {phase1_time}秒")
-    
-    if len(candidate_urls) == 0:
-        print("\n❌ 候補が見つかりませんでした。終了します。")
-        return
+    verified_data = [entry["account"] for entry in done_verified.values() if entry["account"]]
+    results_lock = threading.Lock()
+    first_hit = []   # 最初の合格が出た時刻
+    cache = VerificationCache(CACHE_FILE, ttl_days=CACHE_TTL_DAYS, max_entries=CACHE_MAX_ENTRIES)
+    dataset = CandidateWriter(DATASET_DIR, stage="autofinder")
+    search_backend = open_backend(SEARCH_BACKEND, pool, args, max_scrolls=SEARCH_MAX_SCROLLS)
+    verify_backend = open_backend(VERIFY_BACKEND, pool, args)
+    # ブラウザ以外で取れなかったアカウントの再チェック用（保存済みの結果で動かす場合は再チェックしない）
+    fallback_backend = None
+    if VERIFY_BACKEND != "selenium" and not args.replay:
+        fallback_backend = open_backend("selenium", pool, args)
+    print(f"🔌 検索バックエンド: Phase 1 = {search_backend.name} / Phase 2 = {verify_backend.name}")
+
+    # --target N: 合格が N 件に達したら、残りの検索・詳細チェックを取り消して、そこまでの結果を保存する
+    target_reached = threading.Event()
+    cancellable = []   # 目標に達したら cancel() するキュー
+
+    def stop_if_target_reached():
+        with results_lock:
+            if not args.target or len(verified_data) < args.target or target_reached.is_set():
+                return
+            target_reached.set()
+        print(f"\n🎯 目標の {args.target} 件に達しました。残りの検索・詳細チェックを取り消します")
+        scheduler.stop(f"目標の {args.target} 件に到達")
+        for queue in list(cancellable):
+            queue.cancel()
+        # ブラウザの空きを待っているワーカーも止める（使用中のブラウザは今のページが終わった時点で閉じる）
+        pool.close()
+
+    def cancel_on_target(queue):
+        cancellable.append(queue)
+        if target_reached.is_set():
+            queue.cancel()
+        return queue
+
+    def add_verified(accounts):
+        with results_lock:
+            if accounts and not first_hit:
+                first_hit.append(time.time())
+                print(f"   ⚡ 最初の合格アカウント: 開始から {int(first_hit[0] - phase1_start)}秒")
+            verified_data.extend(accounts)
+        stop_if_target_reached()
+
+    # 再開時に、前回までの合格で既に目標に達している場合
+    stop_if_target_reached()
+
+    # ブラウザは最初にまとめて起動し、Phase 1 / Phase 2 で使い回す（ブラウザを使う場合のみ）
+    search_backend.warm_up()
+    verify_backend.warm_up()
 
     # ---------------------------
-    # Phase 2: 詳細フィルタリング
+    # Phase 2 側: 詳細チェックのワーカーを先に立ち上げておき、見つかったアカウントから順に処理する
     # ---------------------------
-    print("\n" + "=" * 60)
-    print("✓ Phase 2: フォロワー数とNGワードのチェック中...")
-    print("=" * 60)
-    
-    phase2_start = time.time()
-    url_list = list(candidate_urls)
-    verified_data = []
-    
-    # 並列処理でチェック
-    chunk_size_v = (len(url_list) // MAX_WORKERS) + 1
-    chunks_v = [url_list[i:i + chunk_size_v] for i in range(0, len(url_list), chunk_size_v)]
-    
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_verification, i+1, chunk) for i, chunk in enumerate(chunks_v)]
-        for future in as_completed(futures):
-            verified_data.extend(future.result())
+    def verify_handler(worker_id, task):
+        username, url = task
+        return verify_account(worker_id, username, url, verify_backend, cache, dataset)
+
+    verify_workers = MAX_WORKERS if verify_backend.name == "selenium" else HTTP_CONCURRENCY
+    # 目標件数がある場合は、合格の見込みが高い（合格率の高い単語で見つかった）アカウントから詳細チェックする
+    priority = (lambda task: scheduler.qualify_estimate(task[0])) if args.target else None
+    verifier = None
+    if VERIFY_BATCH_SIZE:
+        # 何件かずつまとめて検索する（1件ずつ submit したものがキュー側でまとまる）
+        verifier = BatchVerifier(verify_backend.search, initial_size=VERIFY_BATCH_SIZE)
+        verify_queue = BatchWorkQueue(lambda worker_id, tasks: verify_batch(worker_id, tasks, verifier, verify_backend,
+                                                                            cache, dataset),
+                                      workers=verify_workers, batch_size=verifier.batch_size,
+                                      max_attempts=MAX_ATTEMPTS, name="Verify",
+                                      maxsize=max(1, VERIFY_QUEUE_SIZE // VERIFY_BATCH_SIZE),
+                                      dedupe_key=lambda task: task[0], priority=priority)
+    else:
+        verify_queue = WorkQueue(verify_handler, workers=verify_workers, max_attempts=MAX_ATTEMPTS, name="Verify",
+                                 maxsize=VERIFY_QUEUE_SIZE, dedupe_key=lambda task: task[0], priority=priority)
+    cancel_on_target(verify_queue).start()
+    failed = []   # 取得できず、ブラウザで再チェックが必要なアカウント
+
+    def collect_verified():
+        for idx, (task, account, error) in enumerate(verify_queue.results(), 1):
+            if error is not None and fallback_backend:
+                failed.append(task)
+            if error is None:
+                journal.record("verified", task[0], account=account)
+                scheduler.record_verdict(task[0], bool(account))
+            if account:
+                add_verified([account])
+            if idx % 20 == 0:
+                elapsed = int(time.time() - phase1_start)
+                print(f"  ✓ 詳細チェック済み {idx}件 | {elapsed}秒経過 | 合格 {len(verified_data)}件")
+
+    collector = threading.Thread(target=collect_verified, daemon=True)
+    collector.start()
+
+    # 前回、判定の途中で止まったアカウントから先に処理する
+    for task in outstanding:
+        verify_queue.submit(task)
+
+    # ---------------------------
+    # Phase 1 側: 検索して見つかった新しいアカウントをその場で詳細チェックに渡す
+    # ---------------------------
+    def search_handler(worker_id, keyword):
+        search_start = time.time()
+        snippets = search_query(worker_id, keyword, search_backend)
+        found_urls = set(snippets)
+        history.record(keyword, [get_username(url) for url in found_urls])
+        new_urls = {url for url in found_urls if history.add_account(get_username(url))}
+        if args.incremental:
+            # 前回までに見つけたことのあるアカウントは調べ直さない
+            found_urls = new_urls
+        scheduler.record_search(keyword, [get_username(url) for url in found_urls], time.time() - search_start)
+        # キャッシュ済みはその場で判定し、残りをキューへ（重複はキュー側で除外、満杯なら待つ）
+        cached_valid, pending = split_cached(worker_id, found_urls, cache)
+        for account in cached_valid:
+            journal.record("verified", account["Title"], account=account)
+        add_verified(cached_valid)
+        pending_urls = {url for _, url in pending}
+        valid_urls = {account["URL"] for account in cached_valid}
+        for url in found_urls - pending_urls:
+            scheduler.record_verdict(get_username(url), url in valid_urls)
+        for username, url in pending:
+            if journal.is_done("verified", username):
+                continue
+            if SNIPPET_JUDGE:
+                # 検索結果のスニペットで決まったアカウントは詳細チェックしない
+                decided, account = check_snippet(worker_id, username, url, snippets[url], cache, dataset)
+                if decided:
+                    journal.record("verified", username, account=account)
+                    scheduler.record_verdict(username, bool(account))
+                    if account:
+                        add_verified([account])
+                    continue
+            if verify_queue.submit((username, url)):
+                METRICS.count("candidates")
+                journal.record("candidate", username, url=url)
+        return found_urls
+
+    candidate_urls = {url for entry in done_queries.values() for url in entry["urls"]}
+    try:
+        # 並列処理で検索（手が空いたワーカーが次のキーワードを取りに行く）
+        # 次に検索する組み合わせは、1件終わるたびにそれまでの成果から選び直す
+        search_queue = WorkQueue(search_handler, workers=MAX_WORKERS, max_attempts=MAX_ATTEMPTS)
+        cancel_on_target(search_queue).start()
+
+        def submit_next():
+            query = scheduler.next()
+            if query is None:
+                return False
+            search_queue.submit(query)
+            return True
+
+        in_flight = sum(1 for _ in range(MAX_WORKERS) if submit_next())
+        if not in_flight:
+            search_queue.close()
+
+        for idx, (keyword, found_urls, error) in enumerate(search_queue.results(), 1):
+            in_flight -= 1
+            if submit_next():
+                in_flight += 1
+            elif not in_flight:
+                search_queue.close()
+            progress_pct = int((idx / len(all_queries)) * 100)
+            elapsed = int(time.time() - phase1_start)
+            if error is not None:
+                print(f"  [{idx}/{len(all_queries)}] ({progress_pct}%) キーワード '{keyword}' でエラー: {error}")
+                continue
+            candidate_urls.update(found_urls)
+            journal.record("query", keyword, urls=sorted(found_urls))
+            print(f"  [{idx}/{len(all_queries)}] ({progress_pct}%) | {elapsed}秒経過 | {keyword}: {len(found_urls)}個 取得 (合計: {len(candidate_urls)}個)")
+        search_queue.print_stats()
+
+        phase1_time = int(time.time() - phase1_start)
+        print(f"\n✅ Phase 1 完了")
+        print(f"   📊 ユニークURL候補数: {len(candidate_urls)} 件")
+        if SNIPPET_JUDGE:
+            decided = sum(METRICS.counter_value("snippet_judgements", result=result)
+                          for result in ("qualified", "rejected"))
+            undecided = METRICS.counter_value("snippet_judgements", result="undecided")
+            print(f"   📝 スニペットで判定: {decided} 件 / 詳細チェックへ: {undecided} 件")
+        print(f"   ⏱️  所要時間: {phase1_time}秒")
+
+        # ---------------------------
+        # Phase 2: 残りの詳細チェックを待つ
+        # ---------------------------
+        print("\n" + "=" * 60)
+        print("✓ Phase 2: 残りのフォロワー数とNGワードのチェック中...")
+        print("=" * 60)
+
+        phase2_start = time.time()
+        verify_queue.close()
+        collector.join()
+        verify_queue.print_stats()
+        if verifier:
+            verifier.print_stats()
+
+        # 取れなかった分だけブラウザで再チェック（目標に達していれば不要）
+        if failed and not target_reached.is_set():
+            print(f"   ↪ 取得失敗 {len(failed)}件 をブラウザで再チェックします")
+            retry_queue = WorkQueue(lambda worker_id, task: verify_account(worker_id, task[0], task[1],
+                                                                           fallback_backend, cache, dataset),
+                                    workers=MAX_WORKERS, max_attempts=MAX_ATTEMPTS).start()
+            for task in failed:
+                retry_queue.submit(task)
+            retry_queue.close()
+            for task, account, error in retry_queue.results():
+                if error is None:
+                    journal.record("verified", task[0], account=account)
+                    scheduler.record_verdict(task[0], bool(account))
+                if account:
+                    add_verified([account])
+            retry_queue.print_stats()
+
+        scheduler.print_report(TERM_REPORT_FILE)
+
+        # 最後まで終わった場合だけ、キーワードごとの結果と見つけたアカウントを次回の差分モード用に残す
+        # （目標に達して途中で止めた場合は、詳細チェックしていない候補が「見つけたことのあるアカウント」にならないように残さない。
+        #   --replay / --record の実行も、記録データのアカウントが次回の実クロールで「既出」にならないように残さない）
+        history.print_summary(skipped=len(skipped_queries))
+        if not args.replay and not args.record and not target_reached.is_set():
+            history.save()
+    finally:
+        for backend in (search_backend, verify_backend, fallback_backend):
+            if backend:
+                backend.close()
+        print(f"   🗂️  キャッシュ: ヒット {cache.hits}件 / ミス {cache.misses}件")
+        cache.close()
+        journal.close()
+        dataset.close()
+
+    if len(candidate_urls) == 0:
+        print("\n❌ 候補が見つかりませんでした。終了します。")
+        return
     
     phase2_time = int(time.time() - phase2_start)
     print(f"\n✅ Phase 2 完了")
     print(f"   📊 合格アカウント数: {len(verified_data)} 件")
-    print(f"   ⏱️  所要時間: {phase2_time}秒")
+    print(f"   ⏱️  所要時間（Phase 1 終了後）: {phase2_time}秒")
     
     # ---------------------------
     # 保存処理
@@ -340,25 +594,63 @@ def main():
     print("💾 結果を保存中...")
     print("=" * 60)
     
+    output_file = INCREMENTAL_OUTPUT_FILE if args.incremental else OUTPUT_FILE
     if verified_data:
         df = pd.DataFrame(verified_data)
         # フォロワー数で降順ソート
         df = df.sort_values(by="Followers", ascending=False)
         
-        df.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
+        with METRICS.timer("write", target=os.path.basename(output_file)):
+            df.to_csv(output_file, index=False, encoding="utf-8-sig")
         print("\n" + "=" * 60)
         print("🎉 完了！")
         print("=" * 60)
         print(f"✅ {len(df)} 件のアカウントリストを作成しました。")
-        print(f"📁 保存先: {OUTPUT_FILE}")
+        print(f"📁 保存先: {output_file}")
         print(f"⏱️  総処理時間: {phase1_time + phase2_time}秒")
+        if target_reached.is_set():
+            print(f"🎯 目標の {args.target} 件に達したため、途中で終了しました"
+                  f"（詳細チェックしていない候補は --resume で続きから調べられます）")
         print("\n📌 次のステップ:")
-        print(f"   1. Excelで {OUTPUT_FILE} を開く")
+        print(f"   1. Excelで {output_file} を開く")
         print("   2. URLをクリックしてアカウントを確認")
         print("   3. 「いいね数/再生数」を目視チェック")
         print("=" * 60)
     else:
         print("\n❌ 条件に合うアカウントが残りませんでした。")
 
+def main():
+    parser = argparse.ArgumentParser(description="Instagram 自動リストアップツール")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"中断した実行を {JOURNAL_FILE} から再開する（終わった検索・判定はやり直さない）")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"前回と検索結果が変わらなかったキーワードを飛ばし、新しいアカウントだけを {INCREMENTAL_OUTPUT_FILE} に出力する")
+    parser.add_argument("--target", type=int, metavar="N",
+                        help="合格が N 件に達したら残りの検索・詳細チェックを取り消し、そこまでの結果を保存して終わる")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    # 自動調整する場合は MIN_WORKERS 台から始め、空きを待つワーカーがいれば予算の範囲で増やす
+    # （ワーカーは MAX_WORKERS 人いて、ブラウザが足りない間は空くのを待つ）
+    pool = DriverPool(MIN_WORKERS if AUTO_SCALE_BROWSERS else MAX_WORKERS, max_uses=DRIVER_MAX_USES)
+    governor = None
+    if AUTO_SCALE_BROWSERS:
+        governor = FleetGovernor(pool, min_size=MIN_WORKERS, max_size=MAX_WORKERS,
+                                 memory_budget_mb=BROWSER_MEMORY_BUDGET_MB, cpu_budget=BROWSER_CPU_BUDGET,
+                                 memory_reserve_mb=BROWSER_MEMORY_RESERVE_MB).start()
+    try:
+        run(pool, args)
+    finally:
+        if governor:
+            governor.stop()
+        pool.close()
+        print(f"🌐 ブラウザ起動回数: {pool.created}回 (作り直し {pool.recycled}回)")
+        if governor:
+            governor.print_stats()
+        WAIT_STATS.print_summary()
+        print_limiter_summary()
+        METRICS.print_summary()
+        METRICS.export("autofinder", METRICS_DIR, prometheus=METRICS_PROMETHEUS)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
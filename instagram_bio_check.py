@@ -1,11 +1,21 @@
-import time
-import random
+import argparse
 import pandas as pd
-import urllib.parse
 import os
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
+from driver_pool import DriverPool
+from page_wait import WAIT_STATS
+from rate_limiter import print_limiter_summary
+from keyword_matcher import KeywordMatcher
+from verify_cache import VerificationCache
+from http_search import results_to_text
+from run_journal import RunJournal
+from search_backend import create_backend, add_backend_arguments
+from task_queue import WorkQueue
+from hedged_search import HedgedSearcher
+from candidate_store import CandidateWriter, latest_urls
+from result_writer import ResultWriter, flush_on_signals
+from metrics import METRICS
+from batch_verify import BatchVerifier, BatchWorkQueue
+from url_utils import canonical_username
 
 # --- 設定 ---
 # フォロワー数フィルタリングが終わったファイル名
@@ -22,127 +32,245 @@ MUST_HAVE_KEYWORDS = [
     "運用", "貯蓄"
 ]
 
-def setup_driver():
-    """テストで成功したシンプルな起動設定"""
-    options = webdriver.ChromeOptions()
-    options.add_argument('--lang=ja-JP')
-    options.add_argument("--window-size=1280,800")
-    
-    # 画像を読み込まない設定（高速化）
-    prefs = {"profile.managed_default_content_settings.images": 2}
-    options.add_experimental_option("prefs", prefs)
+# 途中再開用のジャーナル（合否にかかわらず、判定し終えたURLを1件ずつ追記）
+# 出力ファイルがある間は前回の続きから再開する。最初からやり直す場合は出力ファイルを削除する
+JOURNAL_FILE = "bio_check_journal.jsonl"
+
+# 全スクリプト共通のアカウント情報（Parquet）。合否と見つかったキーワードを残す（None にすると保存しない）
+# 入力もここから読む（pickup / autofinder が候補にしたアカウント）。データセットが無い・pyarrow が無いときは INPUT_CSV_FILE を読む
+DATASET_DIR = "pipeline_data"
+INPUT_STATUSES = ["candidate", "verified"]
+
+# 計測結果（段階別の処理時間・件数）の保存先。実行ごとに JSON を1つ書く（None で保存しない）
+# METRICS_PROMETHEUS = True なら Prometheus のテキスト形式（bio_check.prom）も書き出す
+METRICS_DIR = "metrics"
+METRICS_PROMETHEUS = False
+
+# 判定結果キャッシュ（instagram_autofinder.py と共用可）
+CACHE_FILE = "verify_cache.sqlite3"
+CACHE_TTL_DAYS = 14
+CACHE_MAX_ENTRIES = 200000
+
+# 検索バックエンド（"http": ブラウザを使わず並列取得 / "selenium": 従来どおりブラウザで1件ずつ / "ddgs"）
+# "selenium" 以外で取得できなかったアカウントは自動的にブラウザで再チェックする
+# ※アクセス速度は検索エンジンごとの共有リミッター（rate_limiter.ENGINE_LIMITS）に従う
+# ※ --record DIR で結果を保存、--replay DIR で保存した結果だけを使って（ネットワークなしで）動かせる
+VERIFY_BACKEND = "http"
+HTTP_CONCURRENCY = 4
+
+# 1アカウントを調べる検索エンジン。最初のエンジンで HEDGE_DELAY 秒たっても答えが出なければ次のエンジンにも同時に投げ、
+# どれかでキーワードが見つかった時点で残りは打ち切る（最初に投げるエンジンは、見つかった割合の高い順に自動で決まる）
+# 0 にすると最初から全エンジンに同時に投げる。None にすると1つずつ順番に調べる（ブラウザで調べる場合は常に順番）
+HEDGE_ENGINES = ["duckduckgo", "bing"]
+HEDGE_DELAY = 0.5
+
+# 何件かのアカウントをまとめて1回で検索する（site:instagram.com/a OR site:instagram.com/b ...）
+# 結果が返ってこなかったアカウントと、結果にキーワードが無かったアカウントは1件ずつ（全エンジンで）検索し直す。
+# まとめる件数は結果の返り方を見て自動で増減する（batch_verify.py）
+# 0 にすると従来どおり1件ずつ検索する
+VERIFY_BATCH_SIZE = 4
+
+# ブラウザ設定（webdriver_managerを使わない）。軽量モード・画面表示なしで動かす（driver_pool.py）
+# 画面を見ながら確認したいときは SHOW_BROWSER=1 を付けて実行する
+BROWSER_OPTIONS = {"window_size": (1280, 800), "use_driver_manager": False}
+DRIVER_MAX_USES = 100     # この件数を処理したらブラウザを作り直す
+PAGE_LOAD_TIMEOUT = 10    # 結果が表示されるまで待つ最大秒数
 
-    # ★ここが変更点: webdriver_managerを使わず、シンプルに起動
-    driver = webdriver.Chrome(options=options)
-    return driver
+BIO_MATCHER = KeywordMatcher(MUST_HAVE_KEYWORDS)
 
 def check_bio_text(text):
     if not text: return False
-    for keyword in MUST_HAVE_KEYWORDS:
-        if keyword in text:
-            return True
+    return BIO_MATCHER.search(text)
+
+def find_bio_keywords(text):
+    """プロフィールに含まれていたキーワードを一覧で返す"""
+    return BIO_MATCHER.find_all(text)
+
+def report_result(label, target_url, hits, journal, output, dataset, engine=None):
+    """判定結果を表示し、合格ならURLを追記保存する。合格なら True"""
+    journal.record("checked", target_url, hits=hits)
+    dataset.write(url=target_url, bio_keywords=hits, engine=engine, status="bio_ok" if hits else "bio_ng")
+    METRICS.count("bio_checks", result="ok" if hits else "ng")
+    if hits:
+        print(f"{label} -> [OK] 合格 ({', '.join(hits)})")
+        # URLのみを追記保存（まとめて書き出す）
+        output.write(target_url)
+        return True
+    print(f"{label} -> [NG] 除外")
     return False
 
-def get_username_from_url(url):
-    try:
-        parsed = urllib.parse.urlparse(url)
-        path_parts = parsed.path.strip("/").split("/")
-        return path_parts[-1]
-    except:
-        return None
+def check_account(username, searcher):
+    """
+    複数の検索エンジンで調べ、どれかでキーワードが見つかれば合格
+    戻り値: (見つかったキーワード, 判定に使った検索エンジン)
+    """
+    query = f"site:instagram.com/{username}"
+    METRICS.count("queries")
+    with METRICS.timer("verify"):
+        return searcher.search(query, lambda results: find_bio_keywords(results_to_text(results)))
+
+def open_batch_verifier(searcher):
+    """ヘッジ検索でまとめ検索する BatchVerifier（結果にはどのエンジンの結果かを付けておく）"""
+    def search(query):
+        results, engine = searcher.search(query, lambda results: results)
+        return [dict(r, engine=engine) for r in results]
+    return BatchVerifier(search, initial_size=VERIFY_BATCH_SIZE)
+
+def check_batch(usernames, searcher, verifier):
+    """
+    何件かのアカウントをまとめて1回で検索し、キーワードが見つかったアカウントだけをその場で合格にする
+    戻り値: ({ユーザー名: (見つかったキーワード, 検索エンジン)}, 1件ずつ調べ直すユーザー名の一覧)
+    """
+    if len(usernames) == 1:
+        # 取りこぼしのやり直し・端数は従来どおり1件ずつ（全エンジンで調べ、結果が無くてもここで判定する）
+        verifier.record_single()
+        return {usernames[0]: check_account(usernames[0], searcher)}, []
+    METRICS.count("queries")
+    with METRICS.timer("verify"):
+        by_user, missed = verifier.search(usernames)
+    decided = {}
+    for username, results in by_user.items():
+        hits = find_bio_keywords(results_to_text(results))
+        if hits:
+            decided[username] = (hits, results[0]["engine"])
+        else:
+            # まとめ検索は最初に結果を返したエンジンの1ページだけで見ているので、キーワードが無かったアカウントは
+            # 1件ずつの検索（check_account）で他のエンジンも調べ直す
+            missed.append(username)
+    return decided, missed
+
+def verify_all(targets, total, searcher, workers, cache, journal, output, dataset):
+    """
+    targets を並列で判定し、結果を保存する
+    戻り値: (取得に失敗した targets, 合格件数)
+    """
+    by_user = {username: (i, target_url) for i, username, target_url in targets}
+    verifier = None
+    if VERIFY_BATCH_SIZE:
+        verifier = open_batch_verifier(searcher)
+        queue = BatchWorkQueue(lambda worker_id, usernames: check_batch(usernames, searcher, verifier),
+                               workers=workers, batch_size=verifier.batch_size, name=searcher.backend.name).start()
+    else:
+        queue = WorkQueue(lambda worker_id, username: check_account(username, searcher),
+                          workers=workers, name=searcher.backend.name).start()
+    for username in by_user:
+        queue.submit(username)
+    queue.close()
+
+    failed = []
+    success_count = 0
+    for username, outcome, error in queue.results():
+        i, target_url = by_user[username]
+        if error is not None:
+            print(f"[{i+1}/{total}] {username} [Error] 通信エラー: {error}")
+            failed.append((i, username, target_url))
+            continue
+        hits, engine = outcome
+        cache.put(username, bio_keywords=hits, engine=engine)
+        if report_result(f"[{i+1}/{total}] {username} ({engine})", target_url, hits, journal, output, dataset, engine):
+            success_count += 1
+    queue.print_stats()
+    if verifier:
+        verifier.print_stats()
+    searcher.print_stats()
+    return failed, success_count
+
+def open_backend(kind, pool, args):
+    """設定とコマンドライン引数から検索バックエンドを作る"""
+    options = {
+        "http": {"concurrency": HTTP_CONCURRENCY},
+        "selenium": {"page_load_timeout": PAGE_LOAD_TIMEOUT},
+    }.get(kind, {})
+    return create_backend(kind, pool, record_dir=args.record, replay_dir=args.replay, **options)
 
 def main():
+    parser = argparse.ArgumentParser(description="Instagram プロフィール判定")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
     print("=== Instagram プロフィール判定（最終版）開始 ===")
     
-    # 1. データ読み込み
-    if not os.path.exists(INPUT_CSV_FILE):
+    # 1. データ読み込み（データセットがあればそこから、無ければ CSV から）
+    urls = latest_urls(DATASET_DIR, INPUT_STATUSES)
+    if urls is not None:
+        df = pd.DataFrame({"URL": urls})
+        print(f"入力データ: {len(df)} 件（{DATASET_DIR}）")
+    elif not os.path.exists(INPUT_CSV_FILE):
         print(f"エラー: {INPUT_CSV_FILE} が見つかりません。")
         return
-
-    try:
-        df = pd.read_csv(INPUT_CSV_FILE)
-        print(f"入力データ: {len(df)} 件")
-    except Exception as e:
-        print(f"エラー: ファイル読み込み失敗 ({e})")
-        return
-
-    # 2. 既に完了したURLがあればスキップ（途中再開用）
-    processed_urls = set()
-    if os.path.exists(OUTPUT_CSV_FILE):
+    else:
         try:
-            done_df = pd.read_csv(OUTPUT_CSV_FILE)
-            if 'URL' in done_df.columns:
-                processed_urls = set(done_df['URL'].tolist())
-                print(f"既存の完了データ {len(processed_urls)} 件をスキップします。")
-        except:
-            pass
-            
-    # 出力ファイルの準備（ヘッダー作成）
-    if not os.path.exists(OUTPUT_CSV_FILE):
-        pd.DataFrame(columns=['URL']).to_csv(OUTPUT_CSV_FILE, index=False, encoding="utf-8-sig")
+            df = pd.read_csv(INPUT_CSV_FILE)
+            print(f"入力データ: {len(df)} 件")
+        except Exception as e:
+            print(f"エラー: ファイル読み込み失敗 ({e})")
+            return
 
-    # ブラウザ起動
-    print("ブラウザを起動中...")
-    driver = setup_driver()
-    driver.implicitly_wait(5)
-    print("チェックを開始します。")
+    # 2. 既に判定したURLがあればスキップ（途中再開用）
+    # 合格分だけでなく不合格だったURLもジャーナルに残っているので、再開時に調べ直さない
+    resume = os.path.exists(OUTPUT_CSV_FILE)
+    journal = RunJournal(JOURNAL_FILE, resume=resume)
+    processed_urls = set(journal.done("checked"))
+    # 出力ファイルの準備（無ければヘッダーを書く）。ジャーナル導入前の合格分も索引からスキップ対象になる
+    output = ResultWriter(OUTPUT_CSV_FILE, header=["URL"], encoding="utf-8-sig")
+    flush_on_signals()
+    if resume:
+        print(f"既存の完了データ（判定済み {len(processed_urls)} 件 / 合格 {len(output)} 件）をスキップします。")
 
+    cache = VerificationCache(CACHE_FILE, ttl_days=CACHE_TTL_DAYS, max_entries=CACHE_MAX_ENTRIES)
+    pool = DriverPool(1, max_uses=DRIVER_MAX_USES, **BROWSER_OPTIONS)
+    dataset = CandidateWriter(DATASET_DIR, stage="bio_check")
     total = len(df)
     success_count = 0
+    searchers = []
+    engine_stats = {}   # 検索エンジンごとの成績（ブラウザでの再チェックにも引き継ぐ）
 
     try:
+        # 3. 未チェックのアカウントを洗い出す（前回までに調べたものはキャッシュで判定）
+        targets = []
         for i, row in df.iterrows():
             target_url = row['URL']
             
             # スキップ処理
-            if target_url in processed_urls:
+            if target_url in processed_urls or target_url in output:
                 continue
                 
-            username = get_username_from_url(target_url)
+            username = canonical_username(target_url)
             if not username:
                 continue
-            
-            print(f"[{i+1}/{total}] {username} ...", end="")
-            
-            # DuckDuckGoでプロフィール検索
-            query = f'site:instagram.com/{username}'
-            encoded_query = urllib.parse.quote(query)
-            ddg_url = f"https://duckduckgo.com/?q={encoded_query}&ia=web"
-            
-            is_verified = False
-            try:
-                driver.get(ddg_url)
-                # 読み込み待ち（ランダムにしてブロック回避）
-                time.sleep(random.uniform(2, 3))
-                
-                # ページ全体のテキストを取得
-                body_text = driver.find_element(By.TAG_NAME, "body").text
-                
-                # キーワード判定
-                if check_bio_text(body_text):
-                    is_verified = True
-                else:
-                    # DDGで見つからない場合、念のためBingで再確認
-                    print(" (Bingで再確認)...", end="")
-                    bing_url = f"https://www.bing.com/search?q={encoded_query}"
-                    driver.get(bing_url)
-                    time.sleep(random.uniform(2, 3))
-                    body_text = driver.find_element(By.TAG_NAME, "body").text
-                    if check_bio_text(body_text):
-                        is_verified = True
-
-            except Exception as e:
-                print(f" [Error] 通信エラー: {e}")
+
+            cached = cache.get(username)
+            if cached and cached["bio_keywords"] is not None:
+                if report_result(f"[{i+1}/{total}] {username} (キャッシュ)", target_url, cached["bio_keywords"],
+                                 journal, output, dataset, cached["engine"]):
+                    success_count += 1
                 continue
 
-            # 結果処理
-            if is_verified:
-                print(" -> [OK] 合格")
-                # URLのみを追記保存
-                pd.DataFrame({'URL': [target_url]}).to_csv(OUTPUT_CSV_FILE, mode='a', header=False, index=False, encoding="utf-8-sig")
-                success_count += 1
-            else:
-                print(" -> [NG] 除外")
+            targets.append((i, username, target_url))
+
+        # 4. 設定したバックエンドでまとめてチェック（ブラウザは1台なので selenium の場合は1件ずつ）
+        if targets:
+            backend = open_backend(VERIFY_BACKEND, pool, args)
+            browser = backend.name == "selenium"
+            searcher = HedgedSearcher(backend, HEDGE_ENGINES, hedge_delay=None if browser else HEDGE_DELAY,
+                                      stats=engine_stats)
+            searchers.append(searcher)
+            workers = 1 if browser else HTTP_CONCURRENCY
+            print(f"{backend.name} で {len(targets)} 件をチェックします（同時 {workers} 件）...")
+            backend.warm_up()
+            targets, count = verify_all(targets, total, searcher, workers, cache, journal, output, dataset)
+            success_count += count
+
+        # 5. 取得できなかった分はブラウザで再チェック（保存済みの結果で動かす場合は再チェックしない）
+        if targets and VERIFY_BACKEND != "selenium" and not args.replay:
+            print(f"取得できなかった {len(targets)} 件をブラウザで再チェックします。")
+            backend = open_backend("selenium", pool, args)
+            searcher = HedgedSearcher(backend, HEDGE_ENGINES, hedge_delay=None, stats=engine_stats)
+            searchers.append(searcher)
+            print("ブラウザを起動中...")
+            backend.warm_up()
+            _, count = verify_all(targets, total, searcher, 1, cache, journal, output, dataset)
+            success_count += count
 
     except KeyboardInterrupt:
         print("\n\n[停止] ユーザー操作により中断されました。")
@@ -150,7 +278,18 @@ def main():
     except Exception as e:
         print(f"\n[エラー] 予期せぬエラー: {e}")
     finally:
-        driver.quit()
+        for searcher in searchers:
+            searcher.close()
+            searcher.backend.close()
+        pool.close()
+        cache.close()
+        journal.close()
+        output.close()
+        dataset.close()
+        WAIT_STATS.print_summary()
+        print_limiter_summary()
+        METRICS.print_summary()
+        METRICS.export("bio_check", METRICS_DIR, prometheus=METRICS_PROMETHEUS)
         print(f"\n=== 終了 ===")
         print(f"今回保存された件数: {success_count} 件")
         print(f"ファイル: {OUTPUT_CSV_FILE}")
@@ -1,9 +1,19 @@
+import argparse
 import re
-import time
+import threading
 import pandas as pd
-from ddgs import DDGS
 from urllib.parse import unquote
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from keyword_matcher import KeywordMatcher
+from rate_limiter import configure_limiter, print_limiter_summary
+from dedupe_store import DedupeStore
+from follower_parser import parse_many as parse_followers
+from search_backend import create_backend, add_backend_arguments, SELENIUM_ENGINES
+from http_search import ENDPOINTS as HTTP_ENGINES
+from candidate_store import CandidateWriter
+from query_history import QueryHistory
+from metrics import METRICS
+from url_utils import canonical_url, canonical_username
 
 # ---------------------------------------------------------
 # 設定・条件定義
@@ -59,99 +69,193 @@ NG_WORDS = [
 # 目標収集数（各キーワードごとの最大取得数）
 MAX_RESULTS_PER_KEYWORD = 1000 
 
+# --target N（候補が N 件集まったら残りのキーワードを取り消して終わる）の場合、各キーワードで取る件数は
+# 「残りの必要件数 ÷ これまでの 候補数/検索結果数」にする（まだ分からない間は候補になる割合を下の値とみなす）
+# 並列で検索中のキーワードから出てきそうな候補数は「残り」から先に引いておく。少なすぎても困るので TARGET_MIN_RESULTS 件は取る
+TARGET_CANDIDATE_RATE = 0.3
+TARGET_MIN_RESULTS = 30
+
 # フォロワー数の最低ライン
 MIN_FOLLOWERS = 5000
 
+# 同時に検索するキーワード数
+MAX_WORKERS = 6
+
+# 検索のアクセス速度（1秒あたりの検索回数）。全スレッドで共有する
+# レート制限（202 / RatelimitException）を受けたら自動で減速・一時停止し、順調なら max_rate まで加速する
+DDGS_RATE = {"rate": 0.5, "min_rate": 0.05, "max_rate": 2.0, "burst": 2}
+
+# レート制限を受けたときに同じキーワードを再試行する回数
+MAX_RETRIES = 3
+
+# 検索バックエンド（"ddgs" / "http" / "selenium"）と検索エンジン
+# ddgs は "auto"（自動選択）や "duckduckgo" / "bing" など。"http" / "selenium" は "duckduckgo" か "bing"（"auto" なら "duckduckgo"）
+SEARCH_BACKEND = "ddgs"
+SEARCH_ENGINE = "auto"
+SELENIUM_BROWSERS = 2   # "selenium" のとき同時に起動するブラウザ数（キーワードのスレッドはブラウザの空きを待つ）
+
+# 出力ファイル名
+OUTPUT_FILE = "instagram_candidates.csv"
+
+# 定期実行用の差分モード（--incremental）
+# 出力済みアカウントを DELIVERED_FILE に残し、次回以降は NG・フォロワー数の判定より前に除外する。
+# 前回と結果が変わらなかったキーワードは飛ばし、新しいアカウントだけを INCREMENTAL_OUTPUT_FILE に出力する
+# （--incremental を付けない実行は、毎回すべてのアカウントを対象にして OUTPUT_FILE に出力する）
+DELIVERED_FILE = "pickup_delivered.txt"
+QUERY_HISTORY_FILE = "pickup_query_history.json"
+INCREMENTAL_OUTPUT_FILE = "instagram_candidates_new.csv"
+
+# 計測結果（段階別の処理時間・件数）の保存先。実行ごとに JSON を1つ書く（None で保存しない）
+# METRICS_PROMETHEUS = True なら Prometheus のテキスト形式（pickup.prom）も書き出す
+METRICS_DIR = "metrics"
+METRICS_PROMETHEUS = False
+
+# 全スクリプト共通のアカウント情報（Parquet）。CSVに出さないスニペット・推定フォロワー数もここに残す
+# None にすると保存しない
+DATASET_DIR = "pipeline_data"
+
 # ---------------------------------------------------------
 # 関数定義
 # ---------------------------------------------------------
 
-def extract_follower_count(text):
+def is_profile_url(url):
     """
-    検索スニペットからフォロワー数を抽出して数値化する関数
-    戻り値: (推定人数(int), テキスト(str))
+    Instagramのアカウントプロフィールページのみを許可する関数
+    許可パターン: instagram.com/username/ （?hl=ja などのクエリ・/tagged/ などのタブ付きも同じアカウント）
+    除外パターン: /p/, /reel/, /explore/, /tv/, /stories/, /accounts/login など
     """
-    if not text:
-        return 0, ""
+    return canonical_username(url) is not None
 
-    # パターン: "フォロワー 1.2万人", "10K Followers", "5000 Followers"
-    # DuckDuckGoの検索結果には "〇〇 Followers" と出ることが多い
-    
-    # パターンA: 日本語「万人」表記 (例: 1.5万人)
-    match_jp = re.search(r'(\d+(?:\.\d+)?)万\s*人?\s*フォロワー', text)
-    if match_jp:
-        num = float(match_jp.group(1)) * 10000
-        return int(num), match_jp.group(0)
-
-    # パターンB: "K"表記 (例: 10.5K Followers)
-    match_k = re.search(r'(\d+(?:\.\d+)?)K\s*Followers', text, re.IGNORECASE)
-    if match_k:
-        num = float(match_k.group(1)) * 1000
-        return int(num), match_k.group(0)
-
-    # パターンC: 通常の数字 (例: 5000 Followers)
-    match_num = re.search(r'([\d,]+)\s*Followers', text, re.IGNORECASE)
-    if match_num:
-        num = int(match_num.group(1).replace(',', ''))
-        return num, match_num.group(0)
-
-    return 0, "記載なし"
-
-def is_profile_url(url):
+def search_engine(kind=None):
     """
-    Instagramのアカウントプロフィールページのみを許可する関数
-    允許パターン: instagram.com/username/ または instagram.com/username
-    除外パターン: /p/, /reel/, /explore/, /tv/, /stories/, /tagged/ など
+    バックエンドに渡す検索エンジン名（http / selenium には "auto" が無いので duckduckgo にする）
+    そのバックエンドで使えないエンジンなら ValueError
     """
-    if not url:
-        return False
-    
-    # 除外パターン
-    exclude_patterns = [
-        '/p/', '/reel/', '/explore/', '/tv/', '/stories/', 
-        '/tagged/', '/popular/', '/accounts/login', '?'
-    ]
-    
-    for pattern in exclude_patterns:
-        if pattern in url:
-            return False
-    
-    # instagram.com/username/ または instagram.com/username の形式のみ許可
-    # 正規表現で instagram.com/[username]/ の形式を確認
-    pattern = r'instagram\.com/[a-zA-Z0-9._-]+/?$'
-    match = re.search(pattern, url)
-    return match is not None
+    kind = kind or SEARCH_BACKEND
+    if kind in ("ddgs", "replay"):
+        return SEARCH_ENGINE
+    engine = "duckduckgo" if SEARCH_ENGINE == "auto" else SEARCH_ENGINE
+    available = HTTP_ENGINES if kind == "http" else SELENIUM_ENGINES
+    if engine not in available:
+        raise ValueError(f"{kind} バックエンドでは検索エンジン {SEARCH_ENGINE!r} は使えません（{' / '.join(available)}）")
+    return engine
+
+NG_MATCHER = KeywordMatcher(NG_WORDS)
+DDGS_LIMITER = configure_limiter("ddgs", **DDGS_RATE)
 
 def is_safe_content(text):
     """NGワードが含まれていないかチェック"""
     if not text:
         return True
-    for ng in NG_WORDS:
-        if ng in text:
-            return False
-    return True
+    return not NG_MATCHER.search(text)
+
+def extract_display_name(title):
+    """検索結果のタイトルからアカウント名を抽出する"""
+    if not title:
+        return "不明"
+
+    # パターン1: "Account Name (@username) • Instagram photos and videos" の形式
+    match = re.search(r'^([^(@]*?)\s*\(@', title)
+    if match:
+        name = match.group(1).strip()
+        if name:
+            return name
+
+    # パターン2: "Name • Description" 形式
+    if ' • ' in title:
+        name = title.split(' • ')[0].strip()
+        if name and not name.startswith('http'):
+            return name
+
+    # パターン3: "Name | Description" 形式
+    if ' | ' in title:
+        name = title.split(' | ')[0].strip()
+        if name and not name.startswith('http'):
+            return name
+
+    # パターン4: "Instagram" や "Хэштег" などの言語が含まれている場合は最初の部分を抽出
+    if 'Instagram' in title:
+        name = title.split('Instagram')[0].strip()
+        if name and len(name) > 1:
+            return name
 
-def search_keyword(keyword, seen_urls):
+    # パターン5: "@" で始まっていない場合は最初の50文字までを取得
+    name = title.split(' - ')[0].strip() if ' - ' in title else title.strip()
+    if name and not name.startswith('http') and len(name) < 100:
+        return name
+
+    # URLから@usernameを抽出（最後の手段）
+    return "不明"
+
+class TargetTracker:
+    """--target N: 集まった候補数を数え、残りに必要な分だけ検索させる。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, target):
+        self.target = target
+        self.candidates = 0
+        self.results = 0        # 取った検索結果の件数
+        self.expected = 0.0     # 検索中のキーワードから出てきそうな候補数
+        self.reached = threading.Event()
+        self._lock = threading.Lock()
+
+    def _rate(self):
+        return self.candidates / self.results if self.candidates else TARGET_CANDIDATE_RATE
+
+    def start(self):
+        """
+        次のキーワードで取る検索結果の件数を決める。(件数, 見込んだ候補数) を返す
+        検索を始める前に呼び、終わったら add() に同じ「見込んだ候補数」を渡す（その間に割合が変わっても差し引きが合うように）
+        """
+        with self._lock:
+            rate = max(self._rate(), 0.01)
+            remaining = self.target - self.candidates - self.expected
+            wanted = min(MAX_RESULTS_PER_KEYWORD, max(TARGET_MIN_RESULTS, int(remaining / rate) + 1))
+            reserved = wanted * rate
+            self.expected += reserved
+            return wanted, reserved
+
+    def add(self, reserved, results, candidates):
+        """1キーワード分の結果を数える（失敗した場合は results, candidates を 0 で）"""
+        with self._lock:
+            self.expected = max(0.0, self.expected - reserved)
+            self.results += results
+            self.candidates += candidates
+            if self.candidates >= self.target:
+                self.reached.set()
+
+def search_keyword(keyword, seen, backend, history=None, tracker=None):
     """1つのキーワードで検索を実行する関数（並列実行用）"""
     results_list = []
+    candidates = []
     query = f"site:instagram.com {keyword}"
+    if tracker and tracker.reached.is_set():
+        # 目標に達した後に始まったキーワードは検索しない
+        return None
+    max_results, reserved = tracker.start() if tracker else (MAX_RESULTS_PER_KEYWORD, 0.0)
     print(f"検索開始: {query}")
     
     try:
-        with DDGS(timeout=30) as ddgs:
-            results = ddgs.text(query, region='jp-jp', safesearch='off', max_results=MAX_RESULTS_PER_KEYWORD)
-            
+        with METRICS.timer("search"):
+            results = backend.search(query, engine=search_engine(), max_results=max_results)
+        METRICS.count("queries")
+        if history:
+            usernames = (canonical_username(r.get('href', '')) for r in results)
+            history.record(keyword, [username for username in usernames if username])
+        
+        with METRICS.timer("filter"):
             for r in results:
                 url = r.get('href', '')
                 title = r.get('title', '')
                 body = r.get('body', '')
 
-                # URLがInstagramアカウントプロフィール以外の場合は除外
-                if not is_profile_url(url):
+                # URLがInstagramアカウントプロフィール以外の場合は除外（?hl=ja などを落とした形にそろえる）
+                url = canonical_url(url)
+                if not url:
                     continue
-                
-                # 重複除外
-                if url in seen_urls:
+
+                # 重複除外（ユーザー名で判定。他のスレッドが先に登録していたらスキップ）
+                username = canonical_username(url)
+                if not seen.add(username):
                     continue
 
                 # テキスト結合してチェック
@@ -159,70 +263,102 @@ def search_keyword(keyword, seen_urls):
 
                 # 1. NGワードチェック
                 if not is_safe_content(full_text):
+                    seen.discard(username)
+                    METRICS.count("ng_rejects")
                     continue
 
-                # 2. フォロワー数チェック（スニペットに記載がある場合のみ）
-                follower_count, count_text = extract_follower_count(full_text)
-                
-                # フォロワー数が取得できて、かつ5000人未満なら除外
-                if count_text != "記載なし" and follower_count < MIN_FOLLOWERS:
-                    continue
+                candidates.append((username, url, title, body, full_text))
 
-                results_list.append({
-                    "Keyword": keyword,
-                    "Title": title,
-                    "URL": url,
-                    "Snippet": body,
-                    "Estimated_Followers": follower_count if count_text != "記載なし" else "要確認",
-                    "Follower_Text_Source": count_text
-                })
-                
-                seen_urls.add(url)  # 重複チェック用に追加
-        
+        # 2. フォロワー数チェック（スニペットに記載がある場合のみ）。このキーワードの結果をまとめて抽出する
+        with METRICS.timer("parse"):
+            parsed = parse_followers([c[4] for c in candidates])
+        for (username, url, title, body, _), count, count_text in zip(
+                candidates, parsed["count"], parsed["text"]):
+            found = isinstance(count_text, str)
+
+            # フォロワー数が取得できて、かつ5000人未満なら除外
+            if found and count < MIN_FOLLOWERS:
+                seen.discard(username)
+                METRICS.count("follower_rejects", reason="low")
+                continue
+
+            results_list.append({
+                "Keyword": keyword,
+                "Title": title,
+                "URL": url,
+                "Snippet": body,
+                "Estimated_Followers": int(count) if found else "要確認",
+                "Follower_Text_Source": count_text if found else "記載なし"
+            })
+    
+        METRICS.count("candidates", len(results_list))
+        if tracker:
+            tracker.add(reserved, len(results), len(results_list))
         print(f"  完了: {keyword} -> {len(results_list)} 件")
         return results_list
         
     except Exception as e:
         print(f"  エラー {keyword}: {e}")
+        METRICS.count("errors", type=type(e).__name__)
+        if tracker:
+            tracker.add(reserved, 0, 0)
+        # 出力しなかったアカウントは、他のキーワードの結果で判定し直せるようにしておく
+        for c in candidates:
+            seen.discard(c[0])
         return []
 
-def search_instagram_candidates():
+def search_instagram_candidates(seen, backend, keywords=SEARCH_KEYWORDS, history=None, target=None):
     results_list = []
-    seen_urls = set()
 
-    print(f"検索を開始します（並列実行）... 目標: フィルタリング前に約30000件")
-    print(f"使用キーワード数: {len(SEARCH_KEYWORDS)} | 各キーワード最大: {MAX_RESULTS_PER_KEYWORD} 件\n")
+    tracker = None
+    if target:
+        # 目標件数がある場合は、前回新しいアカウントが多かったキーワードから検索する
+        tracker = TargetTracker(target)
+        keywords = history.rank(keywords) if history else keywords
+        print(f"検索を開始します（並列実行）... 目標: 候補 {target} 件で終了")
+    else:
+        print(f"検索を開始します（並列実行）... 目標: フィルタリング前に約30000件")
+    print(f"使用キーワード数: {len(keywords)} | 各キーワード最大: {MAX_RESULTS_PER_KEYWORD} 件\n")
+    if not keywords:
+        return pd.DataFrame()
 
     # ThreadPoolExecutorで複数キーワードを並列実行
-    max_workers = min(6, len(SEARCH_KEYWORDS))  # 最大6スレッド（DuckDuckGoのレート制限回避）
+    # （アクセス速度は共有リミッターが制御するので、スレッド数はレート制限とは無関係に決めてよい）
+    max_workers = min(MAX_WORKERS, len(keywords))
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # 各キーワードの検索タスクを送信
         future_to_keyword = {
-            executor.submit(search_keyword, keyword, seen_urls): keyword 
-            for keyword in SEARCH_KEYWORDS
+            executor.submit(search_keyword, keyword, seen, backend, history, tracker): keyword 
+            for keyword in keywords
         }
         
         # 完了した順に結果を取得
+        skipped = 0
         for future in as_completed(future_to_keyword):
             keyword = future_to_keyword[future]
+            if tracker and tracker.reached.is_set():
+                # 目標に達したら、まだ始まっていないキーワードを取り消す（検索中のものは最後まで待つ）
+                for f in future_to_keyword:
+                    f.cancel()
             try:
-                keyword_results = future.result()
+                keyword_results = None if future.cancelled() else future.result()
+                if keyword_results is None:
+                    skipped += 1
+                    continue
                 results_list.extend(keyword_results)
                 print(f"  合計候補数: {len(results_list)} 件")
             except Exception as e:
                 print(f"  キーワード '{keyword}' 処理中にエラー: {e}")
-            
-            time.sleep(1)  # レート制限回避のための待機
+        if skipped:
+            print(f"🎯 目標の {target} 件に達したので、残り {skipped} キーワードは検索しませんでした")
 
     # DataFrame作成
     df = pd.DataFrame(results_list)
     
-    # 重複削除（異なるキーワードで同じ人が引っかかるため）
-    df = df.drop_duplicates(subset=['URL'])
-    
     print("-" * 30)
-    print(f"検索完了。重複削除後の候補数: {len(df)} 件")
+    print(f"検索完了。候補数: {len(df)} 件 (重複除外 {seen.duplicates} 件 / 前回までに出力済み {seen.known_skipped} 件)")
+    print_limiter_summary()
     
     return df
 
@@ -231,59 +367,73 @@ def search_instagram_candidates():
 # ---------------------------------------------------------
 
 if __name__ == "__main__":
-    df_result = search_instagram_candidates()
+    parser = argparse.ArgumentParser(description="Instagram候補アカウントの収集")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"前回と検索結果が変わらなかったキーワードを飛ばし、新しいアカウントだけを {INCREMENTAL_OUTPUT_FILE} に出力する")
+    parser.add_argument("--target", type=int, metavar="N",
+                        help="候補が N 件集まったら残りのキーワードの検索を取り消し、そこまでの結果を保存して終わる")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    # 出力済みアカウントは差分モードのときだけ読み込む（通常の実行では前回の出力に関係なく全件を対象にする）
+    seen = DedupeStore(DELIVERED_FILE if args.incremental else None)
+    # 出力済みアカウント（seen）を「前回までに見つけたアカウント」として使う
+    history = QueryHistory(QUERY_HISTORY_FILE, accounts=seen)
+    keywords, skipped = history.plan(SEARCH_KEYWORDS) if args.incremental else (SEARCH_KEYWORDS, [])
+    if skipped:
+        print(f"♻️  差分モード: 前回と結果が同じだった {len(skipped)} キーワードを今回は飛ばします")
+    try:
+        search_engine()
+    except ValueError as e:
+        parser.error(str(e))
+    pool = None
+    if SEARCH_BACKEND == "selenium" and not args.replay:
+        # 遅延 import: Selenium を使わない実行では読み込まない
+        from driver_pool import DriverPool
+        pool = DriverPool(SELENIUM_BROWSERS)
+    backend = create_backend(SEARCH_BACKEND, pool, record_dir=args.record, replay_dir=args.replay,
+                             **({"max_retries": MAX_RETRIES} if SEARCH_BACKEND == "ddgs" else {}))
+    try:
+        df_result = search_instagram_candidates(seen, backend, keywords, history, target=args.target)
+    finally:
+        backend.close()
+        if pool:
+            pool.close()
+    history.print_summary(skipped=len(skipped))
     
     if not df_result.empty:
-        # Titleからアカウント名を抽出
-        def extract_display_name(title):
-            if not title:
-                return "不明"
-            
-            # パターン1: "Account Name (@username) • Instagram photos and videos" の形式
-            match = re.search(r'^([^(@]*?)\s*\(@', title)
-            if match:
-                name = match.group(1).strip()
-                if name:
-                    return name
-            
-            # パターン2: "Name • Description" 形式
-            if ' • ' in title:
-                name = title.split(' • ')[0].strip()
-                if name and not name.startswith('http'):
-                    return name
-            
-            # パターン3: "Name | Description" 形式
-            if ' | ' in title:
-                name = title.split(' | ')[0].strip()
-                if name and not name.startswith('http'):
-                    return name
-            
-            # パターン4: "Instagram" や "Хэштег" などの言語が含まれている場合は最初の部分を抽出
-            if 'Instagram' in title:
-                name = title.split('Instagram')[0].strip()
-                if name and len(name) > 1:
-                    return name
-            
-            # パターン5: "@" で始まっていない場合は最初の50文字までを取得
-            name = title.split(' - ')[0].strip() if ' - ' in title else title.strip()
-            if name and not name.startswith('http') and len(name) < 100:
-                return name
-            
-            # URLから@usernameを抽出（最後の手段）
-            return "不明"
-        
         df_result['Account_Name'] = df_result['Title'].apply(extract_display_name)
         
         # アカウント名とURLだけの新しいDataFrameを作成
         df_simple = df_result[['Account_Name', 'URL']].copy()
         
-        # 重複削除
-        df_simple = df_simple.drop_duplicates(subset=['URL'])
-        
         # CSVファイルとして保存
-        filename = "instagram_candidates.csv"
-        df_simple.to_csv(filename, index=False, encoding='utf-8-sig')
-        print(f"\n結果を {filename} に保存しました。")
+        output_file = INCREMENTAL_OUTPUT_FILE if args.incremental else OUTPUT_FILE
+        with METRICS.timer("write", target=output_file):
+            df_simple.to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"\n結果を {output_file} に保存しました。")
         print(f"アカウント数: {len(df_simple)} 件")
+
+        # 集めた項目はすべて Parquet に残す（次のステージで読み直せるように）
+        has_count = df_result['Follower_Text_Source'] != "記載なし"
+        with CandidateWriter(DATASET_DIR, stage="pickup") as dataset:
+            dataset.write_frame(pd.DataFrame({
+                "url": df_result['URL'],
+                "account_name": df_result['Account_Name'],
+                "title": df_result['Title'],
+                "snippet": df_result['Snippet'],
+                "keyword": df_result['Keyword'],
+                "followers": pd.to_numeric(df_result['Estimated_Followers'].where(has_count), errors="coerce").astype("Int64"),
+                "follower_text": df_result['Follower_Text_Source'].where(has_count),
+                "status": "candidate",
+            }))
     else:
-        print("候補が見つかりませんでした。")
\ No newline at end of file
+        print("候補が見つかりませんでした。")
+
+    # 保存できたアカウントを出力済みとして記録（次回の実行では除外される）。キーワードごとの結果も残す
+    # --replay / --record は記録データを作る・使うための実行なので、次回の実クロールに影響しないように残さない
+    if not args.replay and not args.record:
+        history.save()
+
+    METRICS.print_summary()
+    METRICS.export("pickup", METRICS_DIR, prometheus=METRICS_PROMETHEUS)
\ No newline at end of file
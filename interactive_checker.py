@@ -1,43 +1,50 @@
 import pandas as pd
 import webbrowser
 import os
+from candidate_store import CandidateWriter, latest_urls
+from result_writer import ResultWriter, flush_on_signals
+from metrics import METRICS
 
 # --- 設定 ---
 INPUT_FILE = "master_url_list.csv"   # チェックするリスト
 OUTPUT_FILE = "delivery_list.txt"    # 納品用ファイル（ここに自動で書き込まれます）
+DATASET_DIR = "pipeline_data"        # 全スクリプト共通のアカウント情報（Parquet）。目視の合否を残す
+INPUT_STATUSES = ["bio_ok"]          # データセットから読むときのチェック対象（プロフィール判定の合格分）。無ければ INPUT_FILE を読む
+METRICS_DIR = "metrics"              # 計測結果（1件あたりの目視時間・件数）の保存先。None にすると保存しない
 
 def main():
     print("=== 爆速選別ツール（コピペ不要版） ===")
     
-    # 1. リスト読み込み
-    if not os.path.exists(INPUT_FILE):
+    # 1. リスト読み込み（データセットがあればそこから、無ければ CSV から）
+    urls = latest_urls(DATASET_DIR, INPUT_STATUSES)
+    if urls is not None:
+        print(f"{DATASET_DIR} から {len(urls)} 件を読み込みました。")
+    elif not os.path.exists(INPUT_FILE):
         print(f"エラー: {INPUT_FILE} が見つかりません。")
         return
+    else:
+        try:
+            df = pd.read_csv(INPUT_FILE)
+            # ヘッダーがない場合やカラム名が違う場合の対応
+            if 'URL' in df.columns:
+                urls = df['URL'].dropna().tolist()
+            else:
+                urls = df.iloc[:, 0].dropna().tolist()
+        except:
+            print("CSVの読み込みに失敗しました。")
+            return
 
-    try:
-        df = pd.read_csv(INPUT_FILE)
-        # ヘッダーがない場合やカラム名が違う場合の対応
-        if 'URL' in df.columns:
-            urls = df['URL'].dropna().tolist()
-        else:
-            urls = df.iloc[:, 0].dropna().tolist()
-    except:
-        print("CSVの読み込みに失敗しました。")
-        return
-
-    # 2. 既にチェック済みのURLを除外（途中再開用）
-    checked_urls = set()
-    if os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            checked_urls = set([line.strip() for line in lines])
-            print(f"※ 既に {len(checked_urls)} 件が納品リストに含まれています。これらはスキップします。")
+    # 2. 既にチェック済みのURLを除外（途中再開用。納品リストの索引で判定する）
+    output = ResultWriter(OUTPUT_FILE, csv_format=False)
+    if len(output):
+        print(f"※ 既に {len(output)} 件が納品リストに含まれています。これらはスキップします。")
 
     # フィルタリング（未チェックのものだけ残す）
-    targets = [u for u in urls if u not in checked_urls]
+    targets = [u for u in urls if u not in output]
     total = len(targets)
 
     if total == 0:
+        output.close()
         print("全てのチェックが完了しています！")
         return
 
@@ -51,30 +58,43 @@ def main():
 
     input("準備ができたらEnterを押してください（ブラウザが起動します）>> ")
 
+    dataset = CandidateWriter(DATASET_DIR, stage="interactive")
+    flush_on_signals()   # ターミナルを閉じた場合も、それまでの合格分は書き出してから終わる
     count = 0
-    for i, url in enumerate(targets):
-        print(f"\n[{i+1}/{total}] {url}")
-        
-        # ブラウザで開く
-        webbrowser.open(url)
-        
-        # 判定待ち
-        # 画面を切り替えてチェックした後、ここに戻ってキーを押す
-        choice = input("合格ならEnter / ダメなら n >> ").lower().strip()
+    try:
+        for i, url in enumerate(targets):
+            print(f"\n[{i+1}/{total}] {url}")
+
+            # ブラウザで開く
+            webbrowser.open(url)
+
+            # 判定待ち
+            # 画面を切り替えてチェックした後、ここに戻ってキーを押す
+            with METRICS.timer("review"):
+                choice = input("合格ならEnter / ダメなら n >> ").lower().strip()
+
+            if choice == 'q':
+                print("中断します。お疲れ様でした。")
+                break
+
+            elif choice == 'n':
+                print(" -> [不合格] スキップ")
+                METRICS.count("reviews", result="rejected")
+                dataset.write(url=url, status="rejected")
 
-        if choice == 'q':
-            print("中断します。お疲れ様でした。")
-            break
-        
-        elif choice == 'n':
-            print(" -> [不合格] スキップ")
-        
-        else:
-            # Enterだけ押された場合（合格）
-            print(" -> [合格！] 保存しました")
-            with open(OUTPUT_FILE, 'a', encoding='utf-8') as f:
-                f.write(url + "\n")
-            count += 1
+            else:
+                # Enterだけ押された場合（合格）
+                print(" -> [合格！] 保存しました")
+                output.write(url)
+                METRICS.count("reviews", result="delivered")
+                dataset.write(url=url, status="delivered")
+                count += 1
+    except KeyboardInterrupt:
+        print("\n中断します。ここまでの合格分は保存されています。")
+    finally:
+        output.close()
+        dataset.close()
+        METRICS.export("interactive_checker", METRICS_DIR)
 
     print(f"\n=== 完了 ===")
     print(f"今回追加された合格件数: {count} 件")
@@ -0,0 +1,117 @@
+import re
+import unicodedata
+
+# ---------------------------------------------------------
+# NGワード / 必須キーワードの一括マッチャー
+# ---------------------------------------------------------
+# 単語リストを1本の正規表現にまとめてコンパイルし、テキストを1回走査するだけで
+# 全ての該当語を拾う。全角/半角・大文字/小文字は正規化してから照合するので
+# "FX" / "fx" / "ＦＸ" を別々に登録する必要はない。
+
+
+def normalize_text(text):
+    """全角/半角と大文字/小文字の揺れを吸収する（NFKC + casefold）"""
+    if not text:
+        return ""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+_ASCII_LETTERS = frozenset("abcdefghijklmnopqrstuvwxyz")
+
+
+def _is_ascii_word(term):
+    return term.isascii() and term.isalnum()
+
+
+def _has_boundary(text, start, end):
+    # "EA" や "FX" のような英字だけの短い語は "dream" / "effect" に誤爆するので、
+    # 前後が英字でない場合のみマッチ扱いにする（"FX投資" "EA自動売買" はマッチする）
+    # 数字は境界とみなす（"FP2級" "NISA2024" "BTC1億" のような書き方が多いため）
+    if start > 0 and text[start - 1] in _ASCII_LETTERS:
+        return False
+    if end < len(text) and text[end] in _ASCII_LETTERS:
+        return False
+    return True
+
+
+class KeywordMatcher:
+    """単語リストから1回だけ正規表現を組み立て、1パスで該当語を返す"""
+
+    def __init__(self, words):
+        # 正規化後の語 -> 最初に登録された元の表記
+        self._originals = {}
+        for word in words:
+            key = normalize_text(word)
+            if key and key not in self._originals:
+                self._originals[key] = word
+
+        # 境界チェックが必要な英字語
+        self._ascii_terms = {t for t in self._originals if _is_ascii_word(t)}
+
+        # "暗号資産" の中の "資産" のように、長い語に含まれる短い語の位置を事前計算しておく
+        # （長い語がマッチした時点で短い語も同時に含まれていると分かる）
+        self._contained = {}
+        for term in self._originals:
+            subs = []
+            for other in self._originals:
+                if other == term:
+                    continue
+                pos = term.find(other)
+                while pos != -1:
+                    subs.append((other, pos))
+                    pos = term.find(other, pos + 1)
+            self._contained[term] = subs
+
+        if not self._originals:
+            self._regex = None
+            return
+
+        # 長い語を先に並べた単純な選択(|)にする。前後読みを入れると re の高速化が効かなくなる
+        terms = sorted(self._originals, key=len, reverse=True)
+        self._regex = re.compile("|".join(re.escape(t) for t in terms))
+
+    @property
+    def words(self):
+        return list(self._originals.values())
+
+    def _accept(self, text, term, start):
+        if term not in self._ascii_terms:
+            return True
+        return _has_boundary(text, start, start + len(term))
+
+    def _scan(self, normalized):
+        """(語, 開始位置) を重なりも含めて返す"""
+        # finditer は一致した範囲の後ろから探し直すので、"資産形成" の中の "産形成" のように
+        # 一致した語と重なる（含まれてはいない）語を落とす。1文字ずつずらして探し直す
+        search = self._regex.search
+        match = search(normalized)
+        while match:
+            yield match.group(), match.start()
+            match = search(normalized, match.start() + 1)
+
+    def search(self, text):
+        """1語でも含まれていれば True"""
+        if self._regex is None or not text:
+            return False
+        normalized = normalize_text(text)
+        for term, start in self._scan(normalized):
+            if self._accept(normalized, term, start):
+                return True
+            for sub, offset in self._contained[term]:
+                if self._accept(normalized, sub, start + offset):
+                    return True
+        return False
+
+    def find_all(self, text):
+        """含まれていた語を元の表記で重複なく返す（出現順）"""
+        if self._regex is None or not text:
+            return []
+        normalized = normalize_text(text)
+        found = []
+        for term, start in self._scan(normalized):
+            hits = [(term, start)] + [(sub, start + off) for sub, off in self._contained[term]]
+            for hit, start in hits:
+                word = self._originals[hit]
+                if word not in found and self._accept(normalized, hit, start):
+                    found.append(word)
+        return found
@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ---------------------------------------------------------
+# 処理時間・件数の計測（全スクリプト共通）
+# ---------------------------------------------------------
+# 「どこに時間がかかっているか」を数字で見るための記録。
+#   段階ごとの処理時間（stage_seconds）: ブラウザ起動 / ページ取得 / 表示待ち / 解析 / 判定 / 書き込み など
+#   件数（カウンター）                 : 検索数 / 候補数 / NG除外 / フォロワー数不足 / エラー（種類別）など
+# 処理時間はヒストグラム（バケットごとの件数）で持つので、平均だけでなく p50 / p95 も出せる。
+#   with METRICS.timer("page_load"):
+#       driver.get(url)
+#   METRICS.count("candidates", len(found))
+#   METRICS.count("errors", type=type(e).__name__)
+#   METRICS.print_summary()
+#   METRICS.export("autofinder", "metrics", prometheus=True)   # JSON（+ Prometheus テキスト形式）で保存
+# ラベル（stage= や type= など）付きの値は、名前とラベルの組ごとに別々に数える。
+
+# 処理時間のバケット（秒）。最後は上限なし
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# 段階の名前（表示用。これ以外の名前もそのまま使える）
+STAGE_LABELS = {
+    "driver_start": "ブラウザ起動",
+    "page_load": "ページ取得",
+    "rate_limit": "アクセス間隔待ち",
+    "wait": "表示待ち",
+    "parse": "解析",
+    "filter": "判定",
+    "write": "書き込み",
+    "search": "検索（全体）",
+    "verify": "詳細チェック（全体）",
+    "review": "目視チェック",
+}
+
+
+class Histogram:
+    """値の分布（バケットごとの件数・合計・最大）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """バケット内を線形補間した近似値"""
+        if not self.count:
+            return 0.0
+        target = self.count * p
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= target:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (target - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": round(self.percentile(0.5), 6),
+            "p95": round(self.percentile(0.95), 6),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """カウンターとヒストグラムの記録。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        """カウンターを value 増やす"""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """ヒストグラムに値を1つ記録する"""
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """with ブロックの処理時間を stage_seconds{stage=...} に記録する（例外で抜けた場合も記録する）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """JSON にできる形の記録一式"""
+        now = time.time()
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), **h.to_dict()}
+                          for (name, labels), h in sorted(self._histograms.items())]
+        return {
+            "started_at": self.started_at,
+            "finished_at": now,
+            "wall_seconds": round(now - self.started_at, 3),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self, prefix="instagram_search"):
+        """Prometheus のテキスト形式（node_exporter の textfile collector でそのまま読める）"""
+        def fmt_labels(labels, extra=None):
+            items = list(labels) + ([extra] if extra else [])
+            if not items:
+                return ""
+            def escape(value):
+                return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{fmt_labels(labels)} {value}")
+        for (name, labels), h in histograms:
+            metric = f"{prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, n in zip([str(b) for b in h.buckets] + ["+Inf"], h.counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{fmt_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{metric}_sum{fmt_labels(labels)} {h.sum:.6f}")
+            lines.append(f"{metric}_count{fmt_labels(labels)} {h.count}")
+        lines.append(f"# TYPE {prefix}_run_seconds gauge")
+        lines.append(f"{prefix}_run_seconds {time.time() - self.started_at:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, script, directory="metrics", prometheus=False, **extra):
+        """
+        <directory>/<script>-<日時>.json に実行のまとめを保存し、パスを返す
+        prometheus=True なら <directory>/<script>.prom も上書きする（extra はまとめにそのまま入れる）
+        """
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        summary = dict(self.snapshot(), script=script, **extra)
+        path = os.path.join(directory, f"{script}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+        if prometheus:
+            prom_path = os.path.join(directory, f"{script}.prom")
+            with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(prom_path + ".tmp", prom_path)
+        return path
+
+    def print_summary(self):
+        """段階ごとの処理時間と件数を表示する"""
+        snapshot = self.snapshot()
+        wall = snapshot["wall_seconds"]
+        stages = [h for h in snapshot["histograms"] if h["name"] == "stage_seconds"]
+        if stages:
+            print(f"⏱️  段階別の処理時間（実行時間 {wall:.0f}秒。並列処理中の時間は重なって数える）")
+            for h in sorted(stages, key=lambda h: h["sum"], reverse=True):
+                labels = dict(h["labels"])
+                stage = labels.pop("stage")
+                name = STAGE_LABELS.get(stage, stage)
+                detail = "".join(f" {k}={v}" for k, v in labels.items())
+                print(f"   {name}{detail}: {h['count']}回 | 合計 {h['sum']:.1f}秒 | "
+                      f"p50 {h['p50']:.2f}秒 / p95 {h['p95']:.2f}秒 / 最大 {h['max']:.2f}秒")
+        if snapshot["counters"]:
+            print("🔢 件数")
+            for c in snapshot["counters"]:
+                detail = "".join(f" {k}={v}" for k, v in c["labels"].items())
+                print(f"   {c['name']}{detail}: {c['value']:,}")
+
+
+# スクリプト全体で共有する記録
+METRICS = Metrics()
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from metrics import METRICS
+
+# ---------------------------------------------------------
+# ページ読み込み待ち（固定 sleep の代わりに条件が揃うまで待つ）
+# ---------------------------------------------------------
+# 「結果のリンクが出た」「スクロールしても件数が増えなくなった」「タイトルが変わった」
+# などの条件をポーリングし、揃った時点で次へ進む。条件が揃わなくてもタイムアウトで抜ける。
+# 待ち時間は従来の固定 sleep（予算）と並べて記録し、どれだけ短縮できたかを確認できる。
+# ※アクセス間隔（ブロック回避のための待ち）はここではなく rate_limiter で管理する。
+
+POLL_INTERVAL = 0.1
+
+# 検索結果のInstagramリンク（implicitly_wait の影響を受けないようにJSで数える）
+RESULT_LINK_SELECTOR = "a[href*='instagram.com']"
+
+
+class WaitStats:
+    """待ち時間の記録（ラベルごとに 回数 / 実際の合計 / 予算の合計 / タイムアウト回数）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, label, actual, budget, timed_out=False):
+        with self._lock:
+            s = self._stats.setdefault(label, {"count": 0, "actual": 0.0, "budget": 0.0, "timeouts": 0})
+            s["count"] += 1
+            s["actual"] += actual
+            s["budget"] += budget
+            if timed_out:
+                s["timeouts"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {label: dict(s) for label, s in self._stats.items()}
+
+    def print_summary(self):
+        stats = self.snapshot()
+        if not stats:
+            return
+        print("⏳ 待ち時間の内訳（実際 / 従来の固定待ち）")
+        total_actual = total_budget = 0.0
+        for label, s in stats.items():
+            total_actual += s["actual"]
+            total_budget += s["budget"]
+            print(f"   {label}: {s['count']}回 | {s['actual']:.1f}秒 / {s['budget']:.1f}秒 | タイムアウト {s['timeouts']}回")
+        print(f"   合計: {total_actual:.1f}秒 / {total_budget:.1f}秒 (短縮 {total_budget - total_actual:.1f}秒)")
+
+
+# スクリプト全体で共有する記録
+WAIT_STATS = WaitStats()
+
+
+def wait_until(driver, condition, timeout, label, budget, stats=WAIT_STATS):
+    """condition(driver) が真になるまで待つ。条件が揃えば True、タイムアウトなら False"""
+    start = time.monotonic()
+    timed_out = False
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(condition)
+    except TimeoutException:
+        timed_out = True
+    elapsed = time.monotonic() - start
+    stats.record(label, elapsed, budget, timed_out)
+    METRICS.observe("stage_seconds", elapsed, stage="wait")
+    if timed_out:
+        METRICS.count("wait_timeouts", label=label)
+    return not timed_out
+
+
+def count_elements(driver, selector):
+    return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", selector)
+
+
+def wait_for_results(driver, selector=RESULT_LINK_SELECTOR, timeout=10, label="結果表示待ち", budget=3):
+    """検索結果の要素が1つ以上表示されるまで待つ"""
+    return wait_until(driver, lambda d: count_elements(d, selector) > 0, timeout, label, budget)
+
+
+def wait_for_any(driver, selectors, timeout=10, label="ページ表示待ち", budget=3):
+    """いずれかの要素が表示されるまで待つ（「結果なし」表示も含めて待ちたい場合）"""
+    def ready(d):
+        return any(count_elements(d, sel) > 0 for sel in selectors)
+    return wait_until(driver, ready, timeout, label, budget)
+
+
+def scroll_until_stable(driver, selector=RESULT_LINK_SELECTOR, max_scrolls=3, timeout_per_scroll=1.5,
+                        label="スクロール待ち", budget_per_scroll=1.5):
+    """
+    一番下までスクロールして結果件数が増えるのを待つ、を繰り返す
+    件数が増えなくなった時点で打ち切る。戻り値は最終的な件数
+    """
+    count = count_elements(driver, selector)
+    for i in range(max_scrolls):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        before = count
+        grew = wait_until(driver, lambda d: count_elements(d, selector) > before,
+                          timeout_per_scroll, label, budget_per_scroll)
+        count = count_elements(driver, selector)
+        if not grew:
+            # 打ち切った残りのスクロール分も、従来は待っていた時間として記録しておく
+            skipped = max_scrolls - i - 1
+            if skipped:
+                WAIT_STATS.record(label, 0.0, budget_per_scroll * skipped)
+            break
+    return count
+
+
+def wait_for_title_change(driver, old_title, timeout=10, label="タイトル変更待ち", budget=2):
+    """HTMLの読み込みが終わり、タイトルが前のページから変わるまで待つ（画像などの読み込み完了は待たない）"""
+    def ready(d):
+        return (d.execute_script("return document.readyState;") != "loading"
+                and d.title and d.title != old_title)
+    return wait_until(driver, ready, timeout, label, budget)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from dedupe_store import DedupeStore
+
+# ---------------------------------------------------------
+# 検索キーワードごとの前回結果（差分だけを取り直す定期実行用）
+# ---------------------------------------------------------
+# キーワードごとに「見つかったアカウント一覧のハッシュ（fingerprint）」と最終実行日時を残しておき、
+# 次回の --incremental 実行では、前回と結果が変わらなかったキーワードを何回か飛ばす。
+# 続けて変わらないほど長く飛ばす（1回 → 3回 → max_skip 回）。結果が変わったら次回から毎回に戻る。
+# max_age_days より前に調べたきりのキーワードは、飛ばす回数が残っていても取り直す。
+# 調べる順番は「初めてのキーワード → 前回新しいアカウントが多かったキーワード → 安定しているキーワード」。
+# これまでに見つけたアカウントは <path>.accounts.txt（accounts に DedupeStore を渡した場合はそちら）に残し、
+# 今回初めて見つかったものだけを「新規」とする。
+#   history = QueryHistory("autofinder_query_history.json")
+#   due, skipped = history.plan(queries)
+#   ordered = history.rank(queries)    # 飛ばさずに、調べる順に並べるだけ
+#   history.record(query, usernames)   # 検索が終わるたびに
+#   history.add_account(username)      # 初めて見つかったアカウントなら True
+#   history.save()
+
+DEFAULT_MAX_SKIP = 4
+DEFAULT_MAX_AGE_DAYS = 56
+
+
+def fingerprint(usernames):
+    """アカウント一覧（順不同）のハッシュ"""
+    return hashlib.sha1("\n".join(sorted(set(usernames))).encode("utf-8")).hexdigest()[:16]
+
+
+class QueryHistory:
+    """キーワードごとの前回結果と、これまでに見つけたアカウント。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, path, accounts=None, max_skip=DEFAULT_MAX_SKIP, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_skip = max_skip
+        self.max_age_days = max_age_days
+        self.accounts = accounts if accounts is not None else DedupeStore(path + ".accounts.txt")
+        self.changed = 0      # 今回、前回と結果が変わったキーワード数
+        self.stable = 0       # 今回、前回と結果が同じだったキーワード数
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    def plan(self, queries):
+        """
+        今回調べるキーワード（調べる順）と、飛ばすキーワードに分けて (due, skipped) を返す
+        飛ばしたキーワードは残りの飛ばす回数が1つ減る（save() で保存される）
+        """
+        now = time.time()
+        due, skipped = [], []
+        with self._lock:
+            for query in dict.fromkeys(queries):
+                entry = self._entries.get(query)
+                if entry is None:
+                    due.append(query)
+                    continue
+                too_old = now - entry["last_run"] > self.max_age_days * 86400
+                if entry["skip"] > 0 and not too_old:
+                    entry["skip"] -= 1
+                    skipped.append(query)
+                else:
+                    due.append(query)
+        return self.rank(due), skipped
+
+    def rank(self, queries):
+        """キーワードを調べる順に並べる（初めてのキーワード → 前回新しいアカウントが多かったキーワード → 安定しているキーワード）"""
+        def priority(query):
+            entry = self._entries.get(query)
+            if entry is None:
+                return (0, 0, 0)
+            return (1, entry["stable_runs"], -entry["new"] / max(entry["results"], 1))
+
+        with self._lock:
+            return sorted(queries, key=priority)
+
+    def record(self, query, usernames):
+        """1キーワード分の検索結果（ユーザー名の一覧）を記録する"""
+        usernames = set(usernames)
+        fp = fingerprint(usernames)
+        new = sum(1 for username in usernames if not self.accounts.is_known(username))
+        with self._lock:
+            previous = self._entries.get(query)
+            stable = previous is not None and previous["fingerprint"] == fp
+            stable_runs = previous["stable_runs"] + 1 if stable else 0
+            self._entries[query] = {
+                "fingerprint": fp,
+                "last_run": time.time(),
+                "results": len(usernames),
+                "new": new,
+                "stable_runs": stable_runs,
+                # 続けて変わらなかった回数に応じて、次回から飛ばす回数（1, 3, 7, ... を max_skip で打ち止め）
+                "skip": min(2 ** stable_runs - 1, self.max_skip),
+            }
+            if stable:
+                self.stable += 1
+            elif previous is not None:
+                self.changed += 1
+
+    def is_new(self, username):
+        """前回までの実行で見つけていないアカウントか"""
+        return not self.accounts.is_known(username)
+
+    def add_account(self, username):
+        """見つけたアカウントを記録し、前回までにも今回にもまだ見つけていなければ True"""
+        return self.accounts.add(username)
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._entries, ensure_ascii=False, indent=1, sort_keys=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+        self.accounts.save()
+
+    def print_summary(self, skipped=0):
+        print(f"📆 キーワード履歴: 結果が変化 {self.changed}件 / 前回と同じ {self.stable}件 / 今回スキップ {skipped}件 | "
+              f"新規アカウント {len(self.accounts.new_keys())}件")
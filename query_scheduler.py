@@ -0,0 +1,198 @@
+import math
+import threading
+
+# ---------------------------------------------------------
+# 検索キーワードの組み合わせの優先順位付け（成果の出る組み合わせから検索する）
+# ---------------------------------------------------------
+# メイン × サブの全組み合わせを同じ重みで順番に検索するのではなく、
+# 単語（メイン・サブそれぞれ）ごとに「1検索あたりの新しいアカウント数」と「詳細チェックの合格率」を数えておき、
+# 期待できる合格数の高い組み合わせから次に検索する（まだ試していない単語は少し優遇する: UCB）。
+#   - prune_after 回検索しても新しいアカウントが1件も出ない単語は、その単語を含む残りの組み合わせを飛ばす
+#   - 直近 window 件の検索の「1検索あたりの新しいアカウント数」が min_yield を下回ったら、そこで検索を打ち切る
+# 検索結果は record_search()、詳細チェックの合否は record_verdict() で渡す。next() が次に検索するクエリを返す。
+#   scheduler = QueryScheduler(build_queries(MAIN, SUB))
+#   query = scheduler.next()             # None なら終わり
+#   scheduler.record_search(query, usernames, seconds)
+#   scheduler.record_verdict(username, qualified)
+#   scheduler.print_report()
+# 見つけたアカウントの合格の見込みは qualify_estimate() で分かる（詳細チェックを見込みの高い順に並べる用）。
+
+
+def build_queries(main_keywords, sub_keywords, include_main_only=True):
+    """{クエリ: (メイン, サブ) or (メイン,)} を返す（メイン × サブ の全組み合わせ + メイン単体）"""
+    queries = {f"{m} {s}": (m, s) for m in main_keywords for s in sub_keywords}
+    if include_main_only:
+        queries.update({m: (m,) for m in main_keywords})
+    return queries
+
+
+class TermStats:
+    """単語1つ分の 検索回数 / 新しいアカウント数 / 検索時間 / 判定数 / 合格数"""
+
+    def __init__(self, term):
+        self.term = term
+        self.queries = 0
+        self.new = 0
+        self.seconds = 0.0
+        self.verified = 0
+        self.qualified = 0
+        self.pruned = 0   # この単語のために飛ばした組み合わせ数
+
+    def yield_rate(self):
+        return self.new / self.queries if self.queries else 0.0
+
+    def qualify_rate(self):
+        # 判定数が少ないうちは 50% 寄りに見積もる
+        return (self.qualified + 1) / (self.verified + 2)
+
+
+class QueryScheduler:
+    """次に検索するクエリを選ぶ。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, terms_by_query, min_yield=0.5, window=10, prune_after=3, exploration=1.0):
+        self.min_yield = min_yield        # 0 なら打ち切らない
+        self.window = window
+        self.prune_after = prune_after    # 0 なら飛ばさない
+        self.exploration = exploration    # 大きいほど、まだ試していない単語を優先する
+        self.stats = {}
+        self.stopped = None               # 打ち切った理由
+        self._terms = dict(terms_by_query)
+        self._pending = list(self._terms)  # 渡された順を同点時の順番にする
+        self._owner = {}                  # ユーザー名 -> 最初に見つけたクエリの単語
+        self._recent = []                 # 直近の検索の新しいアカウント数
+        self._total_queries = 0
+        self._total_new = 0
+        self._lock = threading.Lock()
+        for terms in self._terms.values():
+            for term in terms:
+                self.stats.setdefault(term, TermStats(term))
+
+    def remaining(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _estimate(self, term, prior):
+        s = self.stats[term]
+        # 検索回数の少ない単語は全体の平均に寄せる
+        expected = (s.new + prior) / (s.queries + 1) * s.qualify_rate()
+        bonus = self.exploration * prior * math.sqrt(math.log(self._total_queries + 2) / (s.queries + 1))
+        return expected + bonus
+
+    def _is_dead(self, term):
+        s = self.stats[term]
+        return self.prune_after and s.queries >= self.prune_after and s.new == 0
+
+    def next(self):
+        """次に検索するクエリ。残りが無い・打ち切った場合は None"""
+        with self._lock:
+            if self.stopped:
+                return None
+            alive = []
+            for query in self._pending:
+                dead = [term for term in self._terms[query] if self._is_dead(term)]
+                if dead:
+                    for term in dead:
+                        self.stats[term].pruned += 1
+                else:
+                    alive.append(query)
+            self._pending = alive
+            if not alive:
+                return None
+            prior = self._total_new / self._total_queries if self._total_queries else 1.0
+            scores = {}
+            best = None
+            for query in alive:
+                terms = self._terms[query]
+                scores[query] = sum(self._estimate(term, prior) for term in terms) / len(terms)
+                if best is None or scores[query] > scores[best]:
+                    best = query
+            self._pending.remove(best)
+            return best
+
+    def record_search(self, query, usernames, seconds=0.0, terms=None):
+        """
+        1クエリ分の検索結果（ユーザー名の一覧）を記録し、今回の実行で初めて見つかった件数を返す
+        terms を渡すと、next() で選んでいないクエリ（再開前に終わった検索など）も数えられる
+        """
+        terms = terms or self._terms.get(query)
+        if not terms:
+            return 0
+        with self._lock:
+            if query in self._pending:
+                self._pending.remove(query)
+            new = 0
+            for username in usernames:
+                if username not in self._owner:
+                    self._owner[username] = terms
+                    new += 1
+            for term in terms:
+                s = self.stats.setdefault(term, TermStats(term))
+                s.queries += 1
+                s.new += new
+                s.seconds += seconds
+            self._total_queries += 1
+            self._total_new += new
+            self._recent.append(new)
+            recent = self._recent[-self.window:]
+            if (self.min_yield and not self.stopped and len(recent) >= self.window
+                    and sum(recent) / len(recent) < self.min_yield):
+                self.stopped = (f"直近 {self.window} 件の検索で新しいアカウントが 1検索あたり "
+                                f"{sum(recent) / len(recent):.2f}件（基準 {self.min_yield}件）")
+            return new
+
+    def stop(self, reason):
+        """これ以降 next() で None を返す（目標件数に達した場合など）"""
+        with self._lock:
+            self.stopped = self.stopped or reason
+
+    def qualify_estimate(self, username):
+        """そのアカウントを最初に見つけたクエリの単語の合格率（平均）。まだ分からなければ 0.5"""
+        with self._lock:
+            terms = self._owner.get(username)
+            if not terms:
+                return 0.5
+            return sum(self.stats[term].qualify_rate() for term in terms) / len(terms)
+
+    def record_verdict(self, username, qualified):
+        """詳細チェックの合否を、そのアカウントを最初に見つけたクエリの単語に記録する"""
+        with self._lock:
+            for term in self._owner.get(username, ()):
+                s = self.stats[term]
+                s.verified += 1
+                s.qualified += 1 if qualified else 0
+
+    def report(self):
+        """単語ごとの成果を DataFrame で返す"""
+        import pandas as pd
+
+        with self._lock:
+            rows = [{
+                "term": s.term,
+                "queries": s.queries,
+                "new_accounts": s.new,
+                "new_per_query": round(s.yield_rate(), 2),
+                "search_seconds": round(s.seconds, 1),
+                "verified": s.verified,
+                "qualified": s.qualified,
+                "qualify_rate": round(s.qualified / s.verified, 3) if s.verified else None,
+                "pruned_queries": s.pruned,
+            } for s in self.stats.values()]
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return df
+        return df.sort_values(["qualified", "new_per_query"], ascending=False, kind="stable").reset_index(drop=True)
+
+    def print_report(self, path=None):
+        """単語ごとの成果を表示する（path を指定すると CSV にも保存する）"""
+        df = self.report()
+        if self.stopped:
+            print(f"🛑 検索を打ち切りました: {self.stopped}（残り {self.remaining()} 通りは未検索）")
+        print("🧭 単語別の成果（合格数の多い順）")
+        for row in df.itertuples():
+            rate = f"{row.qualify_rate * 100:.0f}%" if row.verified else "-"
+            pruned = f" | 飛ばした組み合わせ {row.pruned_queries}通り" if row.pruned_queries else ""
+            print(f"   {row.term}: 検索 {row.queries}回 ({row.search_seconds:.0f}秒) | 新規 {row.new_accounts}件 "
+                  f"({row.new_per_query:.1f}件/検索) | 合格 {row.qualified}/{row.verified}件 ({rate}){pruned}")
+        if path and not df.empty:
+            df.to_csv(path, index=False, encoding="utf-8-sig")
+            print(f"   📁 {path} に保存しました")
@@ -0,0 +1,167 @@
+import asyncio
+import random
+import threading
+import time
+
+# ---------------------------------------------------------
+# アクセス間隔の制御（ブロック回避のための待ち）
+# ---------------------------------------------------------
+# ページの読み込み待ちとは別に、「同じ相手へのアクセスは最低これだけ空ける」を
+# 複数スレッドで共有して守る。
+#   IntervalLimiter     : 決まった間隔（min〜maxのランダム）を空けるだけの単純なもの
+#   AdaptiveTokenBucket : 検索エンジンごとのトークンバケット。ブロック（202 / 429 / CAPTCHA）を
+#                         検知したら速度を落として一時停止し、問題なく通り続ければ少しずつ速度を戻す
+# 検索エンジン用のバケットは get_limiter("duckduckgo") で取得し、全スクリプト・全ワーカーで共有する。
+
+# 検索エンジンごとの初期設定（rate は 1秒あたりのリクエスト数）
+ENGINE_LIMITS = {
+    "duckduckgo": {"rate": 0.5, "min_rate": 0.05, "max_rate": 2.0, "burst": 2},
+    "bing": {"rate": 0.5, "min_rate": 0.05, "max_rate": 2.0, "burst": 2},
+}
+DEFAULT_LIMIT = {"rate": 0.5, "min_rate": 0.05, "max_rate": 2.0, "burst": 1}
+
+# ブロック・CAPTCHAページに出る文言
+BLOCK_MARKERS = [
+    "anomaly-modal", "bots use duckduckgo too", "unusual traffic", "captcha",
+    "verify you are human", "are you a robot", "ロボットではありません", "異常なトラフィック",
+]
+
+
+class IntervalLimiter:
+    """前回のアクセスから min_interval〜max_interval 秒空くまで待つ（スレッド間で共有）"""
+
+    def __init__(self, min_interval, max_interval=None):
+        self.min_interval = min_interval
+        self.max_interval = min_interval if max_interval is None else max_interval
+        self.waited = 0.0     # 実際に待った合計秒数
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + random.uniform(self.min_interval, self.max_interval)
+            delay = slot - now
+            self.waited += delay
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AdaptiveTokenBucket:
+    """ブロックされたら減速・一時停止し、順調なら加速するトークンバケット（スレッド / asyncio 共用）"""
+
+    def __init__(self, name, rate, min_rate=None, max_rate=None, burst=1,
+                 backoff=0.5, ramp_up=1.1, ramp_every=10, cooldown=30.0, jitter=0.3):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate or rate / 10
+        self.max_rate = max_rate or rate
+        self.burst = burst
+        self.backoff = backoff          # ブロック時に rate に掛ける係数
+        self.ramp_up = ramp_up          # 順調な時に rate に掛ける係数
+        self.ramp_every = ramp_every    # 何回連続で成功したら加速するか
+        self.cooldown = cooldown        # ブロック時に全体を止める秒数
+        self.jitter = jitter            # 間隔に対するゆらぎの割合
+        self.requests = 0
+        self.blocked = 0
+        self.waited = 0.0
+        self._tat = 0.0                 # 次のトークンが空く理論時刻
+        self._paused_until = 0.0
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """トークンを1つ予約し、使えるようになるまでの待ち秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            interval = 1.0 / self.rate
+            tat = max(self._tat, now, self._paused_until)
+            allow_at = max(tat - (self.burst - 1) * interval, self._paused_until)
+            self._tat = tat + interval
+            delay = max(0.0, allow_at - now) + random.uniform(0, interval * self.jitter)
+            self.requests += 1
+            self.waited += delay
+            return delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def report_success(self):
+        """正常な応答だった"""
+        with self._lock:
+            self._streak += 1
+            if self._streak >= self.ramp_every:
+                self._streak = 0
+                self.rate = min(self.max_rate, self.rate * self.ramp_up)
+
+    def report_blocked(self):
+        """ブロックされた（202 / 429 / CAPTCHA）。減速して一時停止する"""
+        with self._lock:
+            self._streak = 0
+            self.blocked += 1
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            self._paused_until = max(self._paused_until, time.monotonic() + self.cooldown)
+        print(f"⚠️  [{self.name}] ブロックを検知: {self.cooldown:.0f}秒停止し、{self.rate:.2f}件/秒 に減速します")
+
+    def summary(self):
+        return (f"{self.name}: {self.requests}件 | 現在 {self.rate:.2f}件/秒 | "
+                f"ブロック {self.blocked}回 | 待ち合計 {self.waited:.1f}秒")
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(engine):
+    """検索エンジンごとの共有リミッターを返す（無ければ ENGINE_LIMITS の設定で作る）"""
+    with _limiters_lock:
+        limiter = _limiters.get(engine)
+        if limiter is None:
+            limiter = AdaptiveTokenBucket(engine, **ENGINE_LIMITS.get(engine, DEFAULT_LIMIT))
+            _limiters[engine] = limiter
+        return limiter
+
+
+def configure_limiter(engine, **settings):
+    """リミッターの設定を差し替える（スクリプトの設定エリアから呼ぶ）"""
+    with _limiters_lock:
+        params = dict(ENGINE_LIMITS.get(engine, DEFAULT_LIMIT), **settings)
+        _limiters[engine] = AdaptiveTokenBucket(engine, **params)
+        return _limiters[engine]
+
+
+def looks_blocked(text):
+    """ページの内容がブロック・CAPTCHA画面っぽいか"""
+    if not text:
+        return False
+    lowered = text.lower()
+    return any(marker in lowered for marker in BLOCK_MARKERS)
+
+
+def report_page(limiter, page_text, has_results):
+    """
+    ページを開いた結果をリミッターに伝える
+    結果が無く、ブロック画面っぽい場合はブロックとして報告し True を返す
+    """
+    if not has_results and looks_blocked(page_text):
+        limiter.report_blocked()
+        return True
+    limiter.report_success()
+    return False
+
+
+def print_limiter_summary():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    if limiters:
+        print("🚦 アクセス制御の状況")
+        for limiter in limiters:
+            print(f"   {limiter.summary()}")
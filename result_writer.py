@@ -0,0 +1,223 @@
+import atexit
+import csv
+import io
+import os
+import signal
+import threading
+import weakref
+
+from metrics import METRICS
+
+# ---------------------------------------------------------
+# 結果ファイルへの追記（まとめ書き + 処理済みURLの索引）
+# ---------------------------------------------------------
+# 1件ごとにファイルを開き直して書くのではなく、メモリに溜めて
+# flush_every 件たまるか flush_interval 秒たつごとにまとめて追記する。
+# 書いた行の先頭の値（URL）は、隣の索引ファイル（<path>.idx）にも1行ずつ追記しておき、
+# 次回は索引を読むだけで「もう書いたURLか」を in で調べられる（出力ファイルを pandas で読み直さない）。
+#   with ResultWriter("final_verified_list.csv", header=["URL"], encoding="utf-8-sig") as out:
+#       if url not in out:
+#           out.write(url)
+# 索引には、書き足すたびに「その時点の出力ファイルのサイズ」も残している。
+# 出力ファイルだけが先に書かれて止まった場合は、その位置から後ろだけを読んで索引を補う。
+# 索引が無い・出力ファイルが手で編集された場合は、出力ファイル全体から作り直す。
+# 終了時（close / プロセス終了）には fsync してから閉じる。
+# flush_on_signals() で登録したシグナルは Ctrl-C と同じ KeyboardInterrupt にして、各スクリプトの finally の close で書き出す。
+
+DEFAULT_FLUSH_EVERY = 50
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+_OPEN_WRITERS = weakref.WeakSet()
+
+
+class ResultWriter:
+    """1行1件の結果ファイルに追記する。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, path, header=None, encoding="utf-8", csv_format=True, flush_every=DEFAULT_FLUSH_EVERY,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.header = list(header) if header else None
+        self.encoding = encoding
+        self.csv_format = csv_format           # False なら値をそのまま1行に書く（テキストのリスト用）
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval   # 0 / None なら件数でのみ書き出す
+        self.written = 0                       # 今回の実行で追記した件数
+        self._keys = set()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                if self.header:
+                    f.write(self._encode_first(self.header))
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        self._load_index()
+        self._file = open(path, "ab")
+        self._index = open(self.index_path, "a", encoding="utf-8")
+        _OPEN_WRITERS.add(self)
+
+        self._ticker = None
+        if self.flush_interval:
+            self._ticker = threading.Thread(target=self._tick, name=f"ResultWriter-{os.path.basename(path)}",
+                                            daemon=True)
+            self._ticker.start()
+
+    # --- 書き込み形式 ---
+    def _format(self, values):
+        if not self.csv_format:
+            return "\t".join(str(v) for v in values) + "\n"
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(values)
+        return buf.getvalue()
+
+    def _encode_first(self, values):
+        # utf-8-sig の BOM はファイルの先頭にだけ付ける
+        return self._format(values).encode(self.encoding)
+
+    def _encode(self, values):
+        encoding = "utf-8" if self.encoding == "utf-8-sig" else self.encoding
+        return self._format(values).encode(encoding)
+
+    # --- 索引 ---
+    def _read_keys(self, offset=0):
+        """出力ファイルの offset 以降の行の先頭の値を返す"""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # 改行で終わっていない最後の行は書き込み途中で止まったもの（次の書き込みで壊れないように改行を補う）
+        if data and not data.endswith(b"\n"):
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+        text = data.decode("utf-8-sig" if offset == 0 else "utf-8", errors="replace")
+        if self.csv_format:
+            rows = list(csv.reader(io.StringIO(text)))
+        else:
+            rows = [line.split("\t") for line in text.splitlines()]
+        if offset == 0 and self.header and rows and rows[0] == self.header:
+            rows = rows[1:]
+        return [row[0].strip() for row in rows if row and row[0].strip()]
+
+    def _load_index(self):
+        size = os.path.getsize(self.path)
+        indexed_size = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                lines = f.read().split("\n")
+            markers = [line for line in lines if line.startswith("#")]
+            if markers:
+                indexed_size = int(markers[-1][1:])
+            self._keys = set(lines).difference(markers)
+            self._keys.discard("")
+
+        if indexed_size is None or indexed_size > size:
+            # 索引が無い / 出力ファイルが短くなっている（手で編集された）: 全体から作り直す
+            self._keys = set(self._read_keys())
+            self._rewrite_index()
+        elif indexed_size < size:
+            # 出力ファイルだけ先に書かれて止まった分を補う
+            missing = [key for key in self._read_keys(indexed_size) if key not in self._keys]
+            self._keys.update(missing)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.writelines(key + "\n" for key in missing)
+                f.write(f"#{os.path.getsize(self.path)}\n")
+
+    def _rewrite_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(key + "\n" for key in sorted(self._keys))
+            f.write(f"#{os.path.getsize(self.path)}\n")
+        os.replace(tmp_path, self.index_path)
+
+    # --- 公開API ---
+    def __contains__(self, key):
+        # set の in は1回の操作で終わるのでロックは取らない（再開時に全件を調べるので軽くしておく）
+        return key in self._keys
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+    def write(self, *values):
+        """1行追記する（先頭の値が索引のキー）。既に書いたキーなら何もせず False"""
+        key = str(values[0]).strip()
+        with self._lock:
+            if self._file.closed:
+                raise ValueError(f"閉じた ResultWriter には書き込めません: {self.path}")
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            self._buffer.append((key, values))
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+        return True
+
+    def _flush_locked(self, fsync=False):
+        if self._file.closed or not (self._buffer or fsync):
+            return
+        with METRICS.timer("write", target=os.path.basename(self.path)):
+            if self._buffer:
+                # 出力ファイル → 索引 の順に書く（途中で止まっても索引が出力より先に進まない）
+                self._file.write(b"".join(self._encode(values) for _, values in self._buffer))
+                self._file.flush()
+                if fsync:
+                    os.fsync(self._file.fileno())
+                self._index.writelines(key + "\n" for key, _ in self._buffer)
+                self._index.write(f"#{self._file.tell()}\n")
+                self.written += len(self._buffer)
+                self._buffer = []
+            self._index.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+                os.fsync(self._index.fileno())
+
+    def flush(self, fsync=False):
+        """溜まっている行を書き出す（fsync=True ならディスクまで確実に書く）"""
+        with self._lock:
+            self._flush_locked(fsync=fsync)
+
+    def _tick(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked(fsync=True)
+            self._file.close()
+            self._index.close()
+        self._closed.set()
+        _OPEN_WRITERS.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def flush_all(fsync=True):
+    """開いている全 ResultWriter を書き出す"""
+    for writer in list(_OPEN_WRITERS):
+        writer.flush(fsync=fsync)
+
+
+atexit.register(flush_all)
+
+
+def flush_on_signals(signals=("SIGTERM", "SIGHUP")):
+    """
+    指定のシグナルで KeyboardInterrupt を送る（メインスレッドから呼ぶ）
+    各スクリプトの Ctrl-C と同じ中断処理（finally での close）で fsync してから閉じる。
+    ハンドラーの中では書き出さない（メインスレッドが write() でロックを持っている最中だと止まってしまうため）
+    """
+    def handler(signum, frame):
+        raise KeyboardInterrupt(f"signal {signum}")
+
+    for name in signals:
+        sig = getattr(signal, name, None)   # Windows には SIGHUP が無い
+        if sig is not None:
+            signal.signal(sig, handler)
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+
+# ---------------------------------------------------------
+# 途中再開用のジャーナル（追記専用の JSONL）
+# ---------------------------------------------------------
+# 「終わった処理」を1件ごとに1行ずつ追記していく。クラッシュや Ctrl-C で止まっても
+# それまでの行は残っているので、次回 resume=True で読み直せば残りの処理だけを続けられる。
+#   journal.record("query", "新NISA 主婦", urls=[...])
+#   journal.done("query")  -> {"新NISA 主婦": {"urls": [...], ...}}
+# 同じ kind / key を複数回記録した場合は最後の行が有効になる。
+# 書き込み途中で止まった最後の1行（壊れた行）は読み込み時に切り落とす。
+
+
+class RunJournal:
+    """処理済みの記録を追記していくジャーナル。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, path, resume=False, fsync_every=20):
+        self.path = path
+        self.fsync_every = fsync_every   # この件数ごとにディスクへ確実に書き出す（0なら close 時のみ）
+        self.skipped = 0                 # 読み込み時に読み飛ばした壊れた行の数
+        self._done = {}
+        self._lock = threading.Lock()
+        self._unsynced = 0
+
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            # 新規実行では前回のジャーナルを1世代だけ残して作り直す
+            os.replace(path, path + ".prev")
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            # 改行で終わっていない最後の行は書き込み途中で止まったもの。続きを追記する前に切り落とす
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                self.skipped += 1
+                f.truncate(end)
+        for line in data[:end].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                kind, key = entry.pop("kind"), entry.pop("key")
+            except (ValueError, KeyError):
+                self.skipped += 1
+                continue
+            self._done.setdefault(kind, {})[key] = entry
+
+    def record(self, kind, key, **data):
+        """kind の key が終わったことを記録する（data は JSON にできる値のみ）"""
+        entry = dict(data, kind=kind, key=key, at=time.time())
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._done.setdefault(kind, {})[key] = dict(data, at=entry["at"])
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._unsynced += 1
+            if self.fsync_every and self._unsynced >= self.fsync_every:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def done(self, kind):
+        """kind の記録済み {key: data} を返す（コピー）"""
+        with self._lock:
+            return dict(self._done.get(kind, {}))
+
+    def is_done(self, kind, key):
+        with self._lock:
+            return key in self._done.get(kind, {})
+
+    def count(self, kind):
+        with self._lock:
+            return len(self._done.get(kind, {}))
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from http_search import BackgroundSearchClient, SearchBlockedError
+from metrics import METRICS
+from rate_limiter import get_limiter, report_page
+
+# ---------------------------------------------------------
+# 検索バックエンド（検索結果の取り方を差し替えられるようにする）
+# ---------------------------------------------------------
+# どのバックエンドも search(query, engine) で [{"href", "title", "body"}, ...] を返し、
+# ブロックされた場合は SearchBlockedError を投げる。
+#   "ddgs"     : ddgs ライブラリ（API経由。一番速いが件数の多い検索向け）
+#   "http"     : DuckDuckGo / Bing のHTML版を直接取得（http_search）
+#   "selenium" : ブラウザで検索ページを開く（DriverPool のブラウザを使う）
+#   "replay"   : 保存しておいた結果を返すだけ（ネットワーク・待ち時間なし）
+# record_dir を指定すると、実際のバックエンドで取れた結果をそのディレクトリに保存していき、
+# 後から replay_dir に同じディレクトリを指定すれば、まったく同じ結果で処理全体を動かせる。
+# 各スクリプトの --record DIR / --replay DIR がこれに対応する（add_backend_arguments）。
+
+BACKENDS = ("ddgs", "http", "selenium", "replay")
+
+# Seleniumで開く検索ページと、結果のリンク・結果1件分の要素
+SELENIUM_ENGINES = {
+    "duckduckgo": {
+        "url": "https://duckduckgo.com/?q={query}&kl=jp-jp",
+        "ready": ["a[href*='instagram.com']"],
+        "link": "a[href*='instagram.com']",
+        "item": "article",
+    },
+    "bing": {
+        "url": "https://www.bing.com/search?q={query}&setlang=ja",
+        "ready": ["#b_results li.b_algo", "#b_results .b_no"],
+        "link": "#b_results li.b_algo h2 a",
+        "item": "li.b_algo",
+    },
+}
+
+# 結果のリンクと、それを含む結果1件分の要素のテキストをまとめて取り出す
+_COLLECT_RESULTS_JS = """
+const seen = new Set();
+const results = [];
+for (const a of document.querySelectorAll(arguments[0])) {
+    if (!a.href || seen.has(a.href)) continue;
+    seen.add(a.href);
+    const item = a.closest(arguments[1]) || a.parentElement;
+    results.push({href: a.href, title: a.innerText || "", body: item ? item.innerText : ""});
+}
+return results;
+"""
+
+
+class ReplayMissError(LookupError):
+    """replay で、保存されていないクエリを検索しようとした"""
+
+
+class SearchBackend:
+    """検索バックエンドの共通インターフェース"""
+
+    name = "base"
+
+    def search(self, query, engine="duckduckgo", max_results=None):
+        """1クエリ分の結果一覧 [{"href", "title", "body"}, ...] を返す"""
+        raise NotImplementedError
+
+    def submit(self, executor, query, engine="duckduckgo"):
+        """
+        search を executor で実行し concurrent.futures.Future を返す（複数エンジンへの同時検索用）
+        まだ始まっていなければ Future.cancel() で取り消せる
+        """
+        return executor.submit(self.search, query, engine)
+
+    def warm_up(self):
+        """最初の検索の前に準備しておくもの（ブラウザの起動など）があれば済ませる"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DdgsBackend(SearchBackend):
+    """ddgs ライブラリで検索する。アクセス速度は "ddgs" の共有リミッターに従う"""
+
+    name = "ddgs"
+
+    def __init__(self, region="jp-jp", timeout=30, max_retries=3, limiter_name="ddgs"):
+        self.region = region
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = get_limiter(limiter_name)
+
+    def search(self, query, engine="duckduckgo", max_results=None):
+        from ddgs import DDGS
+        from ddgs.exceptions import RatelimitException
+
+        for attempt in range(self.max_retries):
+            with METRICS.timer("rate_limit", engine="ddgs"):
+                self.limiter.acquire()
+            try:
+                with METRICS.timer("page_load", engine="ddgs"), DDGS(timeout=self.timeout) as ddgs:
+                    results = ddgs.text(query, region=self.region, safesearch="off",
+                                        max_results=max_results or 10, backend=engine)
+                METRICS.count("search_requests", backend="ddgs", engine=engine)
+                self.limiter.report_success()
+                return [{"href": r.get("href", ""), "title": r.get("title", ""), "body": r.get("body", "")}
+                        for r in results]
+            except RatelimitException:
+                self.limiter.report_blocked()
+                METRICS.count("blocked", engine="ddgs")
+                print(f"  レート制限: {query} (再試行 {attempt + 1}/{self.max_retries})")
+        raise SearchBlockedError(f"ddgs: {self.max_retries}回レート制限を受けました")
+
+
+class HttpBackend(SearchBackend):
+    """HTML版の検索結果ページを取得する（接続プールを共有するので複数スレッドから呼んでよい）"""
+
+    name = "http"
+
+    def __init__(self, **client_kwargs):
+        self._client = BackgroundSearchClient(**client_kwargs)
+
+    def search(self, query, engine="duckduckgo", max_results=None):
+        results = self._client.search(query, engine)
+        return results[:max_results] if max_results else results
+
+    def submit(self, executor, query, engine="duckduckgo"):
+        # イベントループ上で直接始めるので、Future.cancel() で取得中のリクエストも打ち切れる
+        return self._client.submit(query, engine)
+
+    def close(self):
+        self._client.close()
+
+
+class SeleniumBackend(SearchBackend):
+    """DriverPool のブラウザで検索ページを開く"""
+
+    name = "selenium"
+
+    def __init__(self, pool, page_load_timeout=10, max_scrolls=0):
+        self.pool = pool
+        self.page_load_timeout = page_load_timeout
+        self.max_scrolls = max_scrolls   # 結果を増やすために一番下までスクロールする最大回数
+
+    def warm_up(self):
+        self.pool.warm_up()
+
+    def search(self, query, engine="duckduckgo", max_results=None):
+        # 遅延 import: Selenium を使わない実行では読み込まない
+        from page_wait import wait_for_any, scroll_until_stable
+
+        site = SELENIUM_ENGINES[engine]
+        limiter = get_limiter(engine)
+        with METRICS.timer("rate_limit", engine=engine):
+            limiter.acquire()
+        with self.pool.driver() as driver:
+            with METRICS.timer("page_load", engine=engine):
+                driver.get(site["url"].format(query=urllib.parse.quote(query)))
+            has_results = wait_for_any(driver, site["ready"], timeout=self.page_load_timeout,
+                                       label=f"{engine} 結果表示待ち", budget=2.5)
+            if has_results and self.max_scrolls:
+                scroll_until_stable(driver, site["link"], max_scrolls=self.max_scrolls)
+            with METRICS.timer("parse", engine=engine):
+                results = driver.execute_script(_COLLECT_RESULTS_JS, site["link"], site["item"]) or []
+                page_text = "" if results else driver.execute_script("return document.body.innerText;")
+        METRICS.count("search_requests", backend="selenium", engine=engine)
+
+        if report_page(limiter, page_text, bool(results)):
+            METRICS.count("blocked", engine=engine)
+            raise SearchBlockedError(f"{engine}: CAPTCHA")
+        results = [{k: " ".join((r.get(k) or "").split()) for k in ("href", "title", "body")} for r in results]
+        return results[:max_results] if max_results else results
+
+
+def _record_path(directory, query, engine):
+    digest = hashlib.sha1(f"{engine}\n{query}".encode("utf-8")).hexdigest()[:20]
+    return os.path.join(directory, f"{engine}_{digest}.json")
+
+
+class RecordingBackend(SearchBackend):
+    """他のバックエンドの結果を、そのまま directory に1クエリ1ファイルで保存していく"""
+
+    def __init__(self, inner, directory):
+        self.inner = inner
+        self.directory = directory
+        self.name = f"{inner.name}+record"
+        os.makedirs(directory, exist_ok=True)
+
+    def warm_up(self):
+        self.inner.warm_up()
+
+    def _save(self, query, engine, results):
+        path = _record_path(self.directory, query, engine)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"engine": engine, "query": query, "backend": self.inner.name,
+                       "recorded_at": time.time(), "results": results}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def search(self, query, engine="duckduckgo", max_results=None):
+        results = self.inner.search(query, engine, max_results)
+        self._save(query, engine, results)
+        return results
+
+    def submit(self, executor, query, engine="duckduckgo"):
+        future = self.inner.submit(executor, query, engine)
+
+        def save(done):
+            if not done.cancelled() and done.exception() is None:
+                self._save(query, engine, done.result())
+        future.add_done_callback(save)
+        return future
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayBackend(SearchBackend):
+    """RecordingBackend で保存した結果を返す。保存されていないクエリは ReplayMissError"""
+
+    name = "replay"
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"記録ディレクトリがありません: {directory}")
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def search(self, query, engine="duckduckgo", max_results=None):
+        path = _record_path(self.directory, query, engine)
+        try:
+            with open(path, encoding="utf-8") as f:
+                results = json.load(f)["results"]
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            raise ReplayMissError(f"記録されていない検索です: [{engine}] {query}") from None
+        with self._lock:
+            self.hits += 1
+        return results[:max_results] if max_results else results
+
+
+def create_backend(kind, pool=None, record_dir=None, replay_dir=None, **options):
+    """
+    設定からバックエンドを作る
+        kind       : "ddgs" / "http" / "selenium" / "replay"
+        pool       : "selenium" で使う DriverPool
+        record_dir : 指定すると取れた結果をここに保存する
+        replay_dir : 指定すると kind に関係なく、ここに保存した結果を返す "replay" になる
+    その他の options は各バックエンドにそのまま渡す
+    """
+    if replay_dir or kind == "replay":
+        return ReplayBackend(replay_dir or record_dir)
+    if kind == "ddgs":
+        backend = DdgsBackend(**options)
+    elif kind == "http":
+        backend = HttpBackend(**options)
+    elif kind == "selenium":
+        if pool is None:
+            raise ValueError("selenium バックエンドには DriverPool が必要です")
+        backend = SeleniumBackend(pool, **options)
+    else:
+        raise ValueError(f"不明な検索バックエンド: {kind} ({' / '.join(BACKENDS)})")
+    return RecordingBackend(backend, record_dir) if record_dir else backend
+
+
+def add_backend_arguments(parser):
+    """スクリプトの argparse に --record / --replay を追加する"""
+    parser.add_argument("--record", metavar="DIR",
+                        help="取得した検索結果を DIR に保存する（後から --replay で再現できる）")
+    parser.add_argument("--replay", metavar="DIR",
+                        help="DIR に保存した検索結果だけで動かす（ネットワーク・待ち時間なし）")
@@ -0,0 +1,157 @@
+import os
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------------------------------------
+# ローカル検索スタブサーバー（ベンチマーク・動作確認用）
+# ---------------------------------------------------------
+# fixtures/ に保存した検索結果ページを、クエリ中のユーザー名を埋め込んで返す。
+#   /html/?q=...  → DuckDuckGo HTML版の結果ページ
+#   /search?q=... → Bing の結果ページ
+#   /profile/?q=username → プロフィールページ（CSS・フォント・画像・動画・計測スクリプトを読み込む静的なページ）
+#   /assets/...   → 上のページが読み込むファイル（拡張子に応じた大きさのダミーデータを asset_latency 秒後に返す）
+# 「site:instagram.com/a OR site:instagram.com/b」のようなまとめ検索には、各ユーザー名の結果を並べて返す
+# （実際の検索エンジンと同じく1ページに載る件数には限りがあるので、max_accounts 件を超えた分は返さない）。
+# ネットワークに出ずに、検索〜判定の流れをそのまま動かせる。
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+ROUTES = {
+    "/html/": "ddg_html_result.html",
+    "/search": "bing_result.html",
+    "/profile/": "profile_page.html",
+}
+
+# /assets/ で返すダミーデータの大きさ（バイト）と Content-Type
+ASSET_TYPES = {
+    ".css": (60_000, "text/css"),
+    ".woff2": (250_000, "font/woff2"),
+    ".ico": (15_000, "image/x-icon"),
+    ".jpg": (120_000, "image/jpeg"),
+    ".mp4": (2_000_000, "video/mp4"),
+    ".js": (40_000, "application/javascript"),
+}
+
+# 結果一覧の入れ物（まとめ検索のとき、この間に各ユーザー名の結果を並べる）
+RESULT_CONTAINERS = {
+    "/html/": ('<div id="links" class="results">', "</div>\n</body>"),
+    "/search": ('<ol id="b_results">', "</ol>"),
+}
+
+_SITE_USERNAME = re.compile(r"instagram\.com/([^\s/)]+)")
+
+
+def fake_followers(username):
+    """ユーザー名から決まるダミーのフォロワー数（毎回同じ値になる）"""
+    return 1000 + zlib.crc32(username.encode("utf-8")) % 50000
+
+
+def _username_from_query(query):
+    # "site:instagram.com/username" または "site:instagram.com 検索語" を想定
+    if "instagram.com/" in query:
+        return query.split("instagram.com/", 1)[1].split()[0].strip("/") or "unknown"
+    return "user" + str(zlib.crc32(query.encode("utf-8")) % 100000)
+
+
+def _render(template, username):
+    return (template
+            .replace("__USERNAME__", username)
+            .replace("__DISPLAY_NAME__", username.replace("_", " ").title())
+            .replace("__FOLLOWERS__", f"{fake_followers(username):,}"))
+
+
+def _render_many(template, usernames, container):
+    """まとめ検索の結果ページ（1ページ目の入れ物の中に、全員分の結果を並べる）"""
+    start_tag, end_tag = container
+    pages = [_render(template, username) for username in usernames]
+    head = pages[0][:pages[0].index(start_tag) + len(start_tag)]
+    tail = pages[0][pages[0].rindex(end_tag):]
+    items = [page[page.index(start_tag) + len(start_tag):page.rindex(end_tag)] for page in pages]
+    return head + "".join(items) + tail
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    templates = {}
+    latency = 0.0
+    asset_latency = 0.0
+    max_accounts = 5
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path.startswith("/assets/"):
+            self._send_asset(parsed.path)
+            return
+        template = self.templates.get(parsed.path)
+        if template is None:
+            self.send_error(404)
+            return
+
+        query = urllib.parse.parse_qs(parsed.query).get("q", [""])[0]
+        usernames = _SITE_USERNAME.findall(query) if " OR " in query else []
+        if len(usernames) > 1:
+            body = _render_many(template, usernames[:self.max_accounts], RESULT_CONTAINERS[parsed.path])
+        elif parsed.path == "/profile/":
+            body = _render(template, query or "example")
+        else:
+            body = _render(template, _username_from_query(query))
+
+        if self.latency:
+            time.sleep(self.latency)
+        self._send(body.encode("utf-8"), "text/html; charset=utf-8")
+
+    def _send_asset(self, path):
+        size, content_type = ASSET_TYPES.get(os.path.splitext(path)[1], (10_000, "application/octet-stream"))
+        if self.asset_latency:
+            time.sleep(self.asset_latency)
+        data = b"/* stub */" if content_type.startswith(("text/", "application/javascript")) else b""
+        self._send(data.ljust(size, b" "), content_type, cache=False)
+
+    def _send(self, data, content_type, cache=True):
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            if not cache:
+                # 毎回読み込ませる（ブラウザのキャッシュで2回目以降が速くならないように）
+                self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアント側で打ち切られたリクエスト（ヘッジ検索のキャンセルなど）
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, latency=0.0, max_accounts=5, asset_latency=0.0):
+    """
+    スタブサーバーを別スレッドで起動する（max_accounts: まとめ検索1回で結果を返すアカウント数の上限
+    asset_latency: /assets/ のファイルを返すまでの秒数）
+    戻り値: (server, base_url)  ※終了時は server.shutdown() を呼ぶ
+    """
+    templates = {}
+    for path, filename in ROUTES.items():
+        with open(os.path.join(FIXTURES_DIR, filename), "r", encoding="utf-8") as f:
+            templates[path] = f.read()
+
+    handler = type("StubHandler", (_StubHandler,), {"templates": templates, "latency": latency,
+                                           "max_accounts": max_accounts, "asset_latency": asset_latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    server, base_url = start_stub_server(port=8765)
+    print(f"スタブサーバー起動: {base_url}/html/?q=site:instagram.com/example  (Ctrl+Cで終了)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
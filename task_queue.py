@@ -0,0 +1,271 @@
+import queue
+import threading
+import time
+
+from metrics import METRICS
+
+# ---------------------------------------------------------
+# ワーカーが1件ずつ取りに行くタスクキュー
+# ---------------------------------------------------------
+# 最初に均等に分けるのではなく、手が空いたワーカーが次の1件を取りに行くので、
+# 遅いワーカー（CAPTCHA・重いページ）がいても他のワーカーが残りを片付けられる。
+# 失敗した項目は別のワーカーに回して再試行し（最大 max_attempts 回）、
+# 自分が失敗した項目を引いたワーカーは、それをキューに戻して次の項目を処理する（回せる項目が無ければ状況が変わるまで待つ）。
+# 結果は終わった順に results() から受け取れる。
+# maxsize を指定すると処理待ち＋処理中の件数が上限に達した時点で submit が待たされ（背圧）、
+# dedupe_key を指定すると同じキーの項目は2回目以降 submit しても無視される。
+# priority（項目 -> 数値）を指定すると、submit した順ではなく数値の大きい項目から処理する（見込みの高いものから）。
+# cancel() で未着手の項目を取り消して止められる（処理中の項目は最後まで処理して results() に返す）。
+
+class _Task:
+    __slots__ = ("item", "attempts", "failed_by", "order")
+
+    def __init__(self, item, order=(0, 0)):
+        self.item = item
+        self.attempts = 0
+        self.failed_by = set()
+        self.order = order   # priority 指定時の取り出し順（小さいほど先）
+
+    def __lt__(self, other):
+        return self.order < other.order
+
+
+class _StopTask:
+    # priority 指定時も他の項目と並べられるように、一番最後の順番を持たせる
+    order = (float("inf"), 0)
+
+    def __lt__(self, other):
+        return self.order < other.order
+
+
+_STOP = _StopTask()
+
+
+class WorkerStats:
+    """ワーカー1人分の処理件数・失敗数・処理時間"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.done = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.latencies = []
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class WorkQueue:
+    """
+    handler(worker_id, item) を workers 人のスレッドで並列に実行する
+        wq = WorkQueue(handler, workers=4)
+        wq.start()
+        for item in items: wq.submit(item)
+        wq.close()
+        for item, result, error in wq.results(): ...
+    """
+
+    def __init__(self, handler, workers, max_attempts=3, name="Worker", maxsize=0, dedupe_key=None, priority=None):
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.name = name
+        self.stats = {i + 1: WorkerStats(i + 1) for i in range(workers)}
+        self.started_at = None
+        self.finished_at = None
+        self.retried = 0
+        self.duplicates = 0
+        self.cancelled = 0
+        self.dedupe_key = dedupe_key
+        self.priority = priority
+        self._seen = set()
+        # 背圧用: 処理待ち＋処理中の件数の上限（再試行で戻す分は数えない）
+        self._slots = threading.BoundedSemaphore(maxsize) if maxsize else None
+        self._tasks = queue.PriorityQueue() if priority else queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        # 項目の追加・ワーカーの手が空いたことを、自分が失敗した項目しか残っていないワーカーに知らせる
+        self._changed = threading.Condition(self._lock)
+        self._version = 0
+        self._pending = 0
+        self._submitted = 0
+        self._closed = False
+        self._cancelled = False
+        self._threads = []
+
+    def start(self):
+        self.started_at = time.time()
+        for worker_id in self.stats:
+            t = threading.Thread(target=self._run, args=(worker_id,), daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, item):
+        """
+        項目を追加する。追加したら True、重複で無視した・cancel() 後なら False
+        maxsize に達している場合は空きができるまで待つ
+        """
+        with self._lock:
+            if self._cancelled:
+                return False
+            if self._closed:
+                raise RuntimeError("close() 後は submit できません")
+            if self.dedupe_key:
+                key = self.dedupe_key(item)
+                if key in self._seen:
+                    self.duplicates += 1
+                    return False
+                self._seen.add(key)
+            self._pending += 1
+            self._submitted += 1
+            order = (-self.priority(item), self._submitted) if self.priority else (0, 0)
+        if self._slots:
+            self._slots.acquire()
+        self._tasks.put(_Task(item, order))
+        self._notify()
+        return True
+
+    def close(self):
+        """これ以上 submit しないことを伝える。残りを処理し終えたらワーカーが止まる"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            finished = self._pending == 0
+        if finished:
+            self._shutdown()
+
+    def cancel(self):
+        """
+        未着手の項目（再試行待ちを含む）を取り消して止める。処理中の項目は最後まで処理して results() に返す
+        取り消した項目は results() には出てこない（件数は cancelled）
+        """
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            finished = not self._closed and self._pending == 0
+            self._closed = True
+        if finished:
+            self._shutdown()
+
+    def _finish_one(self):
+        if self._slots:
+            self._slots.release()
+        with self._lock:
+            self._pending -= 1
+            finished = self._closed and self._pending == 0
+        if finished:
+            self._shutdown()
+
+    def _shutdown(self):
+        self.finished_at = time.time()
+        for _ in self._threads:
+            self._tasks.put(_STOP)
+        self._results.put(_STOP)
+        self._notify()
+
+    def _notify(self):
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+    def _is_mine(self, worker_id, task):
+        # 自分が一度失敗した項目は、まだ試していないワーカーがいればそちらに回す
+        return task is _STOP or worker_id not in task.failed_by or len(task.failed_by) >= self.workers
+
+    def _next_task(self, worker_id):
+        """次に処理する項目。自分が失敗した項目しか無ければ、状況が変わるまで待って None を返す"""
+        task = self._tasks.get()
+        if self._is_mine(worker_id, task):
+            return task
+        with self._lock:
+            version = self._version
+        # 自分が失敗した項目は脇によけて次の項目を探し、見つかったかどうかに関係なく元の順番でキューに戻す
+        skipped = [task]
+        task = None
+        while task is None:
+            try:
+                candidate = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_mine(worker_id, candidate):
+                task = candidate
+            else:
+                skipped.append(candidate)
+        for other in skipped:
+            self._tasks.put(other)
+        if task is None:
+            # 他のワーカーが取るか、新しい項目が来る・誰かの手が空くまで待つ
+            with self._changed:
+                self._changed.wait_for(lambda: self._version != version)
+        return task
+
+    def _run(self, worker_id):
+        stats = self.stats[worker_id]
+        while True:
+            task = self._next_task(worker_id)
+            if task is None:
+                continue
+            if task is _STOP:
+                return
+            if self._cancelled:
+                with self._lock:
+                    self.cancelled += 1
+                self._finish_one()
+                continue
+
+            start = time.time()
+            try:
+                result = self.handler(worker_id, task.item)
+                error = None
+            except Exception as e:
+                result, error = None, e
+            elapsed = time.time() - start
+            stats.busy += elapsed
+            stats.latencies.append(elapsed)
+
+            if error is None:
+                stats.done += 1
+            else:
+                stats.failed += 1
+                METRICS.count("errors", queue=self.name, type=type(error).__name__)
+                task.attempts += 1
+                task.failed_by.add(worker_id)
+                if task.attempts < self.max_attempts:
+                    with self._lock:
+                        self.retried += 1
+                    self._tasks.put(task)
+                    self._notify()
+                    continue
+
+            self._results.put((task.item, result, error))
+            self._finish_one()
+            self._notify()
+
+    def results(self):
+        """(item, 結果, 例外 or None) を終わった順に返す。全件終わると止まる"""
+        while True:
+            entry = self._results.get()
+            if entry is _STOP:
+                return
+            yield entry
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def print_stats(self):
+        wall = (self.finished_at or time.time()) - (self.started_at or time.time())
+        cancelled = f" / 取り消し {self.cancelled}件" if self.cancelled else ""
+        print(f"📈 {self.name} 別の処理状況（全体 {wall:.1f}秒 / 再試行 {self.retried}件{cancelled}）")
+        for s in self.stats.values():
+            rate = s.done / s.busy * 60 if s.busy else 0.0
+            util = s.busy / wall * 100 if wall else 0.0
+            print(f"   [{self.name}-{s.worker_id}] 完了 {s.done}件 / 失敗 {s.failed}回 | {rate:.1f}件/分 | "
+                  f"稼働率 {util:.0f}% | p50 {s.percentile(0.5):.1f}秒 / p95 {s.percentile(0.95):.1f}秒 / "
+                  f"最大 {max(s.latencies, default=0):.1f}秒")
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from follower_parser import parse, parse_count, parse_many
+
+TEXTS = [
+    "フォロワー1.2万人、フォロー中350人",
+    "フォロワー：１．２万人",
+    "10K Followers, 120 Following",
+    "8,200人のフォロワー",
+    "Followers: 5000",
+    "フォロー中 300人",
+    "新NISAで資産形成",
+    "",
+    None,
+]
+
+
+def test_parse_many_matches_parse():
+    df = parse_many(TEXTS)
+    for text, row in zip(TEXTS, df.itertuples(index=False)):
+        found = parse(text)
+        if found is None:
+            assert row.count == 0
+            assert pd.isna(row.unit) and pd.isna(row.start) and pd.isna(row.text)
+        else:
+            assert (row.count, row.unit, row.start, row.end, row.text) == tuple(found)
+        assert row.count == parse_count(text)
+
+
+def test_parse_many_keeps_series_index():
+    texts = pd.Series(["フォロワー300人", "資産運用"], index=[10, 20])
+    df = parse_many(texts)
+    assert list(df.index) == [10, 20]
+    assert list(df["count"]) == [300, 0]
+
+
+def test_parse_many_empty():
+    df = parse_many([])
+    assert df.empty
+    assert list(df.columns) == ["count", "unit", "start", "end", "text"]
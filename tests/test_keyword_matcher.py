@@ -0,0 +1,37 @@
+import pytest
+
+from keyword_matcher import KeywordMatcher
+
+MATCHER = KeywordMatcher(["FP", "NISA", "FX", "BTC", "EA"])
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("FP2級", ["FP"]),
+    ("FP3級取得", ["FP"]),
+    ("ＦＰ２級", ["FP"]),
+    ("NISA2024", ["NISA"]),
+    ("FX10年", ["FX"]),
+    ("BTC1億", ["BTC"]),
+    ("2024NISA", ["NISA"]),
+])
+def test_digits_are_boundaries(text, expected):
+    assert MATCHER.find_all(text) == expected
+    assert MATCHER.search(text)
+
+
+@pytest.mark.parametrize("text", ["dream", "effect", "fxy", "nisan"])
+def test_ascii_letters_are_not_boundaries(text):
+    assert MATCHER.find_all(text) == []
+    assert not MATCHER.search(text)
+
+
+@pytest.mark.parametrize("words, text, expected", [
+    (["資産", "産形成"], "資産形成", ["資産", "産形成"]),
+    (["産形成", "資産"], "資産形成", ["資産", "産形成"]),
+    (["暗号資産", "資産"], "暗号資産", ["暗号資産", "資産"]),
+    (["FX", "X投資"], "FX投資", ["FX", "X投資"]),
+])
+def test_overlapping_terms_are_all_found(words, text, expected):
+    matcher = KeywordMatcher(words)
+    assert matcher.find_all(text) == expected
+    assert matcher.search(text)
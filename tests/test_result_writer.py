@@ -0,0 +1,28 @@
+import os
+import signal
+
+import pytest
+
+from result_writer import ResultWriter, flush_on_signals
+
+
+@pytest.fixture
+def restore_sigterm():
+    previous = signal.getsignal(signal.SIGTERM)
+    yield
+    signal.signal(signal.SIGTERM, previous)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGTERM"), reason="SIGTERM が無い")
+def test_signal_while_writing_does_not_deadlock(tmp_path, restore_sigterm):
+    path = str(tmp_path / "out.csv")
+    writer = ResultWriter(path, header=["URL"], flush_interval=None)
+    flush_on_signals(("SIGTERM",))
+    writer.write("https://www.instagram.com/a/")
+    # write() の途中（ロックを持っている間）にシグナルが届いた場合
+    with pytest.raises(KeyboardInterrupt):
+        with writer._lock:
+            os.kill(os.getpid(), signal.SIGTERM)
+    writer.close()
+    with open(path, encoding="utf-8") as f:
+        assert f.read().splitlines() == ["URL", "https://www.instagram.com/a/"]
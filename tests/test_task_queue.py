@@ -0,0 +1,35 @@
+import threading
+import time
+
+from task_queue import WorkQueue
+
+
+def test_failed_item_goes_to_another_worker_without_blocking_the_queue():
+    done = []
+    failed_by = []
+    lock = threading.Lock()
+
+    def handler(worker_id, item):
+        if item == "slow":
+            time.sleep(0.3)
+        elif item == "bad" and not failed_by:
+            failed_by.append(worker_id)
+            raise RuntimeError("一時的な失敗")
+        with lock:
+            done.append((item, worker_id))
+
+    priorities = {"slow": 100, "bad": 90}
+    wq = WorkQueue(handler, workers=2, priority=lambda item: priorities.get(item, 0))
+    for item in ["slow", "bad", "f1", "f2", "f3"]:
+        wq.submit(item)
+    wq.start()
+    wq.close()
+    results = list(wq.results())
+
+    assert all(error is None for _, _, error in results)
+    order = [item for item, _ in done]
+    # 失敗したワーカーは、もう一方の手が空くのを待たずに残りの項目を処理する
+    assert order.index("bad") > max(order.index(f) for f in ("f1", "f2", "f3"))
+    # 失敗した項目は別のワーカーが処理する
+    assert dict(done)["bad"] != failed_by[0]
+    assert wq.retried == 1
@@ -0,0 +1,30 @@
+import pytest
+
+import verify_cache
+from verify_cache import VerificationCache
+
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(verify_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_put_refreshes_only_the_fields_it_writes(tmp_path, clock):
+    cache = VerificationCache(str(tmp_path / "cache.sqlite3"), ttl_days=14)
+    cache.put("alice", followers=12000, ng_words=[], engine="duckduckgo")   # autofinder
+    clock[0] += 10 * DAY
+    cache.put("alice", bio_keywords=["NISA"], engine="bing")                # bio_check
+
+    clock[0] += 5 * DAY   # フォロワー数は15日前、プロフィールキーワードは5日前
+    cached = cache.get("alice")
+    assert cached["followers"] is None
+    assert cached["ng_words"] is None
+    assert cached["bio_keywords"] == ["NISA"]
+
+    clock[0] += 10 * DAY
+    assert cache.get("alice") is None
+    cache.close()
@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+
+# ---------------------------------------------------------
+# InstagramのURLの正規化（全スクリプト共通）
+# ---------------------------------------------------------
+# 検索結果のURLは同じアカウントでも書き方がばらばら
+#   https://www.instagram.com/Foo/?hl=ja / instagram.com/foo / https://m.instagram.com/foo/#
+#   https://ja-jp.instagram.com/foo/tagged/
+# どれも「プロフィール foo」として扱い、ユーザー名（小文字）と https://www.instagram.com/foo/ にそろえる。
+# ホスト名の大文字小文字・サブドメイン（www. / m. / 言語別の ja-jp. など）・?クエリ・#以降は無視する。
+# 投稿（/p/）・リール・ストーリー・ハッシュタグ・ログイン画面などはプロフィールではないので None。
+# 1本の正規表現で判定し、同じURLは LRU キャッシュから返す（1回の実行で何十万件も同じ処理をするため）。
+#   canonical_username("https://www.instagram.com/Foo/?hl=ja")   # -> "foo"
+#   canonical_url("instagram.com/foo")                          # -> "https://www.instagram.com/foo/"
+#   canonical_usernames(df["URL"])                              # pandas の列をまとめて変換
+
+# ユーザー名の後ろに付いていてもプロフィールとして扱うタブ
+PROFILE_TABS = ("tagged", "reels", "guides", "channel", "followers", "following")
+
+# ユーザー名の位置に来てもアカウントではないパス
+RESERVED_PATHS = frozenset([
+    "p", "reel", "reels", "tv", "igtv", "stories", "explore", "tags", "locations", "accounts", "direct",
+    "popular", "about", "developer", "legal", "privacy", "help", "web", "challenge", "emails", "session",
+    "oauth", "api", "graphql", "ar", "static",
+])
+
+PROFILE_URL_SOURCE = (
+    r"\s*(?:https?://)?(?:[a-z0-9-]+\.)*instagram\.com/"
+    r"([a-z0-9._]{1,30})"
+    r"(?:/(?:" + "|".join(PROFILE_TABS) + r"))?"
+    r"/?(?:[?#]|\s*$)"
+)
+PROFILE_URL_PATTERN = re.compile(PROFILE_URL_SOURCE, re.IGNORECASE)
+# ほとんどのURLは小文字だけなので、先に大文字小文字を区別する版で判定する（IGNORECASE より倍近く速い）
+_LOWERCASE_PATTERN = re.compile(PROFILE_URL_SOURCE)
+
+CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_username(url):
+    """プロフィールURLからユーザー名（小文字）を取り出す。プロフィール以外・空なら None"""
+    if not url or not isinstance(url, str):
+        return None
+    match = _LOWERCASE_PATTERN.match(url)
+    if match is None and not url.islower():
+        match = PROFILE_URL_PATTERN.match(url)
+    if match is None:
+        return None
+    username = match.group(1).lower()
+    return None if username in RESERVED_PATHS else username
+
+
+def canonical_url(url):
+    """プロフィールURLを https://www.instagram.com/<ユーザー名>/ にそろえる。プロフィール以外なら None"""
+    username = canonical_username(url)
+    return f"https://www.instagram.com/{username}/" if username else None
+
+
+def is_profile_url(url):
+    """Instagramのアカウントプロフィールページか"""
+    return canonical_username(url) is not None
+
+
+def canonical_usernames(urls):
+    """
+    URLの列（pandas.Series / リスト）をまとめてユーザー名（小文字）の Series にする（プロフィール以外は None）
+    同じURLは1回しか判定しないので、重複の多い検索結果ほど速い
+    """
+    import numpy as np
+    import pandas as pd
+
+    urls = urls if isinstance(urls, pd.Series) else pd.Series(list(urls), dtype=object)
+    codes, uniques = pd.factorize(urls)
+    # factorize は欠損値を -1 にするので、末尾に None を足して -1 がそこを指すようにする
+    values = np.array([canonical_username(url) for url in uniques] + [None], dtype=object)
+    return pd.Series(values[codes], index=urls.index, dtype=object)
+
+
+def canonical_urls(urls):
+    """URLの列をまとめて https://www.instagram.com/<ユーザー名>/ の Series にする（プロフィール以外は None）"""
+    import pandas as pd
+
+    names = canonical_usernames(urls)
+    return pd.Series([f"https://www.instagram.com/{name}/" if name else None for name in names],
+                     index=names.index, dtype=object)
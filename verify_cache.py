@@ -0,0 +1,137 @@
+import json
+import sqlite3
+import threading
+import time
+
+# ---------------------------------------------------------
+# ユーザー名ごとの判定結果キャッシュ（SQLite）
+# ---------------------------------------------------------
+# 一度検索したアカウントのフォロワー数・NGワード・プロフィールキーワードを保存し、
+# 有効期限（TTL）内の再実行では検索ページを開かずに結果を再利用する。
+# 件数が上限を超えたら取得日時の古いものから削除する。
+# スクリプトごとに書く項目が違う（autofinder はフォロワー数・NGワード、bio_check はプロフィールキーワード）ので、
+# 有効期限は項目ごとの取得日時（*_at）で判定する。fetched_at はどれかの項目を最後に書いた日時（削除の順番に使う）。
+
+DEFAULT_TTL_DAYS = 14
+DEFAULT_MAX_ENTRIES = 200000
+
+# 上限チェックは毎回ではなく、この件数を書き込むごとに行う
+_EVICT_CHECK_INTERVAL = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verification (
+    username     TEXT PRIMARY KEY,
+    followers    INTEGER,
+    ng_words     TEXT,
+    bio_keywords TEXT,
+    engine       TEXT,
+    fetched_at   REAL NOT NULL,
+    followers_at    REAL,
+    ng_words_at     REAL,
+    bio_keywords_at REAL
+)
+"""
+
+
+class VerificationCache:
+    """判定結果のディスクキャッシュ。複数スレッドから同時に使ってよい"""
+
+    def __init__(self, path, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_sec = ttl_days * 24 * 60 * 60
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fetched_at ON verification(fetched_at)")
+        self._conn.commit()
+
+    def get(self, username):
+        """有効期限内の項目を dict で返す（期限切れの項目は None）。無い／全項目が期限切れなら None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT followers, ng_words, bio_keywords, engine, fetched_at, "
+                "followers_at, ng_words_at, bio_keywords_at "
+                "FROM verification WHERE username = ?",
+                (username.lower(),),
+            ).fetchone()
+            if row is not None:
+                # 期限切れの項目は無かったことにする
+                oldest = time.time() - self.ttl_sec
+                fields = [value if at is not None and at >= oldest else None for value, at in zip(row[:3], row[5:])]
+            if row is None or all(value is None for value in fields):
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        followers, ng_words, bio_keywords = fields
+        engine, fetched_at = row[3:5]
+        return {
+            "username": username,
+            "followers": followers,
+            "ng_words": json.loads(ng_words) if ng_words is not None else None,
+            "bio_keywords": json.loads(bio_keywords) if bio_keywords is not None else None,
+            "engine": engine,
+            "fetched_at": fetched_at,
+        }
+
+    def put(self, username, followers=None, ng_words=None, bio_keywords=None, engine=None):
+        """
+        結果を保存する。None の項目は既存の値を残す（スクリプトごとに見る項目が違うため）
+        有効期限は書いた項目の分だけ延びる（他のスクリプトが前に書いた項目の取得日時はそのまま）
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO verification (username, followers, ng_words, bio_keywords, engine, fetched_at, "
+                "followers_at, ng_words_at, bio_keywords_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET "
+                "followers = COALESCE(excluded.followers, followers), "
+                "ng_words = COALESCE(excluded.ng_words, ng_words), "
+                "bio_keywords = COALESCE(excluded.bio_keywords, bio_keywords), "
+                "engine = COALESCE(excluded.engine, engine), "
+                "fetched_at = excluded.fetched_at, "
+                "followers_at = COALESCE(excluded.followers_at, followers_at), "
+                "ng_words_at = COALESCE(excluded.ng_words_at, ng_words_at), "
+                "bio_keywords_at = COALESCE(excluded.bio_keywords_at, bio_keywords_at)",
+                (
+                    username.lower(),
+                    followers,
+                    json.dumps(ng_words, ensure_ascii=False) if ng_words is not None else None,
+                    json.dumps(bio_keywords, ensure_ascii=False) if bio_keywords is not None else None,
+                    engine,
+                    now,
+                    now if followers is not None else None,
+                    now if ng_words is not None else None,
+                    now if bio_keywords is not None else None,
+                ),
+            )
+            self._conn.commit()
+
+            self._writes_since_check += 1
+            if self._writes_since_check >= _EVICT_CHECK_INTERVAL:
+                self._writes_since_check = 0
+                self._evict()
+
+    def _evict(self):
+        # 期限切れを消してから、まだ多ければ古い順に上限まで削る
+        self._conn.execute("DELETE FROM verification WHERE fetched_at < ?", (time.time() - self.ttl_sec,))
+        count = self._conn.execute("SELECT COUNT(*) FROM verification").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM verification WHERE username IN ("
+                "SELECT username FROM verification ORDER BY fetched_at ASC LIMIT ?)",
+                (overflow,),
+            )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()